@@ -0,0 +1,251 @@
+# Author: George Kochera
+# Date: 3/12/2020
+# Description: Portfolio Project - XiangqiArrayEvaluation.py
+
+# Batch evaluation of Xiangqi positions with NumPy. A batch of N positions is an (N, 10, 9) int8 array laid out like
+# the game board (rank 10 first). Each square holds a piece code: 0 for an empty square, 1 to 7 for Red's General,
+# Advisor, Elephant, Horse, Chariot, Cannon and Soldier, and -1 to -7 for the same Black pieces. Every function here
+# takes and returns arrays and works on the whole batch at once with array operations, so large sets of positions can
+# be scored for training data or bulk review without making a GamePiece for any of them.
+#
+# Three features are computed per position, each as Red's total minus Black's so positive values favor Red:
+#
+#   material      the piece values of XiangqiEvaluation.PIECE_VALUES.
+#   piece-square  the piece-square table bonuses of XiangqiEvaluation.PIECE_SQUARE_TABLES. Material plus piece-square
+#                 is exactly the score evaluate_position() and XiangqiGame.get_evaluation() give.
+#   mobility      a cheap stand-in for the number of moves: the Horse, Chariot and Cannon moves on the board, ignoring
+#                 checks and pinned pieces and leaving out Cannon captures.
+#
+# Positions are turned into arrays with games_to_array() (one XiangqiGame per position) or, faster,
+# packed_positions_to_array(), which splits the packed positions of XiangqiGame.to_bytes() straight into an array.
+#
+# NumPy is only needed for this module; the rest of the game works without it. When it is not installed the module can
+# still be imported, but its functions raise ImportError.
+#
+# Usage:
+#   boards = games_to_array([XiangqiGame(), XiangqiGame(fen)])
+#   scores = evaluate_boards(boards)         # array([0, ...]), the same scores as get_evaluation().
+#   features = extract_features(boards)      # (N, 3) array of material, piece-square and mobility.
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from XiangqiEvaluation import PIECE_VALUES, PIECE_SQUARE_TABLES
+from XiangqiGame import BOARD_COLUMNS, BOARD_ROWS, BOARD_SIZE, PIECE_TYPES, PACKED_POSITION_BYTES
+from XiangqiGame import PACKED_SIDE_TO_MOVE_BYTE
+
+# The array code of every piece: 1 to 7 for Red in the order of PIECE_TYPES, negated for Black.
+ARRAY_PIECE_CODES = {(None, None): 0}
+for piece_number, piece_type in enumerate(PIECE_TYPES, 1):
+    ARRAY_PIECE_CODES['Red', piece_type] = piece_number
+    ARRAY_PIECE_CODES['Black', piece_type] = -piece_number
+HORSE_CODE = ARRAY_PIECE_CODES['Red', 'Horse']
+CHARIOT_CODE = ARRAY_PIECE_CODES['Red', 'Chariot']
+CANNON_CODE = ARRAY_PIECE_CODES['Red', 'Cannon']
+
+# The columns of extract_features().
+MATERIAL_FEATURE = 0
+PIECE_SQUARE_FEATURE = 1
+MOBILITY_FEATURE = 2
+FEATURE_COUNT = 3
+
+# Boards are padded with OFF_BOARD squares so looking a few squares past the edge reads OFF_BOARD instead of wrapping
+# round to the other side. PADDING is far enough for a Chariot to look all the way along a rank or file.
+OFF_BOARD = 8
+PADDING = max(BOARD_ROWS, BOARD_COLUMNS) - 1
+PADDED_ROWS = BOARD_ROWS + 2 * PADDING
+PADDED_COLUMNS = BOARD_COLUMNS + 2 * PADDING
+
+
+def get_padded_step(row_step, column_step):
+    """Returns how far apart two squares row_step rows and column_step columns apart are in the padded cells."""
+    return row_step * PADDED_COLUMNS + column_step
+
+
+# The Horse moves as padded steps, each with the step to the leg square that must be empty.
+HORSE_STEPS = tuple((get_padded_step(row_step, column_step), get_padded_step(leg_row_step, leg_column_step))
+                    for (row_step, column_step), (leg_row_step, leg_column_step) in (
+                        ((-2, -1), (-1, 0)), ((-2, 1), (-1, 0)), ((2, -1), (1, 0)), ((2, 1), (1, 0)),
+                        ((-1, -2), (0, -1)), ((1, -2), (0, -1)), ((-1, 2), (0, 1)), ((1, 2), (0, 1))))
+ORTHOGONAL_STEPS = tuple(get_padded_step(row_step, column_step)
+                         for row_step, column_step in ((-1, 0), (1, 0), (0, -1), (0, 1)))
+
+
+def build_code_tables():
+    """
+    Returns the (material, piece-square) lookup tables. Both are indexed by piece code + 7, so the codes -7 to 7 map
+    to rows 0 to 14; the piece-square table has one column per board index. Black's values are mirrored top to bottom
+    and negated, as in XiangqiEvaluation.build_piece_square_values().
+    """
+    material_table = numpy.zeros(2 * len(PIECE_TYPES) + 1, dtype=numpy.int32)
+    piece_square_table = numpy.zeros((2 * len(PIECE_TYPES) + 1, BOARD_SIZE), dtype=numpy.int32)
+    for piece_type in PIECE_TYPES:
+        table = numpy.array(PIECE_SQUARE_TABLES[piece_type], dtype=numpy.int32)
+        red_row = ARRAY_PIECE_CODES['Red', piece_type] + len(PIECE_TYPES)
+        black_row = ARRAY_PIECE_CODES['Black', piece_type] + len(PIECE_TYPES)
+        material_table[red_row] = PIECE_VALUES[piece_type]
+        material_table[black_row] = -PIECE_VALUES[piece_type]
+        piece_square_table[red_row] = table.ravel()
+        piece_square_table[black_row] = -table[::-1].ravel()
+    return material_table, piece_square_table
+
+
+if numpy is not None:
+    MATERIAL_BY_CODE, PIECE_SQUARE_BY_CODE = build_code_tables()
+
+    # Packed nibble codes 0 to 15 to array codes: 1 to 7 are Red's pieces, 9 to 15 Black's and 8 is not a piece.
+    PACKED_TO_ARRAY_CODES = numpy.array([0, 1, 2, 3, 4, 5, 6, 7, OFF_BOARD, -1, -2, -3, -4, -5, -6, -7],
+                                        dtype=numpy.int8)
+
+
+def require_numpy():
+    """Raises ImportError if NumPy is not installed."""
+    if numpy is None:
+        raise ImportError('XiangqiArrayEvaluation needs NumPy, which is not installed.')
+
+
+def as_board_array(boards):
+    """Returns boards as an (N, 10, 9) int8 array, raising ValueError if it is not shaped like a batch of boards."""
+    require_numpy()
+    boards = numpy.asarray(boards, dtype=numpy.int8)
+    if boards.ndim != 3 or boards.shape[1:] != (BOARD_ROWS, BOARD_COLUMNS):
+        raise ValueError('Boards must be an (N, {}, {}) array, not {}.'.format(BOARD_ROWS, BOARD_COLUMNS,
+                                                                               boards.shape))
+    return boards
+
+
+def game_to_codes(game):
+    """Returns the 90 array codes of the game's board in board index order."""
+    return [ARRAY_PIECE_CODES[piece.get_team(), piece.get_type()] for piece in game.get_board_cells()]
+
+
+def games_to_array(games):
+    """Returns the boards of the games provided (any iterable of XiangqiGames) as an (N, 10, 9) int8 array."""
+    require_numpy()
+    codes = []
+    for game in games:
+        codes.extend(game_to_codes(game))
+    return numpy.array(codes, dtype=numpy.int8).reshape(-1, BOARD_ROWS, BOARD_COLUMNS)
+
+
+def packed_positions_to_array(data):
+    """
+    Returns the boards of the packed positions stored back to back in data (see XiangqiGame.to_bytes()) as an
+    (N, 10, 9) int8 array, and the players to move as an (N,) bool array that is True where Black is to move. The
+    nibbles are split with array operations, so no game or piece is made. Raises ValueError if data is not a whole
+    number of packed positions or holds a code that is not a piece.
+    """
+    require_numpy()
+    packed = numpy.frombuffer(data, dtype=numpy.uint8)
+    if packed.size % PACKED_POSITION_BYTES:
+        raise ValueError('Packed positions must be a multiple of {} bytes long.'.format(PACKED_POSITION_BYTES))
+    packed = packed.reshape(-1, PACKED_POSITION_BYTES)
+
+    # The lower board index of each pair is in the high nibble.
+    nibbles = numpy.empty((packed.shape[0], BOARD_SIZE), dtype=numpy.uint8)
+    square_bytes = packed[:, :PACKED_SIDE_TO_MOVE_BYTE]
+    nibbles[:, 0::2] = square_bytes >> 4
+    nibbles[:, 1::2] = square_bytes & 0x0F
+    boards = PACKED_TO_ARRAY_CODES[nibbles]
+    if (boards == OFF_BOARD).any() or (packed[:, PACKED_SIDE_TO_MOVE_BYTE] > 1).any():
+        raise ValueError('Packed positions hold a code that is not a piece.')
+    return boards.reshape(-1, BOARD_ROWS, BOARD_COLUMNS), packed[:, PACKED_SIDE_TO_MOVE_BYTE] == 1
+
+
+def material_scores(boards):
+    """Returns the material of every board, Red's minus Black's, as an (N,) int32 array."""
+    boards = as_board_array(boards)
+    return MATERIAL_BY_CODE[boards.astype(numpy.intp) + len(PIECE_TYPES)].sum(axis=(1, 2), dtype=numpy.int32)
+
+
+def piece_square_scores(boards):
+    """Returns the piece-square table bonuses of every board, Red's minus Black's, as an (N,) int32 array."""
+    boards = as_board_array(boards)
+    rows = boards.reshape(-1, BOARD_SIZE).astype(numpy.intp) + len(PIECE_TYPES)
+    return PIECE_SQUARE_BY_CODE[rows, numpy.arange(BOARD_SIZE)].sum(axis=1, dtype=numpy.int32)
+
+
+def get_padded_cells(boards):
+    """
+    Returns the flat cells of a copy of boards with PADDING rows and columns of OFF_BOARD squares round every edge.
+    In the flat cells, moving one row is a step of PADDED_COLUMNS and moving one column a step of 1.
+    """
+    padded = numpy.full((boards.shape[0], PADDED_ROWS, PADDED_COLUMNS), OFF_BOARD, dtype=numpy.int8)
+    padded[:, PADDING:PADDING + BOARD_ROWS, PADDING:PADDING + BOARD_COLUMNS] = boards
+    return padded.ravel()
+
+
+def find_pieces(boards, piece_mask):
+    """
+    Returns a (board numbers, positions, signs) tuple of arrays for every piece where piece_mask is True: the board
+    each is on, where it stands in the flat cells of get_padded_cells() and 1 for Red or -1 for Black.
+    """
+    board_numbers, rows, columns = numpy.nonzero(piece_mask)
+    positions = (board_numbers * PADDED_ROWS + rows + PADDING) * PADDED_COLUMNS + columns + PADDING
+    return board_numbers, positions, numpy.sign(boards[board_numbers, rows, columns])
+
+
+def can_move_onto(targets, signs):
+    """Returns True for every target code that is empty or holds a piece of the other team to the signs provided."""
+    return (targets == 0) | ((targets != OFF_BOARD) & (targets * signs < 0))
+
+
+def mobility_scores(boards):
+    """
+    Returns the mobility of every board, Red's minus Black's, as an (N,) int32 array. Mobility counts the squares the
+    Horses, Chariots and Cannons can move to, without looking at checks or pinned pieces and without Cannon captures.
+    Every such piece of every board is stepped at once; the only loops are over the directions and the distance along
+    them.
+    """
+    boards = as_board_array(boards)
+    cells = get_padded_cells(boards)
+    piece_types = numpy.abs(boards)
+    mobility = numpy.zeros(boards.shape[0], dtype=numpy.int32)
+
+    # A Horse can move unless its leg is blocked or its own team stands on the square.
+    board_numbers, positions, signs = find_pieces(boards, piece_types == HORSE_CODE)
+    moves = numpy.zeros(positions.shape, dtype=numpy.int64)
+    for step, leg_step in HORSE_STEPS:
+        leg_is_empty = cells[positions + leg_step] == 0
+        moves += leg_is_empty & can_move_onto(cells[positions + step], signs)
+    mobility += numpy.bincount(board_numbers, moves * signs, boards.shape[0]).astype(numpy.int32)
+
+    # Chariots and Cannons slide over empty squares until they are blocked; a Chariot can also take the piece that
+    # blocks it if it is the other team's.
+    board_numbers, positions, signs = find_pieces(boards, (piece_types == CHARIOT_CODE) | (piece_types == CANNON_CODE))
+    is_chariot = numpy.abs(cells[positions]) == CHARIOT_CODE
+    moves = numpy.zeros(positions.shape, dtype=numpy.int64)
+    for step in ORTHOGONAL_STEPS:
+        is_open = numpy.ones(positions.shape, dtype=bool)
+        for distance in range(1, PADDING + 1):
+            targets = cells[positions + step * distance]
+            is_empty = targets == 0
+            moves += is_open & (is_empty | (is_chariot & can_move_onto(targets, signs)))
+            is_open &= is_empty
+            if not is_open.any():
+                break
+    mobility += numpy.bincount(board_numbers, moves * signs, boards.shape[0]).astype(numpy.int32)
+    return mobility
+
+
+def evaluate_boards(boards):
+    """
+    Returns the score of every board as an (N,) int32 array: material plus piece-square bonuses, positive scores
+    favoring Red. These are the scores evaluate_position() gives the same positions.
+    """
+    return material_scores(boards) + piece_square_scores(boards)
+
+
+def extract_features(boards):
+    """
+    Returns an (N, FEATURE_COUNT) int32 array with the material, piece-square and mobility features of every board,
+    in the columns MATERIAL_FEATURE, PIECE_SQUARE_FEATURE and MOBILITY_FEATURE.
+    """
+    boards = as_board_array(boards)
+    features = numpy.empty((boards.shape[0], FEATURE_COUNT), dtype=numpy.int32)
+    features[:, MATERIAL_FEATURE] = material_scores(boards)
+    features[:, PIECE_SQUARE_FEATURE] = piece_square_scores(boards)
+    features[:, MOBILITY_FEATURE] = mobility_scores(boards)
+    return features
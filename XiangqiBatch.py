@@ -0,0 +1,163 @@
+# Author: George Kochera
+# Date: 3/12/2020
+# Description: Portfolio Project - XiangqiBatch.py
+
+# Bulk validation of games for XiangqiGame. Every game is replayed move by move through make_move() and the result
+# says how it ended: the game state, the first move that was not legal (if any) and whether each player is in check.
+#
+# The games are spread over several processes with a ProcessPoolExecutor. Games are sent to the workers in chunks so
+# the cost of handing work to another process is paid once per chunk, and each game is sent as a compact bytes object
+# (two bytes per move, the board indices of the two squares) rather than as lists of strings or game objects. Each
+# worker keeps one XiangqiGame and resets it for every game. Only a few chunks are handed out ahead of the results
+# being read, so any number of games can be streamed through with constant memory. Results always come back in the
+# same order as the games went in.
+#
+# Usage:
+#   results = validate_games([[('h3', 'e3'), ('h10', 'g8')], [('a1', 'a5')]])
+#   results[1].get_first_illegal_ply()  # 0, the Chariot can not jump the Soldier on a4.
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from XiangqiGame import XiangqiGame, SQUARES, square_to_index, OPENING_FEN
+
+DEFAULT_CHUNK_SIZE = 256  # Games per chunk sent to a worker.
+CHUNKS_IN_FLIGHT_PER_WORKER = 2  # How many chunks each worker may have waiting before results are read.
+INVALID_SQUARE_CODE = 255  # Stands in for a square that is not on the board, so its move fails as illegal.
+
+# The game each worker process replays its games on, made once per process by start_worker().
+_worker_game = None
+
+
+class GameValidationResult:
+    """The outcome of replaying one game."""
+
+    def __init__(self, game_state, first_illegal_ply, red_is_in_check, black_is_in_check, moves_played):
+        """GameValidationResult constructor."""
+        self._game_state = game_state
+        self._first_illegal_ply = first_illegal_ply
+        self._red_is_in_check = red_is_in_check
+        self._black_is_in_check = black_is_in_check
+        self._moves_played = moves_played
+
+    def get_game_state(self):
+        """Returns the game state after the last legal move: 'UNFINISHED', 'RED_WON', 'BLACK_WON' or 'DRAW'."""
+        return self._game_state
+
+    def get_first_illegal_ply(self):
+        """Returns the index (counting from 0) of the first move that was not legal, or None if all were legal."""
+        return self._first_illegal_ply
+
+    def is_valid(self):
+        """Returns True if every move of the game was legal."""
+        return self._first_illegal_ply is None
+
+    def get_player_in_check(self, player):
+        """Returns True if the player ('Red' or 'Black') is in check after the last legal move."""
+        if player == 'Red':
+            return self._red_is_in_check
+        return self._black_is_in_check
+
+    def get_moves_played(self):
+        """Returns the number of legal moves that were played."""
+        return self._moves_played
+
+
+def encode_moves(moves):
+    """
+    Packs a sequence of (moving_from_square, moving_to_square) tuples into bytes, two per move. A square that is not
+    on the board is packed as INVALID_SQUARE_CODE.
+    """
+    encoded_moves = bytearray()
+    for moving_from_square, moving_to_square in moves:
+        for square in (moving_from_square, moving_to_square):
+            index = square_to_index(square)
+            encoded_moves.append(INVALID_SQUARE_CODE if index is None else index)
+    return bytes(encoded_moves)
+
+
+def replay_encoded_moves(game, encoded_moves, starting_fen):
+    """
+    Sets the game up from starting_fen and plays the packed moves through make_move(), stopping at the first move that
+    is not legal. Returns the result as a (game_state, first_illegal_ply, red_is_in_check, black_is_in_check,
+    moves_played) tuple, which is cheap to send back from a worker process. Raises ValueError if starting_fen is not
+    a valid FEN, rather than replaying from whatever position the game was left in.
+    """
+    if not game.set_fen(starting_fen):
+        raise ValueError('Invalid FEN: {}'.format(starting_fen))
+    first_illegal_ply = None
+    for ply in range(len(encoded_moves) // 2):
+        moving_from_index = encoded_moves[2 * ply]
+        moving_to_index = encoded_moves[2 * ply + 1]
+        if moving_from_index == INVALID_SQUARE_CODE or moving_to_index == INVALID_SQUARE_CODE or \
+                not game.make_move(SQUARES[moving_from_index], SQUARES[moving_to_index]):
+            first_illegal_ply = ply
+            break
+    moves_played = game.get_move_stack_size()
+    return (game.get_game_state(), first_illegal_ply, game.is_in_check('Red'), game.is_in_check('Black'),
+            moves_played)
+
+
+def start_worker():
+    """Runs once in every worker process to make the game its games are replayed on."""
+    global _worker_game
+    _worker_game = XiangqiGame()
+
+
+def validate_chunk(encoded_games, starting_fen):
+    """Replays a chunk of packed games in a worker process and returns the list of result tuples."""
+    if _worker_game is None:
+        start_worker()
+    return [replay_encoded_moves(_worker_game, encoded_moves, starting_fen) for encoded_moves in encoded_games]
+
+
+def iterate_chunks(move_sequences, chunk_size):
+    """Generator that packs the move sequences and yields them in lists of up to chunk_size games."""
+    chunk = []
+    for moves in move_sequences:
+        chunk.append(encode_moves(moves))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iterate_validation_results(move_sequences, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                               starting_fen=OPENING_FEN):
+    """
+    Generator that validates every game in move_sequences (an iterable of sequences of (moving_from_square,
+    moving_to_square) tuples, all starting from starting_fen) and yields a GameValidationResult per game in input
+    order. workers is the number of processes (default: one per CPU). With one worker the games are replayed in this
+    process. Raises ValueError if starting_fen is not a valid FEN.
+    """
+    # Check the starting position once here, so a bad FEN is reported before any work is handed to the workers.
+    if not XiangqiGame().set_fen(starting_fen):
+        raise ValueError('Invalid FEN: {}'.format(starting_fen))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunks = iterate_chunks(move_sequences, chunk_size)
+
+    if workers <= 1:
+        for chunk in chunks:
+            for result in validate_chunk(chunk, starting_fen):
+                yield GameValidationResult(*result)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=start_worker) as executor:
+        pending_chunks = deque()
+        for chunk in chunks:
+            pending_chunks.append(executor.submit(validate_chunk, chunk, starting_fen))
+
+            # Wait for the oldest chunk before handing out more than a few chunks per worker.
+            while len(pending_chunks) >= workers * CHUNKS_IN_FLIGHT_PER_WORKER:
+                for result in pending_chunks.popleft().result():
+                    yield GameValidationResult(*result)
+        while pending_chunks:
+            for result in pending_chunks.popleft().result():
+                yield GameValidationResult(*result)
+
+
+def validate_games(move_sequences, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, starting_fen=OPENING_FEN):
+    """Validates every game in move_sequences and returns the list of GameValidationResults in input order."""
+    return list(iterate_validation_results(move_sequences, workers, chunk_size, starting_fen))
@@ -0,0 +1,234 @@
+# Author: George Kochera
+# Date: 3/12/2020
+# Description: Portfolio Project - XiangqiBenchmark.py
+
+# Micro-benchmarks for the hot paths of XiangqiGame, with a check against a stored baseline so a change that makes
+# one of them slower fails loudly instead of going unnoticed. XiangqiGame_Test.py only checks that the answers are
+# right and XiangqiPerft.py only times move generation as a whole; this times the pieces one at a time.
+#
+# Every benchmark runs over the same fixed corpus: a few games played from the opening position with a seeded random
+# number generator choosing among the legal moves (sorted, so the games are the same on every run), and every
+# position reached in them. Each benchmark is run for several rounds and the fastest round is kept, since the slower
+# rounds only measure whatever else the machine was doing. Results are seconds per operation: per move for make_move,
+# per position for is_in_check and so on.
+#
+# The results are printed as JSON. --save-baseline writes them to a file, and --baseline compares a run against that
+# file: any benchmark more than --tolerance slower than its baseline (0.25 means 25% slower) is reported and the exit
+# status is 1. Timings depend on the machine, so a baseline should be saved on the machine it is compared on.
+#
+# Usage: python -m XiangqiBenchmark [--backend pieces|bitboard] [--rounds N] [--save-baseline FILE]
+#                                   [--baseline FILE] [--tolerance FRACTION]
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from XiangqiGame import XiangqiGame, BACKENDS, OPENING_FEN, PIECE_TYPES, generate_threat_dictionary, try_move
+from XiangqiRecord import GameRecord, move_to_iccs
+
+CORPUS_SEED = 25
+CORPUS_GAMES = 8  # Games in the corpus.
+CORPUS_PLIES = 60  # Moves played in each game (fewer if it ends first).
+DEFAULT_ROUNDS = 5
+DEFAULT_TOLERANCE = 0.25
+
+
+def build_corpus(games=CORPUS_GAMES, plies=CORPUS_PLIES, seed=CORPUS_SEED):
+    """
+    Plays the corpus games and returns a (move_lists, fens) tuple: the list of moves of each game as
+    (moving_from_square, moving_to_square) tuples, and the FEN of every position reached, the opening position first.
+    """
+    rng = random.Random(seed)
+    move_lists = []
+    fens = [OPENING_FEN]
+    for game_number in range(games):
+        game = XiangqiGame()
+        moves = []
+        for ply in range(plies):
+            legal_moves = sorted(game.legal_moves())
+            if not legal_moves or game.get_game_state() != 'UNFINISHED':
+                break
+            move = rng.choice(legal_moves)
+            game.make_move(move[0], move[1])
+            moves.append(move)
+            fens.append(game.to_fen())
+        move_lists.append(moves)
+    return move_lists, fens
+
+
+def time_benchmark(setup, run, rounds):
+    """
+    Times run(state) over the rounds provided, calling setup() before each round (outside the timing) to make the
+    state it works on, so work that is remembered between calls is done again every round. Returns the seconds of the
+    fastest round.
+    """
+    fastest = None
+    for round_number in range(rounds):
+        state = setup()
+        start_time = time.perf_counter()
+        run(state)
+        seconds = time.perf_counter() - start_time
+        if fastest is None or seconds < fastest:
+            fastest = seconds
+    return fastest
+
+
+def run_benchmarks(backend='pieces', rounds=DEFAULT_ROUNDS, corpus=None):
+    """
+    Runs every benchmark on the backend provided and returns a dictionary of benchmark names to seconds per
+    operation. corpus is a (move_lists, fens) tuple from build_corpus(), built with the defaults when not given.
+    """
+    if corpus is None:
+        corpus = build_corpus()
+    move_lists, fens = corpus
+    move_count = sum(len(moves) for moves in move_lists)
+
+    def new_games():
+        """Returns a game set up from each corpus position, none of which has had anything asked of it yet."""
+        return [XiangqiGame(fen, backend) for fen in fens]
+
+    def new_games_with_moves():
+        """Returns each corpus position's game with its legal moves, found before the timing starts."""
+        games = new_games()
+        return [(game, game.legal_moves_by_index()) for game in games]
+
+    def play_moves(games):
+        for game, moves in zip(games, move_lists):
+            for moving_from_square, moving_to_square in moves:
+                game.make_move(moving_from_square, moving_to_square)
+
+    def play_trusted_moves(games):
+        for game, moves in zip(games, move_lists):
+            for moving_from_square, moving_to_square in moves:
+                game.make_move_trusted(moving_from_square, moving_to_square)
+
+    def ask_is_in_check(games):
+        for game in games:
+            game.is_in_check(game.get_current_player())
+
+    def verify_checkmates(games):
+        for game in games:
+            game.verify_checkmate()
+
+    def generate_threat_dictionaries(games):
+        for game in games:
+            generate_threat_dictionary(game, game.get_current_player())
+
+    def try_moves(games_with_moves):
+        for game, moves in games_with_moves:
+            for moving_from_index, moving_to_index in moves:
+                try_move(moving_from_index, moving_to_index, game)
+
+    def list_legal_moves(games):
+        for game in games:
+            game.legal_moves_by_index()
+
+    def start_new_games(games):
+        for game in games:
+            game.new_game()
+
+    def write_fens(games):
+        for game in games:
+            game.to_fen()
+
+    def read_fens(game):
+        for fen in fens:
+            game.set_fen(fen)
+
+    def replay_records(records):
+        for record in records:
+            record.replay()
+
+    def new_records():
+        records = []
+        for moves in move_lists:
+            records.append(GameRecord({'Format': 'ICCS'}, [move_to_iccs(moving_from_square, moving_to_square)
+                                                           for moving_from_square, moving_to_square in moves]))
+        return records
+
+    results = {}
+    try_move_count = sum(len(moves) for game, moves in new_games_with_moves())
+    benchmarks = (
+        ('make_move', lambda: [XiangqiGame(backend=backend) for moves in move_lists], play_moves, move_count),
+        ('make_move_trusted', lambda: [XiangqiGame(backend=backend) for moves in move_lists], play_trusted_moves,
+         move_count),
+        ('is_in_check', new_games, ask_is_in_check, len(fens)),
+        ('verify_checkmate', new_games, verify_checkmates, len(fens)),
+        ('generate_threat_dictionary', new_games, generate_threat_dictionaries, len(fens)),
+        ('try_move', new_games_with_moves, try_moves, try_move_count),
+        ('legal_moves', new_games, list_legal_moves, len(fens)),
+        ('new_game', lambda: [XiangqiGame(backend=backend) for index in range(100)], start_new_games, 100),
+        ('to_fen', new_games, write_fens, len(fens)),
+        ('set_fen', lambda: XiangqiGame(backend=backend), read_fens, len(fens)),
+        ('replay_record', new_records, replay_records, len(move_lists)),
+    )
+    for name, setup, run, operations in benchmarks:
+        results[name] = time_benchmark(setup, run, rounds) / operations
+
+    # Each piece type's list_possible_moves(), per piece, over every piece of that type in the corpus.
+    for piece_type in PIECE_TYPES:
+        games = new_games()
+        pieces = [(game, piece) for game in games for piece in game.get_board_cells()
+                  if piece.get_type() == piece_type]
+
+        def list_possible_moves(game_pieces):
+            for game, piece in game_pieces:
+                piece.list_possible_moves(game)
+
+        results['list_possible_moves.' + piece_type] = time_benchmark(lambda: pieces, list_possible_moves,
+                                                                      rounds) / len(pieces)
+    return results
+
+
+def find_regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compares results against baseline (both dictionaries of benchmark names to seconds per operation) and returns a
+    list of (name, baseline_seconds, seconds) tuples for every benchmark more than tolerance slower than its baseline.
+    Benchmarks missing from either are skipped.
+    """
+    regressions = []
+    for name, seconds in sorted(results.items()):
+        baseline_seconds = baseline.get(name)
+        if baseline_seconds is not None and seconds > baseline_seconds * (1 + tolerance):
+            regressions.append((name, baseline_seconds, seconds))
+    return regressions
+
+
+def main(arguments=None):
+    """Runs the benchmarks, prints the JSON results, compares them with a baseline and returns the exit status."""
+    parser = argparse.ArgumentParser(description='Micro-benchmarks for the XiangqiGame hot paths.')
+    parser.add_argument('--backend', choices=BACKENDS, default='pieces',
+                        help='XiangqiGame backend to time (default pieces)')
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS,
+                        help='rounds per benchmark, the fastest is kept (default {})'.format(DEFAULT_ROUNDS))
+    parser.add_argument('--save-baseline', metavar='FILE', help='write the results to FILE as the new baseline')
+    parser.add_argument('--baseline', metavar='FILE', help='compare the results with the baseline in FILE')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='how much slower than the baseline is allowed, as a fraction (default {})'.format(
+                            DEFAULT_TOLERANCE))
+    options = parser.parse_args(arguments)
+
+    report = {'backend': options.backend, 'python': platform.python_version(), 'rounds': options.rounds,
+              'units': 'seconds per operation', 'results': run_benchmarks(options.backend, options.rounds)}
+    print(json.dumps(report, indent=2, sort_keys=True))
+    if options.save_baseline is not None:
+        with open(options.save_baseline, 'w') as baseline_file:
+            json.dump(report, baseline_file, indent=2, sort_keys=True)
+
+    if options.baseline is None:
+        return 0
+    with open(options.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline.get('backend') != options.backend:
+        parser.error('the baseline was saved with the {} backend'.format(baseline.get('backend')))
+    regressions = find_regressions(report['results'], baseline['results'], options.tolerance)
+    for name, baseline_seconds, seconds in regressions:
+        print('REGRESSION {}: {:.3g}s per operation, baseline {:.3g}s ({:+.0%})'.format(
+            name, seconds, baseline_seconds, seconds / baseline_seconds - 1), file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,539 @@
+# Author: George Kochera
+# Date: 3/12/2020
+# Description: Portfolio Project - XiangqiBitboard.py
+
+# Bitboard move generation for XiangqiGame. A bitboard is a Python int used as a set of board indices: bit i is set
+# when index i is in the set. The position is held as one bitboard per team and piece type, plus one bitboard of
+# every occupied square and a 'rotated' copy of it laid out column by column. Finding where a piece can go, whether a
+# square is attacked and whether the Generals face each other then comes down to a few table lookups and bitwise
+# operations on those ints instead of asking every piece object in turn.
+#
+# The occupied squares of one row are (occupancy >> (row * 9)) & 0x1FF. The rotated bitboard has bit column * 10 +
+# row set for an occupied square, so the occupied squares of one column are (rotated >> (column * 10)) & 0x3FF. Those
+# masks index the slide tables, which give the squares a Chariot or Cannon reaches along that row or column.
+#
+# XiangqiGame(backend='bitboard') keeps a BitboardPosition next to its board of piece objects and asks it every rules
+# question (legal moves, check and checkmate, perft), so the attack tables of the default backend are not kept at
+# all. A BitboardPosition can also be used on its own; its perft() never touches a piece object.
+#
+# This module does not import XiangqiGame, since XiangqiGame imports BitboardPosition from here.
+
+BOARD_COLUMNS = 9
+BOARD_ROWS = 10
+BOARD_SIZE = BOARD_COLUMNS * BOARD_ROWS
+RANK_MASK = (1 << BOARD_COLUMNS) - 1
+FILE_MASK = (1 << BOARD_ROWS) - 1
+
+# Teams and piece types are numbers inside this module. A piece code is team * 7 + piece type number, and EMPTY is
+# the code of an empty square.
+TEAMS = ('Red', 'Black')
+TEAM_NUMBERS = {'Red': 0, 'Black': 1}
+PIECE_TYPES = ('General', 'Advisor', 'Elephant', 'Horse', 'Chariot', 'Cannon', 'Soldier')
+PIECE_TYPE_NUMBERS = {piece_type: number for number, piece_type in enumerate(PIECE_TYPES)}
+GENERAL, ADVISOR, ELEPHANT, HORSE, CHARIOT, CANNON, SOLDIER = range(7)
+EMPTY = -1
+
+# The bit of every index in the normal and in the rotated layout, and the shifts that bring the row or column of an
+# index down to the low bits.
+SQUARE_BITS = tuple(1 << index for index in range(BOARD_SIZE))
+ROTATED_SQUARE_BITS = tuple(1 << (index % BOARD_COLUMNS * BOARD_ROWS + index // BOARD_COLUMNS)
+                            for index in range(BOARD_SIZE))
+RANK_SHIFTS = tuple(index // BOARD_COLUMNS * BOARD_COLUMNS for index in range(BOARD_SIZE))
+FILE_SHIFTS = tuple(index % BOARD_COLUMNS * BOARD_ROWS for index in range(BOARD_SIZE))
+
+
+def get_piece_code(team, piece_type):
+    """Returns the piece code for a team ('Red' or 'Black') and piece type, or EMPTY if piece_type is None."""
+    if piece_type is None:
+        return EMPTY
+    return TEAM_NUMBERS[team] * 7 + PIECE_TYPE_NUMBERS[piece_type]
+
+
+def bits_of(indices):
+    """Returns the bitboard of the indices provided."""
+    bits = 0
+    for index in indices:
+        bits |= SQUARE_BITS[index]
+    return bits
+
+
+def indices_of(bits):
+    """Returns the list of indices set in a bitboard, lowest first."""
+    indices = []
+    while bits:
+        lowest_bit = bits & -bits
+        indices.append(lowest_bit.bit_length() - 1)
+        bits ^= lowest_bit
+    return indices
+
+
+PALACE_BITS = (bits_of(row * BOARD_COLUMNS + column for row in (7, 8, 9) for column in (3, 4, 5)),
+               bits_of(row * BOARD_COLUMNS + column for row in (0, 1, 2) for column in (3, 4, 5)))
+HALF_BITS = (bits_of(range(BOARD_SIZE // 2, BOARD_SIZE)), bits_of(range(BOARD_SIZE // 2)))
+
+
+def build_step_table(steps, allowed_bits=None):
+    """
+    Builds a tuple with one entry per index. Each entry is a tuple of (destination_bit, blocking_bit) pairs for the
+    (column, row) steps given that stay on the board (and inside allowed_bits). The blocking bit is the Elephant's eye
+    or the Horse's leg for two square steps and 0 for one square steps.
+    """
+    table = []
+    for index in range(BOARD_SIZE):
+        column, row = index % BOARD_COLUMNS, index // BOARD_COLUMNS
+        pairs = []
+        for column_delta, row_delta in steps:
+            if not (0 <= column + column_delta < BOARD_COLUMNS and 0 <= row + row_delta < BOARD_ROWS):
+                continue
+            destination_bit = SQUARE_BITS[(row + row_delta) * BOARD_COLUMNS + column + column_delta]
+            if allowed_bits is not None and not destination_bit & allowed_bits:
+                continue
+            if abs(column_delta) == 2 or abs(row_delta) == 2:
+                blocking_bit = SQUARE_BITS[(row + int(row_delta / 2)) * BOARD_COLUMNS + column + int(column_delta / 2)]
+            else:
+                blocking_bit = 0
+            pairs.append((destination_bit, blocking_bit))
+        table.append(tuple(pairs))
+    return tuple(table)
+
+
+def build_destination_bits(step_table):
+    """Turns a table made by build_step_table() for one square steps into one bitboard of destinations per index."""
+    return tuple(sum(destination_bit for destination_bit, blocking_bit in pairs) for pairs in step_table)
+
+
+def build_attacker_table(step_table):
+    """
+    Turns a step table around: for every index, the (attacker_bit, blocking_bit) pairs of the squares a piece attacks
+    it from, with the square that must be empty for that attack.
+    """
+    attackers = [[] for index in range(BOARD_SIZE)]
+    for index, pairs in enumerate(step_table):
+        for destination_bit, blocking_bit in pairs:
+            attackers[destination_bit.bit_length() - 1].append((SQUARE_BITS[index], blocking_bit))
+    return tuple(tuple(pairs) for pairs in attackers)
+
+
+ORTHOGONAL_STEPS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+DIAGONAL_STEPS = ((1, 1), (-1, -1), (1, -1), (-1, 1))
+ELEPHANT_STEPS = ((-2, -2), (2, 2), (2, -2), (-2, 2))
+HORSE_STEPS = ((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, 1), (2, -1), (1, -2), (-1, -2))
+SOLDIER_FORWARD_STEPS = ((0, -1), (0, 1))  # Red moves up the board (decreasing row), Black down.
+SIDEWAYS_STEPS = ((1, 0), (-1, 0))
+
+# Move tables, indexed by team number where the team matters and then by index. The General, Advisor and Soldier
+# tables hold a bitboard of destinations. The Elephant and Horse tables hold (destination_bit, eye or leg bit) pairs.
+GENERAL_BITS = tuple(build_destination_bits(build_step_table(ORTHOGONAL_STEPS, PALACE_BITS[team])) for team in (0, 1))
+ADVISOR_BITS = tuple(build_destination_bits(build_step_table(DIAGONAL_STEPS, PALACE_BITS[team])) for team in (0, 1))
+ELEPHANT_PAIRS = tuple(build_step_table(ELEPHANT_STEPS, HALF_BITS[team]) for team in (0, 1))
+HORSE_PAIRS = build_step_table(HORSE_STEPS)
+SIDEWAYS_BITS = build_destination_bits(build_step_table(SIDEWAYS_STEPS))
+FORWARD_BITS = tuple(build_destination_bits(build_step_table((SOLDIER_FORWARD_STEPS[team],))) for team in (0, 1))
+SOLDIER_BITS = tuple(
+    tuple(FORWARD_BITS[team][index] | (0 if SQUARE_BITS[index] & HALF_BITS[team] else SIDEWAYS_BITS[index])
+          for index in range(BOARD_SIZE))
+    for team in (0, 1))
+
+# The same tables turned around, giving the squares a piece of the team attacks an index from. They are used to test
+# whether a square is attacked without generating the moves of the attacking team.
+GENERAL_ATTACKER_BITS = tuple(build_destination_bits(build_attacker_table(build_step_table(ORTHOGONAL_STEPS,
+                                                                                          PALACE_BITS[team])))
+                              for team in (0, 1))
+ADVISOR_ATTACKER_BITS = tuple(build_destination_bits(build_attacker_table(build_step_table(DIAGONAL_STEPS,
+                                                                                          PALACE_BITS[team])))
+                              for team in (0, 1))
+ELEPHANT_ATTACKER_PAIRS = tuple(build_attacker_table(ELEPHANT_PAIRS[team]) for team in (0, 1))
+HORSE_ATTACKER_PAIRS = build_attacker_table(HORSE_PAIRS)
+HORSE_ATTACKER_BITS = build_destination_bits(HORSE_ATTACKER_PAIRS)
+SOLDIER_ATTACKER_BITS = tuple(
+    tuple(bits_of(attacker for attacker in range(BOARD_SIZE) if SOLDIER_BITS[team][attacker] & SQUARE_BITS[index])
+          for index in range(BOARD_SIZE))
+    for team in (0, 1))
+
+
+def build_line_slides(length):
+    """
+    Works out, for a row or column of the length given, what a Chariot or Cannon standing at each position sees for
+    every occupancy mask of the line (bit p set when position p is occupied; the piece's own bit is ignored). Each
+    answer is a (slides, quiet_moves, cannon_attacks) tuple of positions. slides are the positions up to and including
+    the first piece in each direction (what a Chariot attacks), quiet_moves the empty ones among them (where a Cannon
+    can move without capturing) and cannon_attacks the positions after that first piece (the screen) up to and
+    including the next piece. The higher direction comes first.
+
+    Only a few different answers are possible from each position, so for each position this returns the list of
+    different answers and a list giving, for every mask, the number of its answer in the first list.
+    """
+    line_slides = []
+    for position in range(length):
+
+        # Each direction only depends on the bits on its own side of the piece, so the two directions are walked
+        # once for every mask of their side and then put together for every mask of the whole line.
+        higher_answers = [walk_ray(range(position + 1, length), higher_mask << (position + 1))
+                          for higher_mask in range(1 << (length - position - 1))]
+        lower_answers = [walk_ray(range(position - 1, -1, -1), lower_mask) for lower_mask in range(1 << position)]
+        lower_bits = (1 << position) - 1
+        answers = {}
+        answer_numbers = []
+        for mask in range(1 << length):
+            higher = higher_answers[mask >> (position + 1)]
+            lower = lower_answers[mask & lower_bits]
+            answer = (higher[0] + lower[0], higher[1] + lower[1], higher[2] + lower[2])
+            answer_numbers.append(answers.setdefault(answer, len(answers)))
+        line_slides.append((list(answers), answer_numbers))
+    return line_slides
+
+
+def walk_ray(ray, mask):
+    """
+    Walks the positions of ray in order for build_line_slides(), where mask has bit p set when position p is occupied.
+    Returns the (slides, quiet_moves, cannon_attacks) tuple of positions for that one direction.
+    """
+    slides, quiet_moves, cannon_attacks = [], [], []
+    screened = False
+    for other_position in ray:
+        occupied = mask >> other_position & 1
+        if screened:
+            cannon_attacks.append(other_position)
+            if occupied:
+                break
+        else:
+            slides.append(other_position)
+            if occupied:
+                screened = True
+            else:
+                quiet_moves.append(other_position)
+    return tuple(slides), tuple(quiet_moves), tuple(cannon_attacks)
+
+
+# The answers of build_line_slides() for rows and columns, shared with the slide tables of XiangqiGame.
+LINE_SLIDES = {length: build_line_slides(length) for length in (BOARD_COLUMNS, BOARD_ROWS)}
+
+
+def build_slide_tables():
+    """
+    Builds RANK_SLIDE_BITS and FILE_SLIDE_BITS. RANK_SLIDE_BITS[index][mask] is the (slides, quiet_moves,
+    cannon_attacks) tuple of bitboards along the row of index for the occupancy mask of that row, and
+    FILE_SLIDE_BITS[index][mask] the same along its column. The answers of build_line_slides() are worked out once
+    per line length and then turned into bitboards for every row and column.
+    """
+    rank_slides = [None] * BOARD_SIZE
+    file_slides = [None] * BOARD_SIZE
+    lines = [[row * BOARD_COLUMNS + column for column in range(BOARD_COLUMNS)] for row in range(BOARD_ROWS)]
+    lines += [[row * BOARD_COLUMNS + column for row in range(BOARD_ROWS)] for column in range(BOARD_COLUMNS)]
+
+    # The answers are tuples of positions along the line. They are the same for every line of a length, so they are
+    # turned into position masks once per length.
+    line_slides = {}
+    for length, slides in LINE_SLIDES.items():
+        line_slides[length] = [([tuple(sum(1 << position for position in positions) for positions in answer)
+                                 for answer in answers], answer_numbers)
+                               for answers, answer_numbers in slides]
+    for line_number, line_indices in enumerate(lines):
+        table = rank_slides if line_number < BOARD_ROWS else file_slides
+
+        # The bitboard of every position mask of the line, each built from the one with its lowest bit cleared.
+        mask_bits = [0] * (1 << len(line_indices))
+        for mask in range(1, len(mask_bits)):
+            lowest_bit = mask & -mask
+            mask_bits[mask] = mask_bits[mask ^ lowest_bit] | SQUARE_BITS[line_indices[lowest_bit.bit_length() - 1]]
+
+        for index, (answers, answer_numbers) in zip(line_indices, line_slides[len(line_indices)]):
+            answer_bits = [tuple(mask_bits[position_mask] for position_mask in answer) for answer in answers]
+            table[index] = tuple([answer_bits[answer_number] for answer_number in answer_numbers])
+    return tuple(rank_slides), tuple(file_slides)
+
+
+RANK_SLIDE_BITS, FILE_SLIDE_BITS = build_slide_tables()
+
+# The squares in the row and column of an index, and those plus the squares diagonally next to it. A move that
+# neither starts nor ends on one of these can not expose the General on that index (see legal_moves()).
+# The slides of an empty line are the whole line.
+LINE_BITS = tuple(RANK_SLIDE_BITS[index][0][0] | FILE_SLIDE_BITS[index][0][0] for index in range(BOARD_SIZE))
+SENSITIVE_BITS = tuple(line_bits | diagonal_bits for line_bits, diagonal_bits
+                       in zip(LINE_BITS, build_destination_bits(build_step_table(DIAGONAL_STEPS))))
+
+
+class BitboardPosition:
+    """A Xiangqi position held as bitboards, with move generation, check detection and perft."""
+
+    def __init__(self):
+        """BitboardPosition constructor. The board starts out empty."""
+        self.clear()
+
+    def clear(self):
+        """Removes every piece."""
+        self._piece_bits = [0] * 14  # One bitboard per piece code.
+        self._team_bits = [0, 0]  # Every square occupied by each team.
+        self._occupancy = 0  # Every occupied square.
+        self._rotated_occupancy = 0  # Every occupied square, laid out column by column.
+        self._squares = [EMPTY] * BOARD_SIZE  # The piece code on every index, so a move knows what it captures.
+
+    def set_board_cells(self, board_cells):
+        """Sets the position from a flat list of 90 board cells holding XiangqiGame pieces or empty squares."""
+        self.clear()
+        for index, piece in enumerate(board_cells):
+            if piece.get_type() is not None:
+                self.add_piece(index, piece.get_team(), piece.get_type())
+
+    def add_piece(self, index, team, piece_type):
+        """Puts a piece of the team ('Red' or 'Black') and piece type on the index provided, replacing any piece."""
+        self.remove_piece(index)
+        code = get_piece_code(team, piece_type)
+        self._squares[index] = code
+        self.toggle_piece(index, code)
+
+    def remove_piece(self, index):
+        """Empties the index provided."""
+        code = self._squares[index]
+        if code != EMPTY:
+            self._squares[index] = EMPTY
+            self.toggle_piece(index, code)
+
+    def toggle_piece(self, index, code):
+        """Flips the bit of index in every bitboard that holds the piece code provided."""
+        square_bit = SQUARE_BITS[index]
+        self._piece_bits[code] ^= square_bit
+        self._team_bits[code // 7] ^= square_bit
+        self._occupancy ^= square_bit
+        self._rotated_occupancy ^= ROTATED_SQUARE_BITS[index]
+
+    def get_piece_bits(self, team, piece_type):
+        """Returns the bitboard of the pieces of the team and piece type provided."""
+        return self._piece_bits[get_piece_code(team, piece_type)]
+
+    def get_piece_indices(self, team):
+        """Returns the list of indices holding a piece of the team ('Red' or 'Black'), lowest first."""
+        return indices_of(self._team_bits[TEAM_NUMBERS[team]])
+
+    def get_occupancy(self):
+        """Returns the bitboard of every occupied square."""
+        return self._occupancy
+
+    def move(self, moving_from_index, moving_to_index):
+        """
+        Moves the piece on moving_from_index to moving_to_index without checking the move, and returns the code of
+        the piece it captured (EMPTY if none) for unmove().
+        """
+        squares = self._squares
+        code = squares[moving_from_index]
+        captured_code = squares[moving_to_index]
+        from_bit = SQUARE_BITS[moving_from_index]
+        to_bit = SQUARE_BITS[moving_to_index]
+        self._piece_bits[code] ^= from_bit | to_bit
+        self._team_bits[code // 7] ^= from_bit | to_bit
+        if captured_code == EMPTY:
+            self._occupancy ^= from_bit | to_bit
+            self._rotated_occupancy ^= ROTATED_SQUARE_BITS[moving_from_index] | ROTATED_SQUARE_BITS[moving_to_index]
+        else:
+            self._piece_bits[captured_code] ^= to_bit
+            self._team_bits[captured_code // 7] ^= to_bit
+            self._occupancy ^= from_bit
+            self._rotated_occupancy ^= ROTATED_SQUARE_BITS[moving_from_index]
+        squares[moving_to_index] = code
+        squares[moving_from_index] = EMPTY
+        return captured_code
+
+    def unmove(self, moving_from_index, moving_to_index, captured_code):
+        """Takes back a move() call, given the code of the piece it captured."""
+        squares = self._squares
+        code = squares[moving_to_index]
+        from_bit = SQUARE_BITS[moving_from_index]
+        to_bit = SQUARE_BITS[moving_to_index]
+        self._piece_bits[code] ^= from_bit | to_bit
+        self._team_bits[code // 7] ^= from_bit | to_bit
+        if captured_code == EMPTY:
+            self._occupancy ^= from_bit | to_bit
+            self._rotated_occupancy ^= ROTATED_SQUARE_BITS[moving_from_index] | ROTATED_SQUARE_BITS[moving_to_index]
+        else:
+            self._piece_bits[captured_code] ^= to_bit
+            self._team_bits[captured_code // 7] ^= to_bit
+            self._occupancy ^= from_bit
+            self._rotated_occupancy ^= ROTATED_SQUARE_BITS[moving_from_index]
+        squares[moving_from_index] = code
+        squares[moving_to_index] = captured_code
+
+    def is_attacked(self, index, team):
+        """Returns True if at least one piece of the team ('Red' or 'Black') attacks the index provided."""
+        return self.is_attacked_by_number(index, TEAM_NUMBERS[team])
+
+    def is_attacked_by_number(self, index, team):
+        """Team number version of is_attacked()."""
+        piece_bits = self._piece_bits
+        base = team * 7
+        occupancy = self._occupancy
+
+        # Chariots and Cannons, looked up along the row and column of the index.
+        rank_slides = RANK_SLIDE_BITS[index][occupancy >> RANK_SHIFTS[index] & RANK_MASK]
+        file_slides = FILE_SLIDE_BITS[index][self._rotated_occupancy >> FILE_SHIFTS[index] & FILE_MASK]
+        if (rank_slides[0] | file_slides[0]) & piece_bits[base + CHARIOT]:
+            return True
+        if (rank_slides[2] | file_slides[2]) & piece_bits[base + CANNON]:
+            return True
+
+        # Pieces that move a fixed step.
+        if SOLDIER_ATTACKER_BITS[team][index] & piece_bits[base + SOLDIER]:
+            return True
+        horses = piece_bits[base + HORSE]
+        if HORSE_ATTACKER_BITS[index] & horses:
+            for horse_bit, leg_bit in HORSE_ATTACKER_PAIRS[index]:
+                if horse_bit & horses and not leg_bit & occupancy:
+                    return True
+        if (GENERAL_ATTACKER_BITS[team][index] & piece_bits[base + GENERAL] or
+                ADVISOR_ATTACKER_BITS[team][index] & piece_bits[base + ADVISOR]):
+            return True
+        elephants = piece_bits[base + ELEPHANT]
+        if elephants:
+            for elephant_bit, eye_bit in ELEPHANT_ATTACKER_PAIRS[team][index]:
+                if elephant_bit & elephants and not eye_bit & occupancy:
+                    return True
+        return False
+
+    def is_general_safe(self, team):
+        """
+        Returns True if the General of the team ('Red' or 'Black') is on the board, is not attacked and can not see
+        the other General.
+        """
+        return self.is_general_safe_by_number(TEAM_NUMBERS[team])
+
+    def is_general_safe_by_number(self, team):
+        """
+        Team number version of is_general_safe(). The Generals see each other when the first piece up or down the
+        General's column is the other General.
+        """
+        general_bits = self._piece_bits[team * 7 + GENERAL]
+        if not general_bits:
+            return False
+        index = general_bits.bit_length() - 1
+        file_slides = FILE_SLIDE_BITS[index][self._rotated_occupancy >> FILE_SHIFTS[index] & FILE_MASK]
+        if file_slides[0] & self._piece_bits[(1 - team) * 7 + GENERAL]:
+            return False
+        return not self.is_attacked_by_number(index, 1 - team)
+
+    def is_in_check(self, team):
+        """Returns True if the General of the team ('Red' or 'Black') is attacked."""
+        team = TEAM_NUMBERS[team]
+        general_bits = self._piece_bits[team * 7 + GENERAL]
+        return general_bits != 0 and self.is_attacked_by_number(general_bits.bit_length() - 1, 1 - team)
+
+    def get_destination_bits(self, index, team):
+        """
+        Returns the bitboard of the squares the piece on index (which belongs to the team number provided) can move
+        to by its own rules, leaving out squares held by its own team.
+        """
+        code = self._squares[index]
+        piece_type = code - team * 7
+        occupancy = self._occupancy
+        own_bits = self._team_bits[team]
+        if piece_type == CHARIOT:
+            destination_bits = (RANK_SLIDE_BITS[index][occupancy >> RANK_SHIFTS[index] & RANK_MASK][0] |
+                                FILE_SLIDE_BITS[index][self._rotated_occupancy >> FILE_SHIFTS[index] & FILE_MASK][0])
+        elif piece_type == CANNON:
+            rank_slides = RANK_SLIDE_BITS[index][occupancy >> RANK_SHIFTS[index] & RANK_MASK]
+            file_slides = FILE_SLIDE_BITS[index][self._rotated_occupancy >> FILE_SHIFTS[index] & FILE_MASK]
+            return rank_slides[1] | file_slides[1] | ((rank_slides[2] | file_slides[2]) & self._team_bits[1 - team])
+        elif piece_type == HORSE or piece_type == ELEPHANT:
+            destination_bits = 0
+            pairs = HORSE_PAIRS[index] if piece_type == HORSE else ELEPHANT_PAIRS[team][index]
+            for destination_bit, blocking_bit in pairs:
+                if not blocking_bit & occupancy:
+                    destination_bits |= destination_bit
+        elif piece_type == SOLDIER:
+            destination_bits = SOLDIER_BITS[team][index]
+        elif piece_type == GENERAL:
+            destination_bits = GENERAL_BITS[team][index]
+        else:
+            destination_bits = ADVISOR_BITS[team][index]
+        return destination_bits & ~own_bits
+
+    def pseudo_legal_moves(self, team):
+        """
+        Returns every move of the team ('Red' or 'Black') as (moving_from_index, moving_to_index) tuples without
+        checking whether the move leaves its own General in check.
+        """
+        team = TEAM_NUMBERS[team]
+        moves = []
+        for moving_from_index in indices_of(self._team_bits[team]):
+            for moving_to_index in indices_of(self.get_destination_bits(moving_from_index, team)):
+                moves.append((moving_from_index, moving_to_index))
+        return moves
+
+    def legal_moves(self, team):
+        """
+        Returns every legal move of the team ('Red' or 'Black') as (moving_from_index, moving_to_index) tuples. Unless
+        the team is in check, only moves of the General and moves that start or end next to the General's lines (see
+        SENSITIVE_BITS) can expose it, so only those are made and tested.
+        """
+        return self.legal_moves_by_number(TEAM_NUMBERS[team])
+
+    def legal_moves_by_number(self, team, stop_at_first=False):
+        """Team number version of legal_moves(). With stop_at_first, returns as soon as one legal move is found."""
+        general_bits = self._piece_bits[team * 7 + GENERAL]
+        if not general_bits:
+            return []
+        general_index = general_bits.bit_length() - 1
+        in_check = not self.is_general_safe_by_number(team)
+        line_bits = LINE_BITS[general_index]
+        sensitive_bits = SENSITIVE_BITS[general_index]
+
+        moves = []
+        piece_bits = self._team_bits[team]
+        while piece_bits:
+            from_bit = piece_bits & -piece_bits
+            piece_bits ^= from_bit
+            moving_from_index = from_bit.bit_length() - 1
+            needs_test = in_check or from_bit & general_bits or from_bit & sensitive_bits
+            destination_bits = self.get_destination_bits(moving_from_index, team)
+            while destination_bits:
+                to_bit = destination_bits & -destination_bits
+                destination_bits ^= to_bit
+                moving_to_index = to_bit.bit_length() - 1
+                if needs_test or to_bit & line_bits:
+                    captured_code = self.move(moving_from_index, moving_to_index)
+                    safe = self.is_general_safe_by_number(team)
+                    self.unmove(moving_from_index, moving_to_index, captured_code)
+                    if not safe:
+                        continue
+                moves.append((moving_from_index, moving_to_index))
+                if stop_at_first:
+                    return moves
+        return moves
+
+    def has_legal_move(self, team):
+        """Returns True if the team ('Red' or 'Black') has at least one legal move."""
+        return bool(self.legal_moves_by_number(TEAM_NUMBERS[team], True))
+
+    def is_legal_move(self, team, moving_from_index, moving_to_index):
+        """Returns True if moving the team's piece on moving_from_index to moving_to_index is a legal move."""
+        team = TEAM_NUMBERS[team]
+        if not 0 <= moving_from_index < BOARD_SIZE or not 0 <= moving_to_index < BOARD_SIZE:
+            return False
+        code = self._squares[moving_from_index]
+        if code == EMPTY or code // 7 != team:
+            return False
+        if not self.get_destination_bits(moving_from_index, team) & SQUARE_BITS[moving_to_index]:
+            return False
+        captured_code = self.move(moving_from_index, moving_to_index)
+        safe = self.is_general_safe_by_number(team)
+        self.unmove(moving_from_index, moving_to_index, captured_code)
+        return safe
+
+    def perft(self, depth, team):
+        """
+        Counts the positions reachable in exactly depth moves with the team ('Red' or 'Black') to move. The position
+        is unchanged when it returns.
+        """
+        return self.perft_by_number(depth, TEAM_NUMBERS[team])
+
+    def perft_by_number(self, depth, team):
+        """Team number version of perft()."""
+        if depth <= 0:
+            return 1
+        moves = self.legal_moves_by_number(team)
+        if depth == 1:
+            return len(moves)
+        nodes = 0
+        for moving_from_index, moving_to_index in moves:
+            captured_code = self.move(moving_from_index, moving_to_index)
+            nodes += self.perft_by_number(depth - 1, 1 - team)
+            self.unmove(moving_from_index, moving_to_index, captured_code)
+        return nodes
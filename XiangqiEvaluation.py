@@ -0,0 +1,152 @@
+# Author: George Kochera
+# Date: 3/12/2020
+# Description: Portfolio Project - XiangqiEvaluation.py
+
+# Static evaluation of Xiangqi positions. Every piece is worth its material value plus a bonus (or penalty) for the
+# square it stands on, read from a piece-square table. A position is scored as the sum over Red's pieces minus the sum
+# over Black's pieces, so positive scores favor Red. Units are such that a Soldier that has not crossed the river is
+# worth 100.
+#
+# The tables are written from Red's side of the board, one row per rank with rank 10 (the far side) first, exactly as
+# the board indices are laid out. Black uses the same tables mirrored top to bottom. Soldiers only ever move forward,
+# so a Soldier stands on the far side of the river exactly when has_crossed_river() is True, and the Soldier table adds
+# the bonus for crossing on every square past the river.
+#
+# XiangqiGame keeps the score of its position up to date as pieces are added, moved and removed (see get_evaluation()),
+# so reading it during a search costs nothing. evaluate_position() works the score out from scratch and can be used on
+# its own to score any position.
+#
+# This module does not import XiangqiGame, since XiangqiGame imports the tables from here.
+
+# The material value of each piece type. The General can never be captured so it has no value.
+PIECE_VALUES = {'General': 0, 'Advisor': 200, 'Elephant': 200, 'Horse': 400, 'Cannon': 450, 'Chariot': 900,
+                'Soldier': 100}
+
+# Piece-square tables from Red's side of the board, rank 10 first. Squares a piece can never reach are 0.
+PIECE_SQUARE_TABLES = {
+    'General': (
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, -20, -25, -20, 0, 0, 0),
+        (0, 0, 0, -10, -10, -10, 0, 0, 0),
+        (0, 0, 0, -5, 5, -5, 0, 0, 0),
+    ),
+    'Advisor': (
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, -5, 0, -5, 0, 0, 0),
+        (0, 0, 0, 0, 5, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    ),
+    'Elephant': (
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, -5, 0, 0, 0, -5, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (-5, 0, 0, 0, 5, 0, 0, 0, -5),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    ),
+    'Horse': (
+        (0, -5, 0, 0, 0, 0, 0, -5, 0),
+        (0, 10, 20, 15, 0, 15, 20, 10, 0),
+        (5, 20, 25, 30, 20, 30, 25, 20, 5),
+        (5, 20, 25, 30, 30, 30, 25, 20, 5),
+        (5, 15, 20, 25, 25, 25, 20, 15, 5),
+        (0, 10, 15, 20, 20, 20, 15, 10, 0),
+        (0, 5, 10, 15, 10, 15, 10, 5, 0),
+        (0, 5, 10, 10, 5, 10, 10, 5, 0),
+        (-5, 0, 0, 5, -10, 5, 0, 0, -5),
+        (-10, -5, 0, -5, -10, -5, 0, -5, -10),
+    ),
+    'Chariot': (
+        (10, 15, 10, 20, 20, 20, 10, 15, 10),
+        (15, 20, 20, 25, 20, 25, 20, 20, 15),
+        (10, 15, 15, 20, 20, 20, 15, 15, 10),
+        (10, 15, 15, 20, 20, 20, 15, 15, 10),
+        (10, 15, 15, 20, 20, 20, 15, 15, 10),
+        (5, 10, 10, 15, 15, 15, 10, 10, 5),
+        (0, 5, 5, 10, 10, 10, 5, 5, 0),
+        (0, 5, 5, 10, 5, 10, 5, 5, 0),
+        (-5, 5, 5, 5, 0, 5, 5, 5, -5),
+        (-10, 5, 0, 5, 0, 5, 0, 5, -10),
+    ),
+    'Cannon': (
+        (10, 10, 0, -5, -10, -5, 0, 10, 10),
+        (5, 5, 0, -5, -5, -5, 0, 5, 5),
+        (5, 5, 0, -5, 5, -5, 0, 5, 5),
+        (0, 5, 5, 5, 10, 5, 5, 5, 0),
+        (0, 0, 5, 5, 10, 5, 5, 0, 0),
+        (0, 0, 5, 5, 10, 5, 5, 0, 0),
+        (0, 0, 5, 5, 10, 5, 5, 0, 0),
+        (0, 5, 5, 10, 15, 10, 5, 5, 0),
+        (0, 5, 5, 5, 10, 5, 5, 5, 0),
+        (0, 0, 5, 5, 5, 5, 5, 0, 0),
+    ),
+    'Soldier': (
+        (100, 100, 120, 140, 150, 140, 120, 100, 100),
+        (110, 130, 150, 170, 180, 170, 150, 130, 110),
+        (110, 130, 150, 160, 170, 160, 150, 130, 110),
+        (100, 120, 130, 140, 150, 140, 130, 120, 100),
+        (100, 100, 110, 120, 120, 120, 110, 100, 100),
+        (0, 0, 5, 0, 10, 0, 5, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+        (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    ),
+}
+
+
+def build_piece_square_values():
+    """
+    Combines the material values and piece-square tables into one tuple of 90 values per (team, piece type), indexed
+    by board index. Black's values are mirrored top to bottom and negated so a position's score is a plain sum.
+    """
+    piece_square_values = {}
+    for piece_type, table in PIECE_SQUARE_TABLES.items():
+        red_values = tuple(PIECE_VALUES[piece_type] + value for row in table for value in row)
+        black_values = tuple(-PIECE_VALUES[piece_type] - value for row in reversed(table) for value in row)
+        piece_square_values['Red', piece_type] = red_values
+        piece_square_values['Black', piece_type] = black_values
+    return piece_square_values
+
+
+PIECE_SQUARE_VALUES = build_piece_square_values()
+
+
+def get_piece_square_value(team, piece_type, index):
+    """Returns what a piece of team and piece_type on the board index provided adds to the score (Red positive)."""
+    return PIECE_SQUARE_VALUES[team, piece_type][index]
+
+
+def evaluate_position(game):
+    """
+    Scores the position of the game provided from scratch by summing the value of every piece on the board. Positive
+    scores favor Red. XiangqiGame.get_evaluation() returns the same score without the scan.
+    """
+    score = 0
+    for piece in game.get_board_cells():
+        if piece.get_type() is not None:
+            score += PIECE_SQUARE_VALUES[piece.get_team(), piece.get_type()][piece.get_index()]
+    return score
+
+
+def evaluate_for_player(game, player):
+    """Returns the score of the game's position from the point of view of the player provided."""
+    if player == 'Red':
+        return game.get_evaluation()
+    return -game.get_evaluation()
@@ -11,10 +11,11 @@
 #
 # To begin a game, simply instantiate a new XiangqiGame object. The board is set when the object is constructed. The
 # key commands to use are make_move() which takes two strings in the form of algebraic notation: the piece to move,
-# and where to move it to. The second command is get_game_state(). It returns whether the game is still unfinished or
-# if it has been won (and by whom). The last key command is is_in_check(). It takes one argument as a string,
-# either 'Black' or 'Red' and will indicate if that person's general is in a check condition. It evaluates the board
-# at the time the method is called so the status is not 'stale'.
+# and where to move it to. The second command is get_game_state(). It returns whether the game is still unfinished,
+# if it has been won (and by whom) or if it has been drawn. The last key command is is_in_check(). It takes one
+# argument as a string, either 'Black' or 'Red' and will indicate if that person's general is in a check condition. It
+# evaluates the board at the time the method is called so the status is not 'stale'. Any other position can be set up
+# by passing a FEN string to the constructor (or set_fen()) and to_fen() writes the current position back out.
 #
 # Due to the size of this project, this description is far from comprehensive. TA's, instructors and other readers
 # are encouraged to review the assocated comments and docstrings for further details on the application.
@@ -25,11 +26,19 @@
 #
 # The term 'square' is an informal data structure that is used THORUGHOUT this code. It refers to the
 # string that holds the position in algebraic notation. 'e1', 'f9', 'c3', and 'i10' are all 'square's.
+#
+# The term 'index' refers to the integer the engine uses internally for the same position. The board is a flat list
+# of 90 cells and 'a10' is index 0, 'i10' is index 8 and 'i1' is index 89. Squares are only translated to and from
+# indices at the edges of the API (make_move(), get_game_piece_at_position() and the GamePiece constructors).
 
 # --- BEGIN APPLICATION CODE ---
 
-# Regular expressions are used to validate user input so that library is imported.
-import re
+# The random module is used (with a fixed seed) to generate the Zobrist hashing keys. The piece values used to keep
+# the evaluation of the position up to date come from XiangqiEvaluation. XiangqiBitboard provides the bitboard backend
+# (see XiangqiGame's constructor) and the Chariot and Cannon line answers the slide tables are built from.
+import random
+from XiangqiEvaluation import PIECE_SQUARE_VALUES, evaluate_position
+from XiangqiBitboard import BitboardPosition, LINE_SLIDES, get_piece_code
 
 # Module Constants that are used to traverse between algebraic notation and column/row tuples a.k.a. array indices.
 # The squares that define the palace for each player are also defined here.
@@ -39,26 +48,235 @@ FILE_KEY = {0: 'a', 1: 'b', 2: 'c', 3: 'd', 4: 'e', 5: 'f', 6: 'g', 7: 'h', 8: '
 RANK_KEY = {9: '1', 8: '2', 7: '3', 6: '4', 5: '5', 4: '6', 3: '7', 2: '8', 1: '9', 0: '10'}
 BLACK_PALACE = ('d10', 'e10', 'f10', 'd9', 'e9', 'f9', 'd8', 'e8', 'f8')
 RED_PALACE = ('d1', 'e1', 'f1', 'd2', 'e2', 'f2', 'd3', 'e3', 'f3')
-SQUARE_REGEX = re.compile("[a-i]{1}[1-9]{1}0?")
+
+# The board is a flat list of 90 cells. The index of a square is row * BOARD_COLUMNS + column, where row 0 is rank 10
+# and column 0 is file 'a'. SQUARES turns an index into a square and SQUARE_INDICES turns a square into an index, so
+# converting at the API boundary is a single lookup instead of parsing the string.
+BOARD_COLUMNS = 9
+BOARD_ROWS = 10
+BOARD_SIZE = BOARD_COLUMNS * BOARD_ROWS
+SQUARES = tuple(FILE_KEY[index % BOARD_COLUMNS] + RANK_KEY[index // BOARD_COLUMNS] for index in range(BOARD_SIZE))
+SQUARE_INDICES = {square: index for index, square in enumerate(SQUARES)}
+BLACK_PALACE_INDICES = frozenset(SQUARE_INDICES[square] for square in BLACK_PALACE)
+RED_PALACE_INDICES = frozenset(SQUARE_INDICES[square] for square in RED_PALACE)
+
+# (column, row) steps for the four orthogonal directions: right, left, down (towards Red) and up (towards Black),
+# followed by the four diagonal directions.
+ORTHOGONAL_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+DIAGONAL_DIRECTIONS = ((1, 1), (-1, -1), (1, -1), (-1, 1))
+
+
+def build_neighbor_table(directions):
+    """
+    Builds a tuple with one entry per board index. Each entry is a tuple of the indices one step away from that index
+    in each of the (column, row) directions given, leaving out the steps that fall off the board.
+    """
+    table = []
+    for index in range(BOARD_SIZE):
+        column, row = index % BOARD_COLUMNS, index // BOARD_COLUMNS
+        table.append(tuple((row + row_delta) * BOARD_COLUMNS + column + column_delta
+                           for column_delta, row_delta in directions
+                           if 0 <= column + column_delta < BOARD_COLUMNS and 0 <= row + row_delta < BOARD_ROWS))
+    return tuple(table)
+
+
+# Lookup tables used to work out which pieces need their attacks recalculated when a square changes. A Horse's leg is
+# always orthogonally next to the Horse and an Elephant's eye is always diagonally next to the Elephant. Chariots and
+# Cannons can be affected by any square in the same row or column.
+ORTHOGONAL_NEIGHBORS = build_neighbor_table(ORTHOGONAL_DIRECTIONS)
+DIAGONAL_NEIGHBORS = build_neighbor_table(DIAGONAL_DIRECTIONS)
+ROW_AND_COLUMN_INDICES = tuple(
+    tuple(other for other in range(BOARD_SIZE)
+          if other != index and (other // BOARD_COLUMNS == index // BOARD_COLUMNS or
+                                 other % BOARD_COLUMNS == index % BOARD_COLUMNS))
+    for index in range(BOARD_SIZE))
+
+# The halves of the board. Black's half is rows 0-4 and Red's half is rows 5-9, so a piece is across the river when it
+# stands in the other team's half.
+BLACK_HALF_INDICES = frozenset(range(BOARD_SIZE // 2))
+RED_HALF_INDICES = frozenset(range(BOARD_SIZE // 2, BOARD_SIZE))
+
+
+def build_move_table(steps, allowed_indices=None):
+    """
+    Builds a tuple with one entry per board index. Each entry is a tuple of (destination, blocking_index) pairs for the
+    (column, row) steps given, leaving out steps that fall off the board or land outside allowed_indices. The blocking
+    index is the square that must be empty for the move: the Elephant's eye halfway along a two square diagonal step,
+    the Horse's leg one square along the long side of its step, or None for one square steps that can not be blocked.
+    """
+    table = []
+    for index in range(BOARD_SIZE):
+        column, row = index % BOARD_COLUMNS, index // BOARD_COLUMNS
+        moves = []
+        for column_delta, row_delta in steps:
+            if not (0 <= column + column_delta < BOARD_COLUMNS and 0 <= row + row_delta < BOARD_ROWS):
+                continue
+            destination = (row + row_delta) * BOARD_COLUMNS + column + column_delta
+            if allowed_indices is not None and destination not in allowed_indices:
+                continue
+            if abs(column_delta) == 2 or abs(row_delta) == 2:
+                blocking_index = (row + int(row_delta / 2)) * BOARD_COLUMNS + column + int(column_delta / 2)
+            else:
+                blocking_index = None
+            moves.append((destination, blocking_index))
+        table.append(tuple(moves))
+    return tuple(table)
+
+
+def build_destination_table(move_table):
+    """Strips the blocking indices from a table made by build_move_table(), leaving a tuple of destinations."""
+    return tuple(tuple(destination for destination, blocking_index in moves) for moves in move_table)
+
+
+def build_soldier_move_table(team):
+    """
+    Builds the destinations of a Soldier of the team provided from every board index: the square in front of it and,
+    once it stands across the river, the squares to its left and right. Red moves up the board (decreasing row).
+    """
+    forward_step = (0, -1) if team == 'Red' else (0, 1)
+    own_half = RED_HALF_INDICES if team == 'Red' else BLACK_HALF_INDICES
+    forward_moves = build_destination_table(build_move_table((forward_step,)))
+    sideways_moves = build_destination_table(build_move_table(((-1, 0), (1, 0))))
+    return tuple(forward_moves[index] + (() if index in own_half else sideways_moves[index])
+                 for index in range(BOARD_SIZE))
+
+
+# Move tables for the pieces that move a fixed number of squares, built once when the module is imported so generating
+# their moves is a lookup plus, for the Horse and Elephant, a check that one square is empty. The General, Advisor and
+# Soldier tables give the destinations from each index. The Elephant and Horse tables give (destination, eye or leg)
+# pairs. Tables that depend on the team are dictionaries keyed by team.
+HORSE_STEPS = ((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, 1), (2, -1), (1, -2), (-1, -2))
+ELEPHANT_STEPS = ((-2, -2), (2, 2), (2, -2), (-2, 2))
+GENERAL_MOVES = {'Red': build_destination_table(build_move_table(ORTHOGONAL_DIRECTIONS, RED_PALACE_INDICES)),
+                 'Black': build_destination_table(build_move_table(ORTHOGONAL_DIRECTIONS, BLACK_PALACE_INDICES))}
+ADVISOR_MOVES = {'Red': build_destination_table(build_move_table(DIAGONAL_DIRECTIONS, RED_PALACE_INDICES)),
+                 'Black': build_destination_table(build_move_table(DIAGONAL_DIRECTIONS, BLACK_PALACE_INDICES))}
+ELEPHANT_MOVES = {'Red': build_move_table(ELEPHANT_STEPS, RED_HALF_INDICES),
+                  'Black': build_move_table(ELEPHANT_STEPS, BLACK_HALF_INDICES)}
+HORSE_MOVES = build_move_table(HORSE_STEPS)
+SOLDIER_MOVES = {'Red': build_soldier_move_table('Red'), 'Black': build_soldier_move_table('Black')}
+
+
+def build_ray_table():
+    """
+    Builds a tuple with one entry per board index. Each entry holds four rays, one per orthogonal direction, and each
+    ray is the tuple of indices walking away from the index to the edge of the board, nearest first.
+    """
+    table = []
+    for index in range(BOARD_SIZE):
+        column, row = index % BOARD_COLUMNS, index // BOARD_COLUMNS
+        rays = []
+        for column_delta, row_delta in ORTHOGONAL_DIRECTIONS:
+            ray = []
+            ray_column, ray_row = column + column_delta, row + row_delta
+            while 0 <= ray_column < BOARD_COLUMNS and 0 <= ray_row < BOARD_ROWS:
+                ray.append(ray_row * BOARD_COLUMNS + ray_column)
+                ray_column, ray_row = ray_column + column_delta, ray_row + row_delta
+            rays.append(tuple(ray))
+        table.append(tuple(rays))
+    return tuple(table)
+
+
+def build_horse_check_table():
+    """
+    Builds a tuple with one entry per board index. Each entry is a tuple of (horse_index, leg_index) pairs, one for
+    every square a Horse could attack the index from, with the leg that Horse needs to be empty.
+    """
+    table = [[] for index in range(BOARD_SIZE)]
+    for horse_index in range(BOARD_SIZE):
+        for destination, leg_index in HORSE_MOVES[horse_index]:
+            table[destination].append((horse_index, leg_index))
+    return tuple(tuple(pairs) for pairs in table)
+
+
+# The rays leaving every index and the squares a Horse can attack every index from, used to find what checks and pins
+# a General (see compute_check_info()).
+LINE_RAYS = build_ray_table()
+HORSE_CHECKS = build_horse_check_table()
+
+
+def build_slide_table(line_slides, line_indices):
+    """
+    Turns the answers XiangqiBitboard.build_line_slides() worked out for one row or column into board indices.
+    line_indices holds the board index of each position along the line. Returns a list with one entry per position,
+    each a tuple indexed by occupancy mask. Masks with the same answer share one tuple.
+    """
+    table = []
+    for answers, answer_numbers in line_slides:
+        converted_answers = [tuple([tuple(map(line_indices.__getitem__, positions)) for positions in answer])
+                             for answer in answers]
+        table.append(tuple([converted_answers[answer_number] for answer_number in answer_numbers]))
+    return table
+
+
+def build_slide_tables():
+    """
+    Builds RANK_SLIDES and FILE_SLIDES. RANK_SLIDES[index][mask] is the (slides, quiet_moves, cannon_attacks) tuple
+    (see XiangqiBitboard.build_line_slides()) of board indices along the row of index, for the occupancy mask of that
+    row (bit column set when the square in that column is occupied). FILE_SLIDES[index][mask] is the same along the
+    column of index, with bit row set when the square in that row is occupied.
+    """
+    rank_slides = [None] * BOARD_SIZE
+    file_slides = [None] * BOARD_SIZE
+    rank_line_slides = LINE_SLIDES[BOARD_COLUMNS]
+    file_line_slides = LINE_SLIDES[BOARD_ROWS]
+    for row in range(BOARD_ROWS):
+        line_indices = [row * BOARD_COLUMNS + column for column in range(BOARD_COLUMNS)]
+        for index, entries in zip(line_indices, build_slide_table(rank_line_slides, line_indices)):
+            rank_slides[index] = entries
+    for column in range(BOARD_COLUMNS):
+        line_indices = [row * BOARD_COLUMNS + column for row in range(BOARD_ROWS)]
+        for index, entries in zip(line_indices, build_slide_table(file_line_slides, line_indices)):
+            file_slides[index] = entries
+    return tuple(rank_slides), tuple(file_slides)
+
+
+# Slide tables for the Chariot and Cannon, built once when the module is imported. XiangqiGame keeps an occupancy mask
+# for every row and column (see get_rank_occupancy() and get_file_occupancy()), so everything a Chariot or Cannon can
+# reach along a line is one lookup instead of a walk along it. The entries give the squares to the right, then left,
+# then down (towards Red), then up, the same order as ORTHOGONAL_DIRECTIONS.
+SLIDES = 0  # Index of the slides in a RANK_SLIDES or FILE_SLIDES entry.
+QUIET_MOVES = 1  # Index of the quiet moves.
+CANNON_ATTACKS = 2  # Index of the Cannon attacks.
+RANK_SLIDES, FILE_SLIDES = build_slide_tables()
+
+# Zobrist hashing keys. Every (team, piece type) pair has one random 64 bit key per board index, and there is one more
+# key for Black being the player to move. The key of a position is the XOR of the keys of every piece on its square
+# (and the side key when it is Black's turn), so it can be updated with a couple of XORs whenever a piece moves. The
+# generator is seeded so keys are identical between runs and processes.
+PIECE_TYPES = ('General', 'Advisor', 'Elephant', 'Horse', 'Chariot', 'Cannon', 'Soldier')
+_zobrist_random = random.Random(0x5849414E47)
+ZOBRIST_PIECE_KEYS = {(team, piece_type): tuple(_zobrist_random.getrandbits(64) for index in range(BOARD_SIZE))
+                      for team in ('Red', 'Black') for piece_type in PIECE_TYPES}
+ZOBRIST_BLACK_TO_MOVE_KEY = _zobrist_random.getrandbits(64)
 
 
 # These methods are static methods. They do not require a class to run. They do serve as helper functions to perform
 # specific tasks for objects.
 
 
+def square_to_index(square):
+    """
+    Converts from algebraic notation to a board index. Returns None for invalid and out-of-bounds values (index 0 is
+    a valid square, so False can not be used here).
+    """
+    return SQUARE_INDICES.get(square)
+
+
+def index_to_square(index):
+    """Converts from a board index to a string in algebraic notation."""
+    return SQUARES[index]
+
+
 def algebraic_notation_to_indices(square):
     """
     Converts from algebraic notation to column/row index. Also checks for invalid and out-of-bounds values. Will
     return false when this happens.
     """
-    if not SQUARE_REGEX.match(square):
-        return False
-    try:
-        column = COLUMN_KEY[square[:1]]
-        row = ROW_KEY[int(square[1:])]
-    except KeyError:
+    index = SQUARE_INDICES.get(square)
+    if index is None:
         return False
-    return column, row
+    return index % BOARD_COLUMNS, index // BOARD_COLUMNS
 
 
 def indices_to_algebraic_notation(column, row):
@@ -66,157 +284,98 @@ def indices_to_algebraic_notation(column, row):
     Converts from a column/row index to a string in algebraic notation. Will return false if an out of bounds
     value is attempted.
     """
-    try:
-        rank = RANK_KEY[row]
-        file = FILE_KEY[column]
-    except KeyError:
-        return False
-    return file + rank
+    if 0 <= column < BOARD_COLUMNS and 0 <= row < BOARD_ROWS:
+        return SQUARES[row * BOARD_COLUMNS + column]
+    return False
 
 
-def is_backwards_move(moving_from_square, moving_to_square, team):
-    """Simply checks for a backward movement depending on which player is making the move."""
+def is_across_river(index, team):
+    """Checks to see if the index is on the opponent's side of the river for the team provided."""
     if team == 'Black':
-        if algebraic_notation_to_indices(moving_from_square)[1] > algebraic_notation_to_indices(moving_to_square)[1]:
-            return True
-        return False
-    else:
-        if algebraic_notation_to_indices(moving_from_square)[1] < algebraic_notation_to_indices(moving_to_square)[1]:
-            return True
-        return False
+        return index // BOARD_COLUMNS >= 5
+    return index // BOARD_COLUMNS <= 4
 
 
-def is_vertical_or_horizontal_move(moving_from_square, moving_to_square):
-    """Enforces both vertical and horizontal movement. Disallows diagonal movement."""
-    return is_vertical_move(moving_from_square, moving_to_square) or \
-           is_horizontal_move(moving_from_square, moving_to_square)
-
-
-def is_vertical_move(moving_from_square, moving_to_square):
+def is_vertical_move(moving_from_index, moving_to_index):
     """Checks to see if the move is within a single column (vertical)."""
-    column_from = algebraic_notation_to_indices(moving_from_square)[0]
-    column_to = algebraic_notation_to_indices(moving_to_square)[0]
-    if column_from == column_to:
-        return True
-    return False
-
-
-def is_horizontal_move(moving_from_square, moving_to_square):
-    """Checks to see if the move is within a single row (horizontal)."""
-    row_from = algebraic_notation_to_indices(moving_from_square)[1]
-    row_to = algebraic_notation_to_indices(moving_to_square)[1]
-    if row_from == row_to:
-        return True
-    return False
+    return moving_from_index % BOARD_COLUMNS == moving_to_index % BOARD_COLUMNS
 
 
-def piece_linear_path_helper(moving_from_square, moving_to_square):
+def get_line_slides(game, index):
     """
-    Creates a list of every square from one square to another (inclusive) which starts with the from square at
-    index 0. Used by functions such as can_generals_not_see_each_other() to see which pieces exist within the same file.
+    Returns the RANK_SLIDES and FILE_SLIDES tuples for a Chariot or Cannon on the board index provided, given the
+    game's current occupancy masks for the row and column of that index.
     """
-    column_from, row_from = algebraic_notation_to_indices(moving_from_square)
-    column_to, row_to = algebraic_notation_to_indices(moving_to_square)
-
-    squares_between_piece_and_target = []
+    row, column = divmod(index, BOARD_COLUMNS)
+    return RANK_SLIDES[index][game.get_rank_occupancy()[row]], FILE_SLIDES[index][game.get_file_occupancy()[column]]
 
-    # When the column is equal, we search within the column and work either up or down depending on the arguments.
-    if column_from == column_to:
-        if row_from > row_to:
-            for space in range(row_to, row_from + 1):
-                squares_between_piece_and_target.insert(0, indices_to_algebraic_notation(column_from, space))
-        else:
-            for space in range(row_from, row_to + 1):
-                squares_between_piece_and_target.append(indices_to_algebraic_notation(column_from, space))
-
-    # When the row is equal, we search within the row and work right or left based on the arguments passed.
-    else:
-        if column_from > column_to:
-            for space in range(column_to, column_from + 1):
-                squares_between_piece_and_target.insert(0, indices_to_algebraic_notation(space, row_from))
-        else:
-            for space in range(column_from, column_to + 1):
-                squares_between_piece_and_target.append(indices_to_algebraic_notation(space, row_from))
 
-    # We return a list of squares from moving_from_square to moving_to_square (inclusive). Index 0 is
-    # moving_from_square.
-    return squares_between_piece_and_target
+def compute_zobrist_key(game):
+    """
+    Calculates the Zobrist key for the game's position from scratch by scanning every square. XiangqiGame keeps the
+    same key up to date incrementally (see get_zobrist_key()), so this is only needed when a board is loaded.
+    """
+    key = 0
+    for index, piece in enumerate(game.get_board_cells()):
+        if piece.get_type() is not None:
+            key ^= ZOBRIST_PIECE_KEYS[piece.get_team(), piece.get_type()][index]
+    if game.get_current_player() == 'Black':
+        key ^= ZOBRIST_BLACK_TO_MOVE_KEY
+    return key
 
 
 def generate_threat_dictionary(game, current_player):
     """
     Helper function that scans the entire game board for pieces that belong to the opponent and returns a dictionary
     containing all the possible moves every opponent piece can make. Keys are the GamePiece objects/Values are
-    lists of the possible moves for that GamePiece.
+    lists of the possible moves (indices) for that GamePiece.
     """
     threats = dict()
-    board = game.get_game_board()
 
     # Scan every square on the board for a piece that does not belong to the current player. When one is found,
     # the list possible moves for that piece is called, which returns a list of possible moves that piece can make.
-    for row in board:
-        for piece in row:
-            if piece.get_team() is not current_player:
-                if piece.get_team() is not None:
-                    threats[piece] = piece.list_possible_moves(game)
+    for piece in game.get_board_cells():
+        if piece.get_team() is not current_player:
+            if piece.get_team() is not None:
+                threats[piece] = piece.list_possible_moves(game)
 
     # Return the dictionary containing all of the opponents possible moves when done.
     return threats
 
 
-def try_move(moving_from_square, moving_to_square, game, evaluate_for_opposing_general=False):
+def try_move(moving_from_index, moving_to_index, game, evaluate_for_opposing_general=False):
     """
     This function executes when is_in_check() asks a piece to try a specific move. The basic premise of this function
-    is to move the piece, see if the current player is in check (by evaluating for threats), or becomes in check,
-    and then return the pieces to their starting position. If the move results in a check condition: False is
-    returned otherwise True is returned.
+    is to move the piece, see if the current player is in check (by looking the general up in the attack table), or
+    becomes in check, and then return the pieces to their starting position. If the move results in a check
+    condition: False is returned otherwise True is returned.
     """
 
-    # Get the piece we are moving and its position
-    piece_on_moving_from_square = game.get_game_piece_at_position(moving_from_square)
-    old_position = piece_on_moving_from_square.get_position()
-
-    # Find the general for the team of the piece we are moving, the current general. When checking for check for the
-    # opposite team, we set evaluate_for_opposing_general to True
+    # Find the team whose general we are protecting, the current general. When checking for check for the opposite
+    # team, we set evaluate_for_opposing_general to True
     if evaluate_for_opposing_general:
-        current_general = find_opposing_general(game)
+        team = game.get_defending_player()
     else:
-        current_general = find_current_general(game)
-
-    current_general_position = current_general.get_position()
-
-    # Save the piece on the landing square in case there is something there
-    piece_at_destination = game.get_game_piece_at_position(moving_to_square)
-
-    # Remove the piece at the old position, set the piece on the new position.
-    game.remove_piece(old_position)
-    piece_on_moving_from_square.set_position(moving_to_square)
-    game.add_piece(piece_on_moving_from_square)
+        team = game.get_current_player()
+    if team == 'Red':
+        enemy = 'Black'
+    else:
+        enemy = 'Red'
+
+    # Make the move. The attack tables are updated for the squares involved, so we can simply look up whether the
+    # general (wherever it is after the move) is attacked. If the general was captured, the move obviously fails.
+    captured_piece = game.move_piece(moving_from_index, moving_to_index)
+    current_general = game.get_general(team)
+    if current_general is None:
+        move_results_in_check = True
+    else:
+        move_results_in_check = game.is_square_attacked_by(current_general.get_index(), enemy)
 
     # See if the generals can see each other; False if they can. True if they can't.
     generals_can_not_see_each_other = can_generals_not_see_each_other(game)
 
-    # Generate the threat dictionary for the board in the updated state.
-    new_threat_dictionary = generate_threat_dictionary(game, current_general.get_team())
-
     # Move the board back
-    game.remove_piece(moving_to_square)
-    game.add_piece(piece_at_destination)
-    piece_on_moving_from_square.set_position(old_position)
-    game.add_piece(piece_on_moving_from_square)
-
-    # If the current general's position is found in the new threat dictionary, which contains all the moves possible
-    # if the hypothetical move occurred, the move results in check and the appropriate flag is set.
-    move_results_in_check = False
-    for piece in new_threat_dictionary:
-        if current_general_position in new_threat_dictionary[piece]:
-            move_results_in_check = True
-
-        # If the piece that moved is a General we have to evaluate both positions, origin and destination to ensure the
-        # General escapes check and is not moving into check.
-        if game.get_game_piece_at_position(moving_from_square).get_type() == 'General':
-            if moving_to_square in new_threat_dictionary[piece]:
-                move_results_in_check = True
+    game.unmove_piece(moving_from_index, moving_to_index, captured_piece)
 
     # The results of the analysis are returned; False if the move results in check, true otherwise.
     if move_results_in_check:
@@ -231,30 +390,9 @@ def try_move(moving_from_square, moving_to_square, game, evaluate_for_opposing_g
 
 def find_current_general(game):
     """
-    Simple function that searches the board and returns the General object belonging to the team of the current player.
-    """
-    current_general = None
-    board = game.get_game_board()
-    for row in board:
-        for space in row:
-            if space.get_type() == 'General' and space.get_team() == game.get_current_player():
-                current_general = space
-
-    return current_general
-
-
-def find_opposing_general(game):
-    """
-    Simple function that searches the board and returns the General object belonging to the team of the opposing player.
+    Simple function that returns the General object belonging to the team of the current player.
     """
-    opposing_general = None
-    board = game.get_game_board()
-    for row in board:
-        for space in row:
-            if space.get_type() == 'General' and space.get_team() != game.get_current_player():
-                opposing_general = space
-
-    return opposing_general
+    return game.get_general(game.get_current_player())
 
 
 def can_generals_not_see_each_other(game):
@@ -262,100 +400,264 @@ def can_generals_not_see_each_other(game):
     Checks to see if the General piece for both players are in the same column/file. If they are, it determines if 
     there is at least one piece (obstruction) intervening between the two Generals.
     """
-    # Get the position for each general and then get the indices for each general for comparison.
-    opposing_general_position = find_opposing_general(game).get_position()
-    current_general_position = find_current_general(game).get_position()
-    opposing_general_column, opposing_general_row = algebraic_notation_to_indices(opposing_general_position)
-    current_general_column, current_general_row = algebraic_notation_to_indices(current_general_position)
+    # Get the index for each general for comparison. If a general is missing there is nothing to see.
+    red_general = game.get_general('Red')
+    black_general = game.get_general('Black')
+    if red_general is None or black_general is None:
+        return True
+    black_general_index = black_general.get_index()
+    red_general_index = red_general.get_index()
 
     # If both Generals are in different columns, return true, no need to examine any further.
-    if opposing_general_column != current_general_column:
+    if not is_vertical_move(black_general_index, red_general_index):
         return True
 
-    # Line of sight is the path between the two General pieces. We only care about the pieces in between the generals.
-    line_of_sight = piece_linear_path_helper(current_general_position, opposing_general_position)
-    line_of_sight = line_of_sight[1:len(line_of_sight) - 1]
+    # Line of sight is the path between the two General pieces. If there is at least one GamePiece in the region
+    # between the two Generals, there is an obstruction and we return True. The rows between them are masked out of
+    # the occupancy mask of their column.
+    top_row = min(black_general_index, red_general_index) // BOARD_COLUMNS
+    bottom_row = max(black_general_index, red_general_index) // BOARD_COLUMNS
+    between_mask = (1 << bottom_row) - (1 << (top_row + 1))
+    return game.get_file_occupancy()[black_general_index % BOARD_COLUMNS] & between_mask != 0
+
+
+class CheckInfo:
+    """
+    Everything that decides whether a move leaves a player's General safe in one position, worked out once by
+    compute_check_info(). With it the legality of most moves is a set lookup; only moves of the General itself, moves
+    while in check and positions where the Generals already face each other need the move to be made and tested.
+    """
+
+    def __init__(self, zobrist_key, general_index, checker_indices, blocking_indices, screen_indices, pins,
+                 screen_squares, must_test_every_move):
+        """CheckInfo constructor. See compute_check_info() for what each part holds."""
+        self._zobrist_key = zobrist_key
+        self._general_index = general_index
+        self._checker_indices = checker_indices
+        self._blocking_indices = blocking_indices
+        self._screen_indices = screen_indices
+        self._pins = pins
+        self._screen_squares = screen_squares
+        self._must_test_every_move = must_test_every_move
+
+    def get_zobrist_key(self):
+        """Returns the Zobrist key of the position this was worked out for."""
+        return self._zobrist_key
+
+    def get_checker_indices(self):
+        """Returns the set of indices of the enemy pieces giving check."""
+        return self._checker_indices
+
+    def get_blocking_indices(self):
+        """Returns the set of empty indices a check could be blocked on."""
+        return self._blocking_indices
+
+    def get_screen_indices(self):
+        """Returns the set of indices of the player's own pieces acting as the screen of a checking Cannon."""
+        return self._screen_indices
+
+    def get_pins(self):
+        """
+        Returns a dictionary from the index of every pinned piece to the set of indices it may still move to. A piece
+        pinned against a Chariot, a Cannon or the other General may only move along the line between them, and a piece
+        blocking the leg of a Horse may only take the Horse.
+        """
+        return self._pins
+
+    def get_screen_squares(self):
+        """Returns the set of empty indices where a piece would become the screen of a Cannon aimed at the General."""
+        return self._screen_squares
+
+    def is_in_check(self):
+        """Returns True if the General is in check."""
+        return bool(self._checker_indices)
+
+    def must_test_every_move(self):
+        """Returns True if every move has to be made and tested, because the position is not an ordinary one."""
+        return self._must_test_every_move
+
+    def classify_move(self, moving_from_index, moving_to_index):
+        """
+        Returns True if the move is known to leave the General safe, False if it is known not to, or None if the move
+        has to be made and tested: a move of the General itself, or a capture, block or screen move while in check.
+        """
+        if moving_from_index == self._general_index or self._must_test_every_move:
+            return None
+        if self._checker_indices:
+            if moving_to_index in self._checker_indices or moving_to_index in self._blocking_indices or \
+                    moving_from_index in self._screen_indices:
+                return None
+            return False
+        allowed_indices = self._pins.get(moving_from_index)
+        if allowed_indices is not None and moving_to_index not in allowed_indices:
+            return False
+        return moving_to_index not in self._screen_squares
+
+
+def add_pin(pins, index, allowed_indices):
+    """Pins the piece on index to allowed_indices, keeping only the squares allowed by every pin on it."""
+    if index in pins:
+        pins[index] = pins[index] & allowed_indices
+    else:
+        pins[index] = allowed_indices
 
-    # If there is at least one GamePiece in the region between the two Generals, there is an obstruction. 
-    obstruction = False
-    for square in line_of_sight:
-        if game.get_game_piece_at_position(square).get_type() is not None:
-            obstruction = True
 
-    # If the Generals view is obstructed, we return True.
-    return obstruction
+def compute_check_info(game, player):
+    """
+    Works out the CheckInfo of player's General in the game's current position. Each of the four lines leaving the
+    General is walked to its first three pieces, which finds every Chariot and Cannon check, every piece pinned against
+    a Chariot, a Cannon (two pieces between them, either of which leaving would give the Cannon its screen) or the
+    other General, and every empty square where a piece would become a Cannon's screen. The squares a Horse could
+    check from find Horse checks and pieces blocking a Horse's leg, and the four squares next to the General find
+    Soldier checks.
+    """
+    if player == 'Red':
+        enemy = 'Black'
+    else:
+        enemy = 'Red'
+    general = game.get_general(player)
+    if general is None:
+        return CheckInfo(game.get_zobrist_key(), None, set(), set(), set(), {}, set(), True)
+    general_index = general.get_index()
+    board = game.get_board_cells()
+    checker_indices = set()
+    blocking_indices = set()
+    screen_indices = set()
+    pins = {}
+    screen_squares = set()
+    must_test_every_move = False
+
+    for ray in LINE_RAYS[general_index]:
+
+        # Find the positions along the ray of the first three pieces, nearest first.
+        found = []
+        for position, index in enumerate(ray):
+            if board[index] is not EMPTY_SQUARE:
+                found.append(position)
+                if len(found) == 3:
+                    break
+        if not found:
+            continue
+        first_piece = board[ray[found[0]]]
+        first_type = first_piece.get_type()
+
+        # The first piece: an enemy Chariot gives check, an enemy Cannon would be given a screen by any piece moving
+        # in between and the enemy General means the Generals already face each other.
+        if first_piece.get_team() == enemy:
+            if first_type == 'Chariot':
+                checker_indices.add(ray[found[0]])
+                blocking_indices.update(ray[:found[0]])
+            elif first_type == 'Cannon':
+                screen_squares.update(ray[:found[0]])
+            elif first_type == 'General':
+                must_test_every_move = True
+
+        # The second piece: an enemy Cannon gives check over the first piece. An enemy Chariot or General pins the
+        # first piece to the line if it is the player's own.
+        if len(found) > 1:
+            second_piece = board[ray[found[1]]]
+            if second_piece.get_team() == enemy:
+                if second_piece.get_type() == 'Cannon':
+                    checker_indices.add(ray[found[1]])
+                    blocking_indices.update(ray[:found[0]] + ray[found[0] + 1:found[1]])
+                    if first_piece.get_team() == player:
+                        screen_indices.add(ray[found[0]])
+                elif first_piece.get_team() == player:
+                    if second_piece.get_type() == 'Chariot':
+                        add_pin(pins, ray[found[0]], frozenset(ray[:found[1] + 1]))
+                    elif second_piece.get_type() == 'General':
+                        add_pin(pins, ray[found[0]], frozenset(ray[:found[1]]))
+
+        # The third piece: an enemy Cannon pins both pieces in front of it if they are the player's own, since
+        # either one leaving the line (or taking the other) would leave the Cannon one screen.
+        if len(found) == 3:
+            third_piece = board[ray[found[2]]]
+            if third_piece.get_team() == enemy and third_piece.get_type() == 'Cannon':
+                line_indices = frozenset(ray[:found[2] + 1])
+                for pinned_position, other_position in ((found[0], found[1]), (found[1], found[0])):
+                    if board[ray[pinned_position]].get_team() == player:
+                        add_pin(pins, ray[pinned_position], line_indices - {ray[other_position]})
+
+    # A Horse checks unless its leg is blocked. If the player's own piece is the block, it may only take the Horse.
+    for horse_index, leg_index in HORSE_CHECKS[general_index]:
+        horse = board[horse_index]
+        if horse.get_type() != 'Horse' or horse.get_team() != enemy:
+            continue
+        if board[leg_index] is EMPTY_SQUARE:
+            checker_indices.add(horse_index)
+            blocking_indices.add(leg_index)
+        elif board[leg_index].get_team() == player:
+            add_pin(pins, leg_index, frozenset((horse_index,)))
+
+    # An enemy Soldier next to the General checks if it can step onto the General's square.
+    for index in ORTHOGONAL_NEIGHBORS[general_index]:
+        soldier = board[index]
+        if soldier.get_type() == 'Soldier' and soldier.get_team() == enemy and \
+                general_index in SOLDIER_MOVES[enemy][index]:
+            checker_indices.add(index)
+
+    return CheckInfo(game.get_zobrist_key(), general_index, checker_indices, blocking_indices, screen_indices, pins,
+                     screen_squares, must_test_every_move)
 
 
 class GamePiece:
     """
-    Base class for all game pieces. GamePiece also exclusively represents empty spaces on the board. Pieces that
-    are not empty spaces are subclassed (derived) from GamePiece. Empty spaces will not be subclassed but 
-    self._piece_type will be None.
+    Base class for all game pieces. Pieces are subclassed (derived) from GamePiece. Empty spaces on the board are all
+    the one EMPTY_SQUARE object, whose self._piece_type is None.
     """
 
+    # Only these attributes differ from one piece to the next. __slots__ keeps every piece object small since there is
+    # no per-object dictionary.
+    __slots__ = ('_piece_type', '_team', '_has_crossed_river', '_index')
+
+    # What a type of piece is allowed to do is the same for every piece of that type, so it is kept on the class and
+    # overridden by the subclasses that need to.
+    _rules = ()  # Tuple of tuples that identify valid moves for a piece. Not all pieces have this.
+    _is_allowed_to_leave_palace = True  # Determines if piece is allowed to leave the palace.
+    _is_allowed_to_cross_river = True  # Determines if the piece is allowed to cross the river.
+    _has_static_move_set = False  # Determines if the piece will use its move table to determine valid moves.
+    _move_table = None  # The piece's destinations from every index by team (see GENERAL_MOVES). Not all have this.
+
     def __init__(self, piece_type, team, square):
         """
-        Every derivative class needs to know these traits such as what type of piece they are, if they are allowed
-        to leave the palace, or if they have crossed the river. Every game piece is created by giving it a piece_type (
-        string/given by subclass constructor), a team (string), and a square (string).
+        Every derivative class needs to know these traits such as what type of piece they are, or if they have crossed
+        the river. Every game piece is created by giving it a piece_type (string/given by subclass constructor), a team
+        (string), and a square (string).
         """
         self._piece_type = piece_type  # Assigned by subclass constructor. None for empty spaces.
         self._team = team  # Either 'Red' or 'Black'. Assigned by add_piece().
-        self._rules = []  # List of tuples that identify valid moves for a piece. Not all pieces have this.
-        self._is_allowed_to_leave_palace = True  # Determines if piece is allowed to leave the palace.
-        self._is_allowed_to_cross_river = True  # Determines if the piece is allowed to cross the river.
         self._has_crossed_river = False  # Determines if the piece has crossed the river.
-        self._position = square  # Holds the current position for the piece.
-        self._has_static_move_set = False  # Determines if the piece will use _rules to determine valid moves.
+        self._index = square_to_index(square)  # Holds the current position (board index) for the piece.
 
     def list_possible_moves(self, game):
         """
-        Returns a list of possible moves for the piece. The piece requires a XiangqiGame object to have access to
-        the board and board methods. This will only be called for rule based pieces such as the Soldier, General and
-        Advisor.
+        Returns the possible moves (indices) for the piece according to its rule set, read from the piece's move table.
+        The piece requires a XiangqiGame object to have access to the board and board methods. This will only be
+        called for rule based pieces such as the Soldier, General and Advisor; the other pieces override it. The list
+        is a new copy, so the caller may change it.
         """
+        return list(self._move_table[self._team][self._index])
 
-        # We start with a list of possible moves, we will also need the current position of the piece, and its indices.
-        possible_moves = []
-        current_square = self.get_position()
-        current_column, current_row = algebraic_notation_to_indices(current_square)
-
-        # Compile a list of valid possible moves for the piece based on the pieces rule set.
-        rules = self.get_rules()
-        for rule in rules:
-            possible_move = indices_to_algebraic_notation(current_column + rule[0], current_row + rule[1])
-
-            # Since the conversion will return False on out of bounds entries, we only add valid moves to the list to
-            # start with. This eliminates 'False' from being appended to the list.
-            if possible_move:
-                possible_moves.append(possible_move)
-
-        # Apply the remaining rules to the piece such as...
-        for possible_move in possible_moves:
-
-            # If the piece has to stay in the palace, we enforce that here.
-            if not game.get_game_piece_at_position(current_square).is_allowed_to_leave_palace():
-                if game.get_game_piece_at_position(current_square).get_team() == 'Black':
-                    if possible_move not in BLACK_PALACE:
-                        possible_moves.remove(possible_move)
-                else:
-                    if possible_move not in RED_PALACE:
-                        possible_moves.remove(possible_move)
-
-            # Make sure if the piece is not allowed to cross the river, it doesn't.
-            if not game.get_game_piece_at_position(current_square).is_allowed_to_cross_river():
-                team = game.get_game_piece_at_position(current_square).get_team()
-                if team == 'Black':
-                    if algebraic_notation_to_indices(possible_move)[1] >= 5:
-                        possible_moves.remove(possible_move)
-                else:
-                    if algebraic_notation_to_indices(possible_move)[1] <= 4:
-                        possible_moves.remove(possible_move)
+    def list_attacked_squares(self, game):
+        """
+        Returns a list of the indices (squares) this piece attacks, no matter who is standing on them. The attack
+        tables kept by XiangqiGame are built from this method. Rule based pieces such as the General and Advisor attack
+        every square in their rule set, pieces that can be blocked or that move differently override it. The shared
+        move table entry is returned as it is, so callers must not change it.
+        """
+        return self._move_table[self._team][self._index]
 
-        # Once the possible moves have been generated, we return the list.
-        return possible_moves
+    def list_pseudo_legal_moves(self, game):
+        """
+        Returns the indices the piece can move to according to its own rules, without looking at whether the move
+        would leave its General in check. For every piece except the Cannon, those are the squares it attacks that
+        are not occupied by its own team, so the list comes straight from the game's attack tables.
+        """
+        board = game.get_board_cells()
+        team = self.get_team()
+        return [index for index in game.get_piece_attacks(self) if board[index].get_team() != team]
 
-    def is_valid_move(self, game, moving_from_square, moving_to_square):
+    def is_valid_move(self, game, moving_from_index, moving_to_index):
         """
         Used to process a piece's ruleset. Depending on the piece, this method may be called in addition to a
         subclass method that overrides this method. This method enforces valid moves by the player. In addition to
@@ -363,37 +665,30 @@ class GamePiece:
         """
 
         # If the piece has a static move set, run through it to see if the move is valid according to the ruleset.
-        if game.get_game_piece_at_position(moving_from_square).has_static_move_set():
-            valid_move_according_to_rules = False
-            possible_moves = self.list_possible_moves(game)
-            if moving_to_square in possible_moves:
-                valid_move_according_to_rules = True
-
-            if not valid_move_according_to_rules:
+        if game.get_game_piece_at_index(moving_from_index).has_static_move_set():
+            if moving_to_index not in self._move_table[self._team][self._index]:
                 return False
 
-        # Checking for out-of-bounds rows and columns
-        if not algebraic_notation_to_indices(moving_from_square):
+        # Checking for out-of-bounds indices
+        if not 0 <= moving_from_index < BOARD_SIZE:
             return False
-        elif not algebraic_notation_to_indices(moving_to_square):
+        elif not 0 <= moving_to_index < BOARD_SIZE:
             return False
 
         # Make sure player is not trying to capture its own piece.
-        if game.get_game_piece_at_position(moving_to_square).get_team() == \
-                game.get_game_piece_at_position(moving_from_square).get_team():
+        if game.get_game_piece_at_index(moving_to_index).get_team() == \
+                game.get_game_piece_at_index(moving_from_index).get_team():
             return False
 
         # Make sure the player is not trying to no-move (to and from are the same space).
-        if algebraic_notation_to_indices(moving_from_square) == algebraic_notation_to_indices(moving_to_square):
+        if moving_from_index == moving_to_index:
             return False
 
         return True
 
-    def move_piece(self, game, moving_from_square, moving_to_square):
-        """Updates the self._position value to the new square."""
-        self.set_position(moving_to_square)
-        game.remove_piece(moving_from_square)
-        game.add_piece(self)
+    def move_piece(self, game, moving_from_index, moving_to_index):
+        """Moves the piece on the game board, which also updates the self._index value to the new square."""
+        game.move_piece(moving_from_index, moving_to_index)
 
     def get_type(self):
         """Returns the piece type."""
@@ -405,19 +700,29 @@ class GamePiece:
 
     def get_rules(self):
         """
-        Returns the list of tuples that denote the valid moves the piece can make. Used for limited movement
+        Returns the tuple of tuples that denote the valid moves the piece can make. Used for limited movement
         pieces such as the Solider and General. Pieces such as the Cannon do not implement this since the number of
         moves they can make at any point are variable.
         """
         return self._rules
 
     def set_position(self, square):
-        """Sets the position of the piece."""
-        self._position = square
+        """Sets the position of the piece from a square in algebraic notation."""
+        self._index = square_to_index(square)
 
     def get_position(self):
-        """Gets the position for the piece."""
-        return self._position
+        """Gets the position for the piece as a square in algebraic notation."""
+        if self._index is None:
+            return None
+        return SQUARES[self._index]
+
+    def set_index(self, index):
+        """Sets the position of the piece from a board index."""
+        self._index = index
+
+    def get_index(self):
+        """Gets the board index for the piece."""
+        return self._index
 
     def has_static_move_set(self):
         """Gets the boolean value for if the piece has a static moveset."""
@@ -435,9 +740,9 @@ class GamePiece:
         """Returns a boolean indicating if the piece has crossed the river in the current game."""
         return self._has_crossed_river
 
-    def set_crossed_river(self):
-        """Sets the _has_crossed_river attribute for the piece to true."""
-        self._has_crossed_river = True
+    def set_crossed_river(self, has_crossed_river=True):
+        """Sets the _has_crossed_river attribute for the piece to true (or to the value provided)."""
+        self._has_crossed_river = has_crossed_river
 
     def debug_team_color_string_helper(self, label):
         """Used by debug_print_board() to colorize each cell of the board according to the team of the piece."""
@@ -449,44 +754,69 @@ class GamePiece:
             return '\033[48;5;238m' + label + '\033[0m'
 
 
+class EmptySquare(GamePiece):
+    """
+    An empty space on the board. There is only ever one of these, EMPTY_SQUARE, and every empty space on every board
+    is that same object. It has no type, team or position and can not be changed.
+    """
+
+    __slots__ = ()
+
+    def __init__(self):
+        """EmptySquare constructor. Only used to make EMPTY_SQUARE."""
+        for name, value in (('_piece_type', None), ('_team', None), ('_has_crossed_river', False), ('_index', None)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        """Overridden so the one shared empty square can not be changed by accident."""
+        raise AttributeError('EMPTY_SQUARE can not be changed')
+
+
+EMPTY_SQUARE = EmptySquare()
+
+
 class General(GamePiece):
     """General GamePiece. Contains the ruleset, data to aid in debugging and also overrides is_valid_move()."""
 
+    __slots__ = ()
+    _rules = ((0, 1), (1, 0), (0, -1), (-1, 0))
+    _is_allowed_to_leave_palace = False
+    _has_static_move_set = True
+    _move_table = GENERAL_MOVES
+
     def __init__(self, team, square):
         """General constructor. Has a ruleset and cannot leave the palace."""
         super().__init__('General', team, square)
-        self._rules = [(0, 1), (1, 0), (0, -1), (-1, 0)]
-        self._is_allowed_to_leave_palace = False
-        self._has_static_move_set = True
 
     def __str__(self):
         """Overridden to colorize text."""
         return self.debug_team_color_string_helper('  General  ')
 
-    def is_valid_move(self, game, moving_from_square, moving_to_square):
+    def is_valid_move(self, game, moving_from_index, moving_to_index):
         """
         Tries to move the General, returns False if that results in check. Determines if the move will result in
         check. Try_move checks to see if there is 'flying general' conflict also, so we don't have to check for that
-        here.
+        here. The ruleset is checked first so that only moves the General could actually make are tried.
         """
-        if self.get_team() != game.get_current_player():
-            if not try_move(moving_from_square, moving_to_square, game, True):
-                return False
-            return super().is_valid_move(game, moving_from_square, moving_to_square)
-        if not try_move(moving_from_square, moving_to_square, game):
+        if not super().is_valid_move(game, moving_from_index, moving_to_index):
             return False
-        return super().is_valid_move(game, moving_from_square, moving_to_square)
+        if self.get_team() != game.get_current_player():
+            return try_move(moving_from_index, moving_to_index, game, True)
+        return try_move(moving_from_index, moving_to_index, game)
 
 
 class Advisor(GamePiece):
     """Advisor GamePiece."""
 
+    __slots__ = ()
+    _rules = ((-1, -1), (1, 1), (-1, 1), (1, -1))
+    _is_allowed_to_leave_palace = False
+    _has_static_move_set = True
+    _move_table = ADVISOR_MOVES
+
     def __init__(self, team, square):
         """Has a ruleset and cannot leave the palace."""
         super().__init__('Advisor', team, square)
-        self._rules = [(-1, -1), (1, 1), (-1, 1), (1, -1)]
-        self._is_allowed_to_leave_palace = False
-        self._has_static_move_set = True
 
     def __str__(self):
         """Overridden to colorize text."""
@@ -496,44 +826,50 @@ class Advisor(GamePiece):
 class Elephant(GamePiece):
     """Elephant GamePiece. Contains the ruleset and data to aid in debugging."""
 
+    __slots__ = ()
+    _rules = ((-2, -2), (2, 2), (2, -2), (-2, 2))
+    _is_allowed_to_cross_river = False
+    _has_static_move_set = True
+
     def __init__(self, team, square):
         """Has a ruleset and cannot cross the river."""
         super().__init__('Elephant', team, square)
-        self._rules = [(-2, -2), (2, 2), (2, -2), (-2, 2)]
-        self._is_allowed_to_cross_river = False
-        self._has_static_move_set = True
 
     def __str__(self):
         """Overridden to colorize text."""
         return self.debug_team_color_string_helper('  Elephant ')
 
-    def is_valid_move(self, game, moving_from_square, moving_to_square):
+    def list_possible_moves(self, game):
+        """Returns the squares the Elephant could move to if nothing stood on its eyes."""
+        return [destination for destination, eye_index in ELEPHANT_MOVES[self._team][self._index]]
+
+    def list_attacked_squares(self, game):
         """
-        Processes the ruleset for an Elephant GamePiece. The subclass version of the function checks what is being
-        referred to as the intermediate space. For example, an elephant at 'c1' moving to 'a3' would have to traverse
-        the intermediate space of 'b2'. This overriding function ensures that we are not 'jumping' any pieces. When
-        the function is done, we then call the superclass version of the method to check the remaing rules.
+        An Elephant only attacks the squares in its rule set where the intermediate space (the 'eye') is empty. The
+        eye of every move is stored next to its destination in ELEPHANT_MOVES.
         """
+        board = game.get_board_cells()
+        return [destination for destination, eye_index in ELEPHANT_MOVES[self._team][self._index]
+                if board[eye_index] is EMPTY_SQUARE]
 
-        # Check the intermediate space for piece to ensure that no jumps occurred.
-        if algebraic_notation_to_indices(moving_to_square)[0] > algebraic_notation_to_indices(moving_from_square)[0]:
-            intermediate_column = algebraic_notation_to_indices(moving_from_square)[0] + 1
-        else:
-            intermediate_column = algebraic_notation_to_indices(moving_from_square)[0] - 1
-        if algebraic_notation_to_indices(moving_to_square)[1] > algebraic_notation_to_indices(moving_from_square)[1]:
-            intermediate_row = algebraic_notation_to_indices(moving_from_square)[1] + 1
-        else:
-            intermediate_row = algebraic_notation_to_indices(moving_from_square)[1] - 1
-        if game.get_game_piece_at_position(indices_to_algebraic_notation(intermediate_column,
-                                                                         intermediate_row)).get_type() is \
-                not None:
-            return False
-        return super().is_valid_move(game, moving_from_square, moving_to_square)
+    def is_valid_move(self, game, moving_from_index, moving_to_index):
+        """
+        Processes the ruleset for an Elephant GamePiece. For example, an elephant at 'c1' moving to 'a3' would have to
+        traverse the intermediate space of 'b2', so the move is only valid if 'b2' is empty. The move must be in the
+        Elephant's move table, which also keeps it on its own side of the river, and must not capture its own piece.
+        """
+        board = game.get_board_cells()
+        for destination, eye_index in ELEPHANT_MOVES[self._team][moving_from_index]:
+            if destination == moving_to_index:
+                return board[eye_index] is EMPTY_SQUARE and board[moving_to_index].get_team() != self._team
+        return False
 
 
 class Chariot(GamePiece):
     """Chariot GamePiece. Contains the ruleset and data to aid in debugging."""
 
+    __slots__ = ()
+
     def __init__(self, team, square):
         """No special variables."""
         super().__init__('Chariot', team, square)
@@ -542,26 +878,18 @@ class Chariot(GamePiece):
         """Overridden to colorize text."""
         return self.debug_team_color_string_helper('  Chariot  ')
 
-    def is_valid_move(self, game, moving_from_square, moving_to_square):
+    def is_valid_move(self, game, moving_from_index, moving_to_index):
         """
-        The Chariot must first move either vertically or horizontally. We then make sure we aren't jumping any
-        pieces. These are the only two rules for the Chariot as it considered one of the most 'free' pieces in the
-        game.
+        The Chariot must move either vertically or horizontally without jumping any pieces. These are the only two
+        rules for the Chariot as it considered one of the most 'free' pieces in the game. Every square it can reach
+        that way is in its slides (see get_line_slides()).
         """
-        # First we need to ensure vertical or horizontal movement.
-        if not is_vertical_or_horizontal_move(moving_from_square, moving_to_square):
+        rank_slides, file_slides = get_line_slides(game, moving_from_index)
+        if moving_to_index not in rank_slides[SLIDES] and moving_to_index not in file_slides[SLIDES]:
             return False
 
-        # Make a list of every square between the Chariot and its destination
-        squares_between_chariot_and_target = piece_linear_path_helper(moving_from_square, moving_to_square)
-
-        # Now we check each square in the list for pieces to make sure none are being 'jumped'.
-        for square in squares_between_chariot_and_target:
-            if square == moving_from_square or square == moving_to_square:
-                continue
-            elif game.get_game_piece_at_position(square).get_type() is not None:
-                return False
-        return True
+        # Run the superclass version of this method to make sure the Chariot is not capturing its own piece.
+        return super().is_valid_move(game, moving_from_index, moving_to_index)
 
     def list_possible_moves(self, game):
         """
@@ -569,164 +897,71 @@ class Chariot(GamePiece):
         the player enters, the possible moves will be different in quantity.
         """
 
-        # We setup a list for possible moves and confirmed moves, get the current position for the piece,
-        # duplicate the column and row so they can be used in looping algorithms.
-        possible_moves = []
+        # We examine each attacked square against the superclass method to ensure we aren't breaking any of the
+        # general constraints of the game (such as capturing our own piece). If they're valid, they are added to
+        # confirmed moves, which is returned by this method.
+        current_index = self.get_index()
         confirmed_moves = []
-        current_square = self.get_position()
-        current_column, current_row = algebraic_notation_to_indices(current_square)
-        column, row = current_column, current_row
-        searching = True  # True while the algorithm is running.
-        empty_space = True  # True if the loop detects an empty space, becomes False when another GamePiece is detected.
-
-        # This loop evaluates each direction outward from the Chariot. Each leg of the loop terminates when another
-        # GamePiece that is not of type None (empty space) is encountered.
-        while searching:
-
-            # Search outward to the right
-            column = current_column + 1
-
-            # While we only see empty spaces search...
-            while empty_space:
-
-                # If we are still within the bounds of the game board...
-                if indices_to_algebraic_notation(column, row):
-
-                    # Get the type of piece on the current space, if None, add it to the list, otherwise add it to
-                    # the list and stop searching (since we can't jump pieces).
-                    if game.get_game_piece_at_position(indices_to_algebraic_notation(column, row)).get_type() is None:
-                        possible_moves.append(indices_to_algebraic_notation(column, row))
-                    else:
-                        possible_moves.append(indices_to_algebraic_notation(column, row))
-                        empty_space = False
-                    column += 1
-                else:
-                    empty_space = False
-
-            # Reset and start searching outward to the left.
-            column = current_column - 1
-            empty_space = True
-            while empty_space:
-                if indices_to_algebraic_notation(column, row):
-                    if game.get_game_piece_at_position(indices_to_algebraic_notation(column, row)).get_type() is None:
-                        possible_moves.append(indices_to_algebraic_notation(column, row))
-                    else:
-                        possible_moves.append(indices_to_algebraic_notation(column, row))
-                        empty_space = False
-                    column -= 1
-                else:
-                    empty_space = False
-
-            # Reset and start searching downward. (Increasing array index.)
-            column = current_column
-            row = current_row + 1
-            empty_space = True
-            while empty_space:
-                if indices_to_algebraic_notation(column, row):
-                    if game.get_game_piece_at_position(indices_to_algebraic_notation(column, row)).get_type() is None:
-                        possible_moves.append(indices_to_algebraic_notation(column, row))
-                    else:
-                        possible_moves.append(indices_to_algebraic_notation(column, row))
-                        empty_space = False
-                    row += 1
-                else:
-                    empty_space = False
-
-            # Reset and start searching upward. (Decreasing array index.)
-            row = current_row - 1
-            empty_space = True
-            while empty_space:
-                if indices_to_algebraic_notation(column, row):
-                    if game.get_game_piece_at_position(indices_to_algebraic_notation(column, row)).get_type() is None:
-                        possible_moves.append(indices_to_algebraic_notation(column, row))
-                    else:
-                        possible_moves.append(indices_to_algebraic_notation(column, row))
-                        empty_space = False
-                    row -= 1
-                else:
-                    empty_space = False
-
-            # We are done so we break the outtermost while loop.
-            searching = False
-
-        # We examine each move against the superclass method to ensure we aren't breaking any of the general
-        # constraints of the game. If they're valid, they are added to confirmed moves, which is returned by this
-        # method.
-        for move in possible_moves:
-            if super().is_valid_move(game, current_square, move):
+        for move in self.list_attacked_squares(game):
+            if super().is_valid_move(game, current_index, move):
                 confirmed_moves.append(move)
 
         return confirmed_moves
 
+    def list_attacked_squares(self, game):
+        """
+        Returns every square the Chariot attacks. Searching outward in each direction, that is every empty square up
+        to and including the first GamePiece encountered, which is looked up in the slide tables.
+        """
+        rank_slides, file_slides = get_line_slides(game, self._index)
+        return rank_slides[SLIDES] + file_slides[SLIDES]
+
 
 class Horse(GamePiece):
     """Horse GamePiece. Contains the ruleset and data to aid in debugging."""
 
+    __slots__ = ()
+    _rules = ((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, 1), (2, -1), (1, -2), (-1, -2))
+    _has_static_move_set = True
+
     def __init__(self, team, square):
         """Horse has a ruleset."""
         super().__init__('Horse', team, square)
-        self._rules = [(-2, -1), (-2, 1), (-1, 2), (1, 2), (2, 1), (2, -1), (1, -2), (-1, -2)]
-        self._has_static_move_set = True
 
     def __str__(self):
         """Overridden to colorize text."""
         return self.debug_team_color_string_helper('   Horse   ')
 
-    def is_valid_move(self, game, moving_from_square, moving_to_square):
+    def list_possible_moves(self, game):
+        """Returns the squares the Horse could move to if none of its legs were hobbled."""
+        return [destination for destination, leg_index in HORSE_MOVES[self._index]]
+
+    def list_attacked_squares(self, game):
         """
-        Processes the ruleset for a Horse GamePiece. This method overrides the superclass method because we must
-        check for conditions such as 'hobbling the horses foot'. That is, there can be no obstructing pieces between
-        the Horse and its destination (moving_to_square).
+        A Horse only attacks the squares in its rule set where its leg is not 'hobbled'. The leg is the square one
+        step from the Horse in the direction it travels two spaces, and is stored next to its destination in
+        HORSE_MOVES.
         """
+        board = game.get_board_cells()
+        return [destination for destination, leg_index in HORSE_MOVES[self._index] if board[leg_index] is EMPTY_SQUARE]
 
-        # We get the column and row indices of the origin and destination fo the horse, we also calculate the
-        # difference between the values which will give us the direction the piece is travelling.
-        column_from = algebraic_notation_to_indices(moving_from_square)[0]
-        column_to = algebraic_notation_to_indices(moving_to_square)[0]
-        column_delta = column_to - column_from
-        row_from = algebraic_notation_to_indices(moving_from_square)[1]
-        row_to = algebraic_notation_to_indices(moving_to_square)[1]
-        row_delta = row_to - row_from
-
-        # We know that if the piece is moving to the right overall 2 spaces, we have to check one space to the right
-        # first. If this space is obstructed, the move is not valid.
-        if column_delta == 2:
-            # check the same row to the right 1
-            intermediate_position = indices_to_algebraic_notation(column_to - 1, row_from)
-            if game.get_game_piece_at_position(intermediate_position).get_type() is not None:
-                return False
-
-        # If we are moving overall left 2 spaces, check one space to the left.
-        elif column_delta == -2:
-            # check same row to the left 1
-            intermediate_position = indices_to_algebraic_notation(column_to + 1, row_from)
-            if game.get_game_piece_at_position(intermediate_position).get_type() is not None:
-                return False
-
-        # If we aren't moving horizontally, we are moving vertically.
-        else:
-            # If we are moving down, we must check down one space.
-            if row_delta == 2:
-                # check same column down one square
-                intermediate_position = indices_to_algebraic_notation(column_from, row_to - 1)
-                if game.get_game_piece_at_position(intermediate_position).get_type() is not None:
-                    return False
-
-            # The last case is if we are moving up, we check up one space.
-            elif row_delta == -2:
-                # check same column up one square
-                intermediate_position = indices_to_algebraic_notation(column_from, row_to + 1)
-                if game.get_game_piece_at_position(intermediate_position).get_type() is not None:
-                    return False
-
-        # We then return the superclass method to make sure the origin and destination are valid according to the
-        # general rules of the game.
-        return super().is_valid_move(game, moving_from_square, moving_to_square)
+    def is_valid_move(self, game, moving_from_index, moving_to_index):
+        """
+        Processes the ruleset for a Horse GamePiece. The move must be in the Horse's move table and there can be no
+        obstructing piece on its leg ('hobbling the horses foot'). It must also not capture its own piece.
+        """
+        board = game.get_board_cells()
+        for destination, leg_index in HORSE_MOVES[moving_from_index]:
+            if destination == moving_to_index:
+                return board[leg_index] is EMPTY_SQUARE and board[moving_to_index].get_team() != self._team
+        return False
 
 
 class Cannon(GamePiece):
     """Cannon GamePiece. Contains the ruleset and data to aid in debugging."""
 
+    __slots__ = ()
+
     def __init__(self, team, square):
         """There are no special data members for Cannon."""
         super().__init__('Cannon', team, square)
@@ -735,36 +970,24 @@ class Cannon(GamePiece):
         """Overridden to colorize text."""
         return self.debug_team_color_string_helper('  Cannon   ')
 
-    def is_valid_move(self, game, moving_from_square, moving_to_square):
-        """Cannons must move in an orthogonal fashion. They must also jump a piece before capturing a piece. """
-        # Ensure orthogonal movement.
-        if not is_vertical_or_horizontal_move(moving_from_square, moving_to_square):
-            return False
-
-        # Generate the path between the cannon and its target
-        squares_between_cannon_and_target = piece_linear_path_helper(moving_from_square, moving_to_square)
-
-        # First we establish how many pieces, if any, the Cannon is jumping by making this move.
-        jumps = 0
-        for square in squares_between_cannon_and_target:
-            if square == moving_from_square or square == moving_to_square:
-                continue
-            elif game.get_game_piece_at_position(square).get_type() is not None:
-                jumps += 1
-
-        # If the Cannon didn't jump any pieces, it cannot capture a piece.
-        if jumps == 0 and game.get_game_piece_at_position(moving_to_square).get_type() is not None:
-            return False
-
-        # If the Cannon jumped a piece but didn't capture a piece, this move is also invalid.
-        if jumps == 1 and game.get_game_piece_at_position(moving_to_square).get_type() is None:
-            return False
+    def is_valid_move(self, game, moving_from_index, moving_to_index):
+        """
+        Cannons must move in an orthogonal fashion. They can move to any empty square without jumping a piece, and
+        must jump exactly one piece (the screen) to capture a piece. Both kinds of move are looked up in the slide
+        tables (see get_line_slides()).
+        """
+        rank_slides, file_slides = get_line_slides(game, moving_from_index)
 
-        # The cannon cannot jump more than 1 piece.
-        if jumps > 1:
-            return False
+        # A move without a capture must not jump anything. A capture must land on a piece past the screen.
+        if moving_to_index not in rank_slides[QUIET_MOVES] and moving_to_index not in file_slides[QUIET_MOVES]:
+            if moving_to_index not in rank_slides[CANNON_ATTACKS] and \
+                    moving_to_index not in file_slides[CANNON_ATTACKS]:
+                return False
+            if game.get_game_piece_at_index(moving_to_index).get_type() is None:
+                return False
 
-        return True
+        # Run the superclass version of this method to make sure the Cannon is not capturing its own piece.
+        return super().is_valid_move(game, moving_from_index, moving_to_index)
 
     def list_possible_moves(self, game):
         """
@@ -772,185 +995,343 @@ class Cannon(GamePiece):
         piece. It is used when evaluating for check.
         """
 
-        # We establish two lists, possible moves and confirmed moves.  We also get the current position of the piece
-        # and the corresponding array (board) indices that go along with it.
-        possible_moves = []
-        confirmed_moves = []
-        current_square = self.get_position()
-        current_column, current_row = algebraic_notation_to_indices(current_square)
-        column, row = current_column, current_row
-        searching = True  # True while the alogrithm is running.
-
-        # Begin searching for possible valid moves
-        while searching:
-
-            # Search from origin to the right.
-            jumps = 0
-            column = current_column + 1
-
-            # We start by searching with jumps = 0.
-            while jumps < 2:
-
-                # If the array index is in bounds...
-                if indices_to_algebraic_notation(column, row):
-
-                    # If the space as we search is empty...
-                    if game.get_game_piece_at_position(indices_to_algebraic_notation(column, row)).get_type() is None:
-
-                        # If we have jumped at least one piece, its a possible attack for the Cannon.
-                        if jumps >= 1:
-                            possible_moves.append(indices_to_algebraic_notation(column, row))
-
-                    # If the space is occupied, friend of foe...
-                    else:
-
-                        # If we haven't jumped a piece yet, we increase the jump count.
-                        if jumps < 1:
-                            jumps += 1
-
-                        # If we jumped a piece, we can land on the next encountered piece.
-                        else:
-                            possible_moves.append(indices_to_algebraic_notation(column, row))
-                            jumps += 1
-                    column += 1
-
-                # If we leave the edge of the game board, we break.
-                else:
-                    break
-
-            # Reset flags and search from origin to the left, same method.
-            jumps = 0
-            column = current_column - 1
-            while jumps < 2:
-                if indices_to_algebraic_notation(column, row):
-                    if game.get_game_piece_at_position(indices_to_algebraic_notation(column, row)).get_type() is None:
-                        if jumps >= 1:
-                            possible_moves.append(indices_to_algebraic_notation(column, row))
-                    else:
-                        if jumps < 1:
-                            jumps += 1
-                        else:
-                            possible_moves.append(indices_to_algebraic_notation(column, row))
-                            jumps += 1
-                    column -= 1
-                else:
-                    break
-
-            # Reset flags and search from origin, down (numerically increasing array index).
-            jumps = 0
-            column = current_column
-            row = current_row + 1
-            while jumps < 2:
-                if indices_to_algebraic_notation(column, row):
-                    if game.get_game_piece_at_position(indices_to_algebraic_notation(column, row)).get_type() is None:
-                        if jumps >= 1:
-                            possible_moves.append(indices_to_algebraic_notation(column, row))
-                    else:
-                        if jumps < 1:
-                            jumps += 1
-                        else:
-                            possible_moves.append(indices_to_algebraic_notation(column, row))
-                            jumps += 1
-                    row += 1
-                else:
-                    break
-
-            # Reset flags and search from origin, up (numerically decreasing array index).
-            jumps = 0
-            row = current_row - 1
-            while jumps < 2:
-                if indices_to_algebraic_notation(column, row):
-                    if game.get_game_piece_at_position(indices_to_algebraic_notation(column, row)).get_type() is None:
-                        if jumps >= 1:
-                            possible_moves.append(indices_to_algebraic_notation(column, row))
-                    else:
-                        if jumps < 1:
-                            jumps += 1
-                        else:
-                            possible_moves.append(indices_to_algebraic_notation(column, row))
-                            jumps += 1
-                    row -= 1
-                else:
-                    break
-
-            # When we are done, we clear the searching flag to break the outtermost while loop.
-            searching = False
-
-        # We reconcile all the moves we found with the general rules of the game. All the ones deemed valid are
+        # We reconcile all the attacked squares with the general rules of the game. All the ones deemed valid are
         # appended to confirmed moves which is then returned by this function.
-        for move in possible_moves:
-            if super().is_valid_move(game, current_square, move):
+        current_index = self.get_index()
+        confirmed_moves = []
+        for move in self.list_attacked_squares(game):
+            if super().is_valid_move(game, current_index, move):
                 confirmed_moves.append(move)
 
         return confirmed_moves
 
+    def list_pseudo_legal_moves(self, game):
+        """
+        The Cannon moves like a Chariot but captures like it attacks, by jumping exactly one piece. Its moves are the
+        empty squares up to the first GamePiece in each direction, plus the attacked squares holding an enemy piece.
+        """
+        board = game.get_board_cells()
+        team = self.get_team()
+        moves = [index for index in game.get_piece_attacks(self)
+                 if board[index].get_team() is not None and board[index].get_team() != team]
+        rank_slides, file_slides = get_line_slides(game, self._index)
+        moves.extend(rank_slides[QUIET_MOVES])
+        moves.extend(file_slides[QUIET_MOVES])
+        return moves
+
+    def list_attacked_squares(self, game):
+        """
+        Returns every square the Cannon attacks. In each direction, that is every square after the first GamePiece
+        encountered (the screen) up to and including the next GamePiece, which is looked up in the slide tables.
+        """
+        rank_slides, file_slides = get_line_slides(game, self._index)
+        return rank_slides[CANNON_ATTACKS] + file_slides[CANNON_ATTACKS]
+
 
 class Soldier(GamePiece):
     """Soldier GamePiece. Contains the ruleset and data to aid in debugging."""
 
+    __slots__ = ()
+    _rules = ((1, 0), (-1, 0), (0, 1), (0, -1))
+    _has_static_move_set = True
+    _move_table = SOLDIER_MOVES
+
     def __init__(self, team, square):
         """Soldiers have static rulesets for moving"""
         super().__init__('Soldier', team, square)
-        self._rules = [(1, 0), (-1, 0), (0, 1), (0, -1)]
-        self._has_static_move_set = True
 
     def __str__(self):
         """Overridden to colorize text."""
         return self.debug_team_color_string_helper('  Soldier  ')
 
-    def is_valid_move(self, game, moving_from_square, moving_to_square):
-        """Processes the ruleset for a Solider GamePiece."""
-        # Enforce vertical moves if the soldier has not crossed the river. If they have, enforce horizontal or
-        # vertical moves.
-        if not game.get_game_piece_at_position(moving_from_square).has_crossed_river():
-            if not is_vertical_move(moving_from_square, moving_to_square):
-                return False
-        else:
-            if not is_vertical_move(moving_from_square, moving_to_square):
-                if not is_horizontal_move(moving_from_square, moving_to_square):
-                    return False
+    def list_attacked_squares(self, game):
+        """
+        A Soldier attacks the square in front of it and, once it stands on the far side of the river, the squares to
+        its left and right. Those are exactly its moves in SOLDIER_MOVES.
+        """
+        return SOLDIER_MOVES[self._team][self._index]
+
+
+# FEN (Forsyth-Edwards Notation) describes a whole position in one line of text, e.g. the opening position is
+# 'rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w - - 0 1'. The board is given rank by rank starting at
+# rank 10, which is the same order as the board indices. Red pieces are upper case, Black pieces are lower case and a
+# digit stands for that many empty squares. The second field is the player to move ('w' or 'r' for Red, 'b' for
+# Black) and the last field is the move number. The other two fields are not used by Xiangqi and are always '-'.
+# Elephants and Horses are written B and N, the letters most Xiangqi programs use, but E and H are read as well.
+FEN_PIECES = {'K': (General, 'Red'), 'A': (Advisor, 'Red'), 'B': (Elephant, 'Red'), 'E': (Elephant, 'Red'),
+              'N': (Horse, 'Red'), 'H': (Horse, 'Red'), 'R': (Chariot, 'Red'), 'C': (Cannon, 'Red'),
+              'P': (Soldier, 'Red'),
+              'k': (General, 'Black'), 'a': (Advisor, 'Black'), 'b': (Elephant, 'Black'), 'e': (Elephant, 'Black'),
+              'n': (Horse, 'Black'), 'h': (Horse, 'Black'), 'r': (Chariot, 'Black'), 'c': (Cannon, 'Black'),
+              'p': (Soldier, 'Black')}
+FEN_LETTERS = {('Red', 'General'): 'K', ('Red', 'Advisor'): 'A', ('Red', 'Elephant'): 'B', ('Red', 'Horse'): 'N',
+               ('Red', 'Chariot'): 'R', ('Red', 'Cannon'): 'C', ('Red', 'Soldier'): 'P',
+               ('Black', 'General'): 'k', ('Black', 'Advisor'): 'a', ('Black', 'Elephant'): 'b',
+               ('Black', 'Horse'): 'n', ('Black', 'Chariot'): 'r', ('Black', 'Cannon'): 'c',
+               ('Black', 'Soldier'): 'p'}
+FEN_PLAYERS = {'w': 'Red', 'r': 'Red', 'b': 'Black'}
+OPENING_FEN = 'rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w - - 0 1'
+EMPTY_BOARD_FEN = '9/9/9/9/9/9/9/9/9/9 w - - 0 1'
+
+
+def parse_fen(fen):
+    """
+    Reads a FEN string. Returns a (board_cells, player, move_number, moves_without_capture) tuple where board_cells is
+    a flat list of 90 cells ready for XiangqiGame.set_board_cells(), or returns None if the FEN is not valid. The side
+    to move, the count of moves without a capture (the halfmove field) and the move number may be left off, in which
+    case Red is to move on move 1 and no moves have been made without a capture.
+    """
+    fields = fen.split()
+    if not fields or len(fields) > 6:
+        return None
+
+    # The board. Each character is looked up once: a piece letter makes a piece on the next index and a digit makes
+    # that many empty spaces. Every rank must add up to exactly 9 squares.
+    board_cells = []
+    ranks = fields[0].split('/')
+    if len(ranks) != BOARD_ROWS:
+        return None
+    for rank in ranks:
+        rank_end = len(board_cells) + BOARD_COLUMNS
+        for character in rank:
+            if character in FEN_PIECES:
+                piece_class, team = FEN_PIECES[character]
+                piece = piece_class(team, SQUARES[len(board_cells)])
+                if piece.get_type() == 'Soldier' and is_across_river(len(board_cells), team):
+                    piece.set_crossed_river()
+                board_cells.append(piece)
+            elif '1' <= character <= '9':
+                for index in range(len(board_cells), len(board_cells) + int(character)):
+                    if index < BOARD_SIZE:
+                        board_cells.append(EMPTY_SQUARE)
+            else:
+                return None
+            if len(board_cells) > rank_end:
+                return None
+        if len(board_cells) != rank_end:
+            return None
+
+    # The player to move, the moves without a capture and the move number.
+    player = 'Red'
+    if len(fields) > 1:
+        if fields[1] not in FEN_PLAYERS:
+            return None
+        player = FEN_PLAYERS[fields[1]]
+    moves_without_capture = 0
+    if len(fields) > 4:
+        if not fields[4].isdigit():
+            return None
+        moves_without_capture = int(fields[4])
+    move_number = 1
+    if len(fields) > 5:
+        if not fields[5].isdigit() or int(fields[5]) < 1:
+            return None
+        move_number = int(fields[5])
+    return board_cells, player, move_number, moves_without_capture
+
+
+def board_cells_to_fen(board_cells, player, move_number=1, moves_without_capture=0):
+    """
+    Writes a flat list of 90 board cells, the player to move, the move number and the number of moves without a
+    capture as a FEN string.
+    """
+    ranks = []
+    for row_start in range(0, BOARD_SIZE, BOARD_COLUMNS):
+        rank = ''
+        empty_squares = 0
+        for piece in board_cells[row_start:row_start + BOARD_COLUMNS]:
+            if piece.get_type() is None:
+                empty_squares += 1
+                continue
+            if empty_squares:
+                rank += str(empty_squares)
+                empty_squares = 0
+            rank += FEN_LETTERS[piece.get_team(), piece.get_type()]
+        if empty_squares:
+            rank += str(empty_squares)
+        ranks.append(rank)
+    if player == 'Red':
+        side = 'w'
+    else:
+        side = 'b'
+    return '{} {} - - {} {}'.format('/'.join(ranks), side, moves_without_capture, move_number)
+
+
+# The packed binary form of a position is 46 bytes. Each square takes 4 bits (a nibble) holding a piece code: 0 for an
+# empty square, 1 to 7 for Red's pieces and 9 to 15 for Black's (8 plus Red's code). Two squares share a byte, the
+# lower board index in the high nibble, so the 90 squares fill the first 45 bytes in board index order. The last byte
+# holds the player to move (0 for Red, 1 for Black). Packed positions can be stored back to back in one file and read
+# straight out of a memoryview over it, one PACKED_POSITION_BYTES record at a time.
+PACKED_POSITION_BYTES = 46
+PACKED_SIDE_TO_MOVE_BYTE = 45
+PACKED_PIECES = (None, (General, 'Red'), (Advisor, 'Red'), (Elephant, 'Red'), (Horse, 'Red'), (Chariot, 'Red'),
+                 (Cannon, 'Red'), (Soldier, 'Red'), None, (General, 'Black'), (Advisor, 'Black'),
+                 (Elephant, 'Black'), (Horse, 'Black'), (Chariot, 'Black'), (Cannon, 'Black'), (Soldier, 'Black'))
+PACKED_PIECE_CODES = {('Red', 'General'): 1, ('Red', 'Advisor'): 2, ('Red', 'Elephant'): 3, ('Red', 'Horse'): 4,
+                      ('Red', 'Chariot'): 5, ('Red', 'Cannon'): 6, ('Red', 'Soldier'): 7,
+                      ('Black', 'General'): 9, ('Black', 'Advisor'): 10, ('Black', 'Elephant'): 11,
+                      ('Black', 'Horse'): 12, ('Black', 'Chariot'): 13, ('Black', 'Cannon'): 14,
+                      ('Black', 'Soldier'): 15}
+
+
+def pack_board_cells(board_cells, player):
+    """Packs a flat list of 90 board cells and the player to move into PACKED_POSITION_BYTES bytes."""
+    codes = [0 if piece.get_type() is None else PACKED_PIECE_CODES[piece.get_team(), piece.get_type()]
+             for piece in board_cells]
+    packed = bytearray(PACKED_POSITION_BYTES)
+    for byte_index in range(PACKED_SIDE_TO_MOVE_BYTE):
+        packed[byte_index] = codes[2 * byte_index] << 4 | codes[2 * byte_index + 1]
+    packed[PACKED_SIDE_TO_MOVE_BYTE] = player == 'Black'
+    return bytes(packed)
+
+
+def get_packed_piece(data, index, offset=0):
+    """
+    Returns the (piece class, team) tuple packed for the board index provided, or None for an empty square, reading
+    straight from data (bytes, bytearray or memoryview) without unpacking the rest of the position. offset is where the
+    packed position starts in data.
+    """
+    byte = data[offset + (index >> 1)]
+    if index & 1:
+        return PACKED_PIECES[byte & 0x0F]
+    return PACKED_PIECES[byte >> 4]
 
-        # Enforce not moving backwards.
-        if is_backwards_move(moving_from_square, moving_to_square, game.get_game_piece_at_position(
-                moving_from_square).get_team()):
-            return False
 
-        # See if the solider crossed the river and set the flag for that piece accordingly then return True.
-        team = game.get_game_piece_at_position(moving_from_square).get_team()
-        if team == 'Black':
-            if algebraic_notation_to_indices(moving_to_square)[1] >= 5:
-                game.get_game_piece_at_position(moving_from_square).set_crossed_river()
-        else:
-            if algebraic_notation_to_indices(moving_to_square)[1] <= 4:
-                game.get_game_piece_at_position(moving_from_square).set_crossed_river()
+def get_packed_player(data, offset=0):
+    """Returns the player to move of the position packed in data at the offset provided."""
+    if data[offset + PACKED_SIDE_TO_MOVE_BYTE]:
+        return 'Black'
+    return 'Red'
+
+
+def unpack_board_cells(data, offset=0):
+    """
+    Unpacks the position packed in data (bytes, bytearray or memoryview) at the offset provided. Returns a
+    (board_cells, player) tuple, or None if data is too short or holds a code that is not a piece.
+    """
+    if offset < 0 or len(data) - offset < PACKED_POSITION_BYTES or data[offset + PACKED_SIDE_TO_MOVE_BYTE] > 1:
+        return None
+    board_cells = []
+    for index in range(BOARD_SIZE):
+        byte = data[offset + (index >> 1)]
+        code = byte & 0x0F if index & 1 else byte >> 4
+        if code == 0:
+            board_cells.append(EMPTY_SQUARE)
+            continue
+        if code == 8:
+            return None
+        piece_class, team = PACKED_PIECES[code]
+        piece = piece_class(team, SQUARES[index])
+        if piece.get_type() == 'Soldier' and is_across_river(index, team):
+            piece.set_crossed_river()
+        board_cells.append(piece)
+    return board_cells, get_packed_player(data, offset)
+
+
+def iterate_packed_positions(data):
+    """
+    Yields a memoryview of each packed position stored back to back in data. No bytes are copied, so this can walk a
+    memory-mapped file of positions.
+    """
+    view = memoryview(data)
+    for offset in range(0, len(view) - PACKED_POSITION_BYTES + 1, PACKED_POSITION_BYTES):
+        yield view[offset:offset + PACKED_POSITION_BYTES]
 
-        # Run the superclass version of this method to ensure the requested move is valid according to the general
-        # rules of the game.
-        return super().is_valid_move(game, moving_from_square, moving_to_square)
+
+# The ways XiangqiGame can work out the rules, see its constructor.
+BACKENDS = ('pieces', 'bitboard')
+
+# The states a game can be in (see get_game_state()).
+GAME_STATES = ('UNFINISHED', 'RED_WON', 'BLACK_WON', 'DRAW')
+
+# A game is drawn when the same position, with the same player to move, comes up for the REPETITION_LIMIT-th time,
+# unless only one player gave check with every move since it last came up; that player loses for perpetual check. A
+# game is also drawn after MOVES_WITHOUT_CAPTURE_LIMIT moves (60 by each player) without a capture.
+REPETITION_LIMIT = 3
+MOVES_WITHOUT_CAPTURE_LIMIT = 120
 
 
 class XiangqiGame:
     """Base class for the entire module/game. Contains things like the game board and game state."""
 
-    def __init__(self):
-        """XiangqiGame constructor. Sets the state to UNFINISHED, builds and sets the board."""
-        self._game_state = 'UNFINISHED'  # Gamestate always starts at unfinished.
+    def __init__(self, fen=None, backend='pieces'):
+        """
+        XiangqiGame constructor. Sets the state to UNFINISHED, builds and sets the board. When a FEN string is given
+        the position is loaded from it instead of setting up the opening position (see set_fen()).
 
-        # The gameboard is an array of 10 rows, columns wide. There are 90 squares total.
-        self._game_board = [[GamePiece(None, None, indices_to_algebraic_notation(column, row)) for column in range(9)]
-                            for row in range(10)]
+        backend picks how the rules are worked out. 'pieces' (the default) asks the piece objects and keeps an attack
+        table per team up to date as pieces move. 'bitboard' keeps the position as bitboards as well (see
+        XiangqiBitboard.py) and asks them instead, which is several times faster for legal move generation, perft
+        and searches. Both backends give the same answers through the same methods.
+        """
+        if backend not in BACKENDS:
+            raise ValueError('Unknown backend: {}'.format(backend))
+        self._game_state = 'UNFINISHED'  # Gamestate always starts at unfinished.
 
-        self.new_game()  # When a game object is created, the board is set.
+        # The bitboards of the 'bitboard' backend, None for the 'pieces' backend. The attack tables below are only
+        # kept by the 'pieces' backend.
+        self._bitboard = BitboardPosition() if backend == 'bitboard' else None
+
+        # The gameboard is a flat list with one cell per board index. There are 90 squares total. The attack tables
+        # count, for each team, how many of its pieces attack every index. _piece_attacks remembers, per team, the
+        # squares each piece on the board attacks so its old attacks can be taken back out when it has to be
+        # recalculated. Its keys double as the list of each team's pieces.
+        self._game_board = [EMPTY_SQUARE] * BOARD_SIZE
+        self._attack_tables = {'Red': [0] * BOARD_SIZE, 'Black': [0] * BOARD_SIZE}
+        self._piece_attacks = {'Red': {}, 'Black': {}}
+        self._generals = {}  # The General object for each team, so it never has to be searched for.
+
+        # One occupancy mask per row and per column. Bit c of a row's mask is set when the square in column c is
+        # occupied, and bit r of a column's mask when the square in row r is. Chariot and Cannon moves are looked up
+        # from these in RANK_SLIDES and FILE_SLIDES.
+        self._rank_occupancy = [0] * BOARD_ROWS
+        self._file_occupancy = [0] * BOARD_COLUMNS
+
+        # Every move made through push_move() or make_move() leaves an undo record on this stack for pop_move().
+        self._move_stack = []
+
+        # The positions before each move since the last capture (or since the position was set up), for finding
+        # repeated positions. _position_history holds their Zobrist keys oldest first and _position_occurrences maps
+        # each key to the places in _position_history it occurs, so how often a position has come up is a dictionary
+        # lookup. _check_streaks holds, for each of those moves, how many moves in a row the player making it has
+        # given check. A capture starts all three again, since no position from before a capture can come up again.
+        self._position_history = []
+        self._position_occurrences = {}
+        self._check_streaks = []
+
+        # How many moves without a capture came before _position_history started, read from the halfmove field of a
+        # FEN, so the move limit draw counts on from where the game was saved (see get_moves_without_capture()).
+        self._moves_before_position_history = 0
+
+        self._zobrist_key = 0  # Zobrist hash of the position, kept up to date as pieces are added, moved and removed.
+        self._evaluation = 0  # Material and piece-square score (Red positive), kept up to date the same way.
         self._current_player = 'Red'  # By the rules of the game, Red goes first.
         self._red_is_in_check = False  # True when Red is in check.
         self._black_is_in_check = False  # True when Black is in check.
 
+        # The check flags and the game state are only worked out when they are asked for (is_in_check(),
+        # get_game_state() and friends), then kept until the position changes. This is False whenever the position has
+        # changed since they were last worked out.
+        self._check_status_is_current = False
+
+        # How many moves (by either player) came before the position the game was set up from, so the move number
+        # can be counted on from there (see get_move_number()).
+        self._first_ply = 0
+
+        # The CheckInfo of each player's General, kept by get_check_info() until the position changes.
+        self._check_info = {}
+
+        # When a game object is created, the board is set.
+        if fen is None:
+            self.new_game()
+        elif not self.set_fen(fen):
+            raise ValueError('Invalid FEN: {}'.format(fen))
+
     def new_game(self):
         """Routine to clear the board then add all 32 pieces (16 per player) to the board."""
 
         # Clear the board first.
-        self.set_game_board([[GamePiece(None, None, indices_to_algebraic_notation(column, row)) for column in range(9)]
-                            for row in range(10)])
+        self.clear_game_board()
 
         # Add all the pieces.
         self.add_piece(General('Red', 'e1'))
@@ -993,6 +1374,18 @@ class XiangqiGame:
             self._current_player = 'Black'
         else:
             self._current_player = 'Red'
+        self._zobrist_key ^= ZOBRIST_BLACK_TO_MOVE_KEY
+
+    def get_zobrist_key(self):
+        """Returns the 64 bit Zobrist key of the current position (pieces, squares and the player to move)."""
+        return self._zobrist_key
+
+    def get_evaluation(self):
+        """
+        Returns the static evaluation of the current position (material plus piece-square values, see
+        XiangqiEvaluation.py). Positive scores favor Red. It is kept up to date as pieces move, so this is free.
+        """
+        return self._evaluation
 
     def get_current_player(self):
         """Returns the current player."""
@@ -1006,18 +1399,225 @@ class XiangqiGame:
             return 'Red'
 
     def get_game_state(self):
-        """Returns the current game state."""
+        """Returns the current game state, first finding out whether the last move was checkmate if needed."""
+        if not self._check_status_is_current:
+            self.update_check_status()
         return self._game_state
 
     def get_game_piece_at_position(self, square):
         """Returns the GamePiece object at the position (square) provided."""
-        column, row = algebraic_notation_to_indices(square)
-        return self.get_game_board()[row][column]
+        return self._game_board[SQUARE_INDICES[square]]
+
+    def get_game_piece_at_index(self, index):
+        """Returns the GamePiece object at the board index provided."""
+        return self._game_board[index]
 
     def add_piece(self, piece):
-        """Adds a GamePiece object at the position (square) provided."""
-        column, row = algebraic_notation_to_indices(piece.get_position())
-        self.get_game_board()[row][column] = piece
+        """
+        Adds a GamePiece object at the position (square) provided. A GamePiece with no type is an empty space and is
+        stored as EMPTY_SQUARE, since empty squares are found by identity.
+        """
+        index = piece.get_index()
+        if piece.get_type() is None:
+            piece = EMPTY_SQUARE
+        replaced_piece = self._game_board[index]
+        self._game_board[index] = piece
+        if (replaced_piece.get_type() is None) != (piece.get_type() is None):
+            self.toggle_occupancy(index)
+        if replaced_piece.get_type() is not None:
+            self._zobrist_key ^= ZOBRIST_PIECE_KEYS[replaced_piece.get_team(), replaced_piece.get_type()][index]
+            self._evaluation -= PIECE_SQUARE_VALUES[replaced_piece.get_team(), replaced_piece.get_type()][index]
+        if piece.get_type() is not None:
+            self._zobrist_key ^= ZOBRIST_PIECE_KEYS[piece.get_team(), piece.get_type()][index]
+            self._evaluation += PIECE_SQUARE_VALUES[piece.get_team(), piece.get_type()][index]
+        if piece.get_type() == 'General':
+            self._generals[piece.get_team()] = piece
+        if self._bitboard is not None:
+            self._bitboard.add_piece(index, piece.get_team(), piece.get_type())
+        else:
+            self.update_attacks((index,), replaced_piece)
+        self._check_status_is_current = False
+
+    def move_piece(self, moving_from_index, moving_to_index):
+        """
+        Moves the piece on moving_from_index to moving_to_index and returns whatever was on moving_to_index (the
+        captured piece, or an empty space). Only the attacks that can depend on the two squares are recalculated.
+        """
+        board = self._game_board
+        piece = board[moving_from_index]
+        captured_piece = board[moving_to_index]
+        piece.set_index(moving_to_index)
+        board[moving_to_index] = piece
+        board[moving_from_index] = EMPTY_SQUARE
+        self.toggle_occupancy(moving_from_index)
+        if captured_piece is EMPTY_SQUARE:
+            self.toggle_occupancy(moving_to_index)
+        self.update_zobrist_key_for_move(piece, moving_from_index, moving_to_index, captured_piece)
+        piece_values = PIECE_SQUARE_VALUES[piece.get_team(), piece.get_type()]
+        self._evaluation += piece_values[moving_to_index] - piece_values[moving_from_index]
+        if captured_piece.get_type() is not None:
+            self._evaluation -= PIECE_SQUARE_VALUES[captured_piece.get_team(),
+                                                    captured_piece.get_type()][moving_to_index]
+        if self._bitboard is not None:
+            self._bitboard.move(moving_from_index, moving_to_index)
+        else:
+            self.update_attacks((moving_from_index, moving_to_index), captured_piece)
+        return captured_piece
+
+    def unmove_piece(self, moving_from_index, moving_to_index, captured_piece):
+        """Takes back a move_piece() call, putting the moved piece and the captured piece back where they were."""
+        board = self._game_board
+        piece = board[moving_to_index]
+        piece.set_index(moving_from_index)
+        board[moving_from_index] = piece
+        board[moving_to_index] = captured_piece
+        self.toggle_occupancy(moving_from_index)
+        if captured_piece is EMPTY_SQUARE:
+            self.toggle_occupancy(moving_to_index)
+        self.update_zobrist_key_for_move(piece, moving_from_index, moving_to_index, captured_piece)
+        piece_values = PIECE_SQUARE_VALUES[piece.get_team(), piece.get_type()]
+        self._evaluation += piece_values[moving_from_index] - piece_values[moving_to_index]
+        if captured_piece.get_type() is not None:
+            self._evaluation += PIECE_SQUARE_VALUES[captured_piece.get_team(),
+                                                    captured_piece.get_type()][moving_to_index]
+        if self._bitboard is not None:
+            self._bitboard.unmove(moving_from_index, moving_to_index,
+                                  get_piece_code(captured_piece.get_team(), captured_piece.get_type()))
+        else:
+            self.update_attacks((moving_from_index, moving_to_index))
+
+    def update_zobrist_key_for_move(self, piece, moving_from_index, moving_to_index, captured_piece):
+        """
+        XORs the keys for a piece moving between two indices (and the piece it captured) into the Zobrist key.
+        Because XOR undoes itself, the same call is used both to make and to take back a move.
+        """
+        piece_keys = ZOBRIST_PIECE_KEYS[piece.get_team(), piece.get_type()]
+        self._zobrist_key ^= piece_keys[moving_from_index] ^ piece_keys[moving_to_index]
+        if captured_piece.get_type() is not None:
+            self._zobrist_key ^= ZOBRIST_PIECE_KEYS[captured_piece.get_team(),
+                                                    captured_piece.get_type()][moving_to_index]
+
+    def get_general(self, player):
+        """Returns the General belonging to player, or None if that General is not on the board."""
+        general = self._generals.get(player)
+        if general is None or self._game_board[general.get_index()] is not general:
+            return None
+        return general
+
+    def toggle_occupancy(self, index):
+        """Flips the bits for the board index provided in the occupancy masks of its row and column."""
+        row, column = divmod(index, BOARD_COLUMNS)
+        self._rank_occupancy[row] ^= 1 << column
+        self._file_occupancy[column] ^= 1 << row
+
+    def get_rank_occupancy(self):
+        """Returns the list of occupancy masks, one per row. Bit c is set when the square in column c is occupied."""
+        return self._rank_occupancy
+
+    def get_file_occupancy(self):
+        """Returns the list of occupancy masks, one per column. Bit r is set when the square in row r is occupied."""
+        return self._file_occupancy
+
+    def get_attack_table(self, player):
+        """
+        Returns the attack table for player. It is a list with one entry per board index holding the number of that
+        player's pieces attacking the index. The 'bitboard' backend does not keep attack tables, so it works the table
+        out when asked.
+        """
+        if self._bitboard is not None:
+            attack_table = [0] * BOARD_SIZE
+            for piece in self.get_pieces(player):
+                for index in piece.list_attacked_squares(self):
+                    attack_table[index] += 1
+            return attack_table
+        return self._attack_tables[player]
+
+    def is_square_attacked_by(self, index, player):
+        """Returns True if at least one of player's pieces attacks the board index provided."""
+        if self._bitboard is not None:
+            return self._bitboard.is_attacked(index, player)
+        return self._attack_tables[player][index] > 0
+
+    def get_pieces(self, player):
+        """Returns a list of the pieces player has on the board."""
+        if self._bitboard is not None:
+            return [self._game_board[index] for index in self._bitboard.get_piece_indices(player)]
+        return list(self._piece_attacks[player])
+
+    def get_piece_attacks(self, piece):
+        """Returns the list of indices the piece currently attacks according to the attack tables."""
+        if self._bitboard is not None:
+            return piece.list_attacked_squares(self)
+        return self._piece_attacks[piece.get_team()].get(piece, [])
+
+    def get_backend(self):
+        """Returns the backend the game was created with, 'pieces' or 'bitboard'."""
+        return 'pieces' if self._bitboard is None else 'bitboard'
+
+    def refresh_piece_attacks(self, piece):
+        """
+        Takes the attacks the piece was last known to make out of its team's attack table and, if the piece is still
+        on the board, recalculates them and adds them back in.
+        """
+        attack_table = self._attack_tables[piece.get_team()]
+        piece_attacks = self._piece_attacks[piece.get_team()]
+        old_attacks = piece_attacks.pop(piece, None)
+        if old_attacks is not None:
+            for index in old_attacks:
+                attack_table[index] -= 1
+        if self._game_board[piece.get_index()] is piece:
+            new_attacks = piece.list_attacked_squares(self)
+            for index in new_attacks:
+                attack_table[index] += 1
+            piece_attacks[piece] = new_attacks
+
+    def update_attacks(self, changed_indices, removed_piece=None):
+        """
+        Updates the attack tables after the pieces on changed_indices were added, moved or removed. Rather than
+        rescanning the board, only the pieces whose attacks can depend on those squares are recalculated: the
+        pieces standing on them, Chariots and Cannons in the same row or column, Horses whose leg and Elephants whose
+        eye is one of the squares, and the removed (captured) piece itself.
+        """
+        board = self._game_board
+        affected_pieces = set()
+        if removed_piece is not None and removed_piece.get_type() is not None:
+            affected_pieces.add(removed_piece)
+        for changed_index in changed_indices:
+            if board[changed_index].get_type() is not None:
+                affected_pieces.add(board[changed_index])
+            for index in ROW_AND_COLUMN_INDICES[changed_index]:
+                piece_type = board[index].get_type()
+                if piece_type == 'Chariot' or piece_type == 'Cannon':
+                    affected_pieces.add(board[index])
+            for index in ORTHOGONAL_NEIGHBORS[changed_index]:
+                if board[index].get_type() == 'Horse':
+                    affected_pieces.add(board[index])
+            for index in DIAGONAL_NEIGHBORS[changed_index]:
+                if board[index].get_type() == 'Elephant':
+                    affected_pieces.add(board[index])
+        for piece in affected_pieces:
+            self.refresh_piece_attacks(piece)
+
+    def rebuild_attacks(self):
+        """
+        Recalculates the occupancy masks, the attack tables (or the bitboards of the 'bitboard' backend) and the
+        General lookup from scratch by scanning the whole board.
+        """
+        self._attack_tables = {'Red': [0] * BOARD_SIZE, 'Black': [0] * BOARD_SIZE}
+        self._piece_attacks = {'Red': {}, 'Black': {}}
+        self._generals = {}
+        self._rank_occupancy = [0] * BOARD_ROWS
+        self._file_occupancy = [0] * BOARD_COLUMNS
+        for index, piece in enumerate(self._game_board):
+            if piece.get_type() is not None:
+                self.toggle_occupancy(index)
+        if self._bitboard is not None:
+            self._bitboard.set_board_cells(self._game_board)
+        for piece in self._game_board:
+            if piece.get_type() == 'General':
+                self._generals[piece.get_team()] = piece
+            if piece.get_type() is not None and self._bitboard is None:
+                self.refresh_piece_attacks(piece)
 
     def set_player_in_check(self, player):
         """Sets player in check flag according to the color the team the player belongs to."""
@@ -1035,33 +1635,188 @@ class XiangqiGame:
 
     def get_player_in_check(self, player):
         """Gets the player in check flag for the correct team based on the player passed into the function."""
+        if not self._check_status_is_current:
+            self.update_check_status()
         if player == 'Red':
             return self._red_is_in_check
         elif player == 'Black':
             return self._black_is_in_check
 
     def remove_piece(self, square):
-        """Sets the cell at the position (square) provided to GamePiece(None, None) aka an 'empty' space."""
-        column, row = algebraic_notation_to_indices(square)
-        self.get_game_board()[row][column] = GamePiece(None, None, square)
+        """Sets the cell at the position (square) provided to EMPTY_SQUARE aka an 'empty' space."""
+        self.remove_piece_at_index(SQUARE_INDICES[square])
+
+    def remove_piece_at_index(self, index):
+        """Sets the cell at the board index provided to an 'empty' space."""
+        removed_piece = self._game_board[index]
+        self._game_board[index] = EMPTY_SQUARE
+        if removed_piece.get_type() is not None:
+            self.toggle_occupancy(index)
+            self._zobrist_key ^= ZOBRIST_PIECE_KEYS[removed_piece.get_team(), removed_piece.get_type()][index]
+            self._evaluation -= PIECE_SQUARE_VALUES[removed_piece.get_team(), removed_piece.get_type()][index]
+        if self._bitboard is not None:
+            self._bitboard.remove_piece(index)
+        else:
+            self.update_attacks((index,), removed_piece)
+        self._check_status_is_current = False
 
     def get_game_board(self):
-        """Returns the game board."""
+        """Returns the game board as a list of 10 rows (rank 10 first), each 9 columns wide."""
+        board = self._game_board
+        return [board[row * BOARD_COLUMNS:(row + 1) * BOARD_COLUMNS] for row in range(BOARD_ROWS)]
+
+    def get_board_cells(self):
+        """Returns the flat list of 90 board cells, one per board index."""
         return self._game_board
 
     def set_game_board(self, board):
-        """Sets the game board."""
-        self._game_board = board
+        """
+        Sets the game board from a list of 10 rows, each 9 columns wide. Spaces with no type are stored as
+        EMPTY_SQUARE.
+        """
+        self.set_board_cells([EMPTY_SQUARE if space.get_type() is None else space for row in board for space in row])
+
+    def set_board_cells(self, board_cells, player=None, move_number=1, moves_without_capture=0):
+        """
+        Sets the game board from a flat list of 90 cells, one per board index, and optionally the player to move, the
+        move number and how many moves have been made without a capture. Everything that is kept up to date as pieces
+        move (the Zobrist key, the evaluation and the attack tables) is worked out once for the whole board.
+        """
+        self._game_board = board_cells
+        if player is not None:
+            self._current_player = player
+        self._first_ply = 2 * (move_number - 1) + (self._current_player == 'Black')
+        self._move_stack = []
+        self._position_history = []
+        self._position_occurrences = {}
+        self._check_streaks = []
+        self._moves_before_position_history = moves_without_capture
+        self._zobrist_key = compute_zobrist_key(self)
+        self._evaluation = evaluate_position(self)
+        self.rebuild_attacks()
+        self._check_status_is_current = False
+
+    def set_fen(self, fen):
+        """
+        Sets up the position described by the FEN string provided (see parse_fen()), including the player to move and
+        the moves made without a capture. The game state is set back to UNFINISHED. Returns False, leaving the game
+        unchanged, if the FEN is not valid.
+        """
+        parsed_fen = parse_fen(fen)
+        if parsed_fen is None:
+            return False
+        board_cells, player, move_number, moves_without_capture = parsed_fen
+        self._game_state = 'UNFINISHED'
+        self.set_board_cells(board_cells, player, move_number, moves_without_capture)
+        return True
+
+    def to_fen(self):
+        """
+        Returns the current position as a FEN string, including the player to move, the moves made without a capture
+        and the move number.
+        """
+        return board_cells_to_fen(self._game_board, self._current_player, self.get_move_number(),
+                                  self.get_moves_without_capture())
+
+    @classmethod
+    def from_fen(cls, fen, backend='pieces'):
+        """
+        Returns a new game using the backend provided, set up from the FEN string provided. Raises ValueError if the
+        FEN is not valid.
+        """
+        return cls(fen, backend)
+
+    def to_bytes(self):
+        """Returns the current position packed into PACKED_POSITION_BYTES bytes (see pack_board_cells())."""
+        return pack_board_cells(self._game_board, self._current_player)
+
+    def set_bytes(self, data, offset=0):
+        """
+        Sets up the position packed in data (bytes, bytearray or memoryview) at the offset provided, including the
+        player to move. The packed form holds no move number or count of moves without a capture, so both start again.
+        The game state is set back to UNFINISHED. Returns False, leaving the game unchanged, if data does not hold a
+        packed position there.
+        """
+        unpacked_position = unpack_board_cells(data, offset)
+        if unpacked_position is None:
+            return False
+        board_cells, player = unpacked_position
+        self._game_state = 'UNFINISHED'
+        self.set_board_cells(board_cells, player)
+        return True
+
+    @classmethod
+    def from_bytes(cls, data, offset=0, backend='pieces'):
+        """
+        Returns a new game using the backend provided, set up from the position packed in data at the offset
+        provided. Raises ValueError if data does not hold a packed position there.
+        """
+        game = cls.from_fen(EMPTY_BOARD_FEN, backend)
+        if not game.set_bytes(data, offset):
+            raise ValueError('Invalid packed position at offset {}'.format(offset))
+        return game
+
+    def get_move_number(self):
+        """Returns the move number of the current position. It goes up by one after every Black move."""
+        return (self._first_ply + len(self._move_stack)) // 2 + 1
 
     def clear_game_board(self):
-        self.set_game_board([[GamePiece(None, None, indices_to_algebraic_notation(column, row)) for column in range(9)]
-                            for row in range(10)])
+        """Replaces every cell on the board with an empty space."""
+        self.set_board_cells([EMPTY_SQUARE] * BOARD_SIZE)
 
     def set_game_state(self, state):
-        """Sets the gamestate to one of three predefined states."""
-        if state == 'UNFINISHED' or state == 'RED_WON' or state == 'BLACK_WON':
+        """Sets the gamestate to one of the predefined states in GAME_STATES."""
+        if state in GAME_STATES:
             self._game_state = state
 
+    def get_repetition_count(self):
+        """Returns how many times the current position has come up since the last capture, counting this time."""
+        return len(self._position_occurrences.get(self._zobrist_key, ())) + 1
+
+    def get_moves_without_capture(self):
+        """
+        Returns the number of moves (by either player) since the last capture. Moves counted in the FEN the position
+        was set up from are included.
+        """
+        return self._moves_before_position_history + len(self._position_history)
+
+    def update_draw_status(self):
+        """
+        Ends the game if the move just made repeated a position for the REPETITION_LIMIT-th time or was the
+        MOVES_WITHOUT_CAPTURE_LIMIT-th move without a capture. A repetition is a draw unless only one player gave check
+        with every one of their moves since the position last came up; that player loses for perpetual check. The
+        position history answers both without going back over the moves.
+
+        A move that checkmates or stalemates the other player wins the game even if it also completes a repetition or
+        reaches the move limit, so the check status is worked out first whenever one of those would end the game.
+        """
+        position_history = self._position_history
+        earlier_indices = self._position_occurrences.get(self._zobrist_key)
+        if earlier_indices is not None and len(earlier_indices) + 1 >= REPETITION_LIMIT:
+
+            # Each player made half the moves since the position last came up. The last move was made by the
+            # defending player.
+            player_moves = (len(position_history) - earlier_indices[-1]) // 2
+            mover_gave_perpetual_check = self._check_streaks[-1] >= player_moves
+            player_gave_perpetual_check = len(position_history) > 1 and self._check_streaks[-2] >= player_moves
+            if mover_gave_perpetual_check and not player_gave_perpetual_check:
+                result = self.get_current_player().upper() + '_WON'
+            elif player_gave_perpetual_check and not mover_gave_perpetual_check:
+                result = self.get_defending_player().upper() + '_WON'
+            else:
+                result = 'DRAW'
+        elif self.get_moves_without_capture() >= MOVES_WITHOUT_CAPTURE_LIMIT:
+            result = 'DRAW'
+        else:
+            return
+
+        # Checkmate and stalemate come first. Once worked out the check status is kept until the position changes, so
+        # the result set here is not replaced when the game state is asked for later.
+        if not self._check_status_is_current:
+            self.update_check_status()
+        if self._game_state == 'UNFINISHED':
+            self.set_game_state(result)
+
     def is_in_check(self, player):
         """Returns true if the passed parameter player is in check, otherwise returns false."""
         # Player is converted to title case then checked for validity. Player must be either 'Black' or 'Red'.
@@ -1069,116 +1824,454 @@ class XiangqiGame:
         if player != 'Black' and player != 'Red':
             return False
 
-        # Get all available moves for the 'defending' player and the current board.
-        threat_dictionary = generate_threat_dictionary(self, player)
-        board = self.get_game_board()
-
-        # Get all the available moves and current position for the passed in player's general.
-        # When the player on the opposite team is passed in as an argument, we set evaluate_for_opposing_general
-        # to True
-        if player == self.get_current_player():
-            general = find_current_general(self)
-            evaluate_for_opposing_general = False
-        else:
-            general = find_opposing_general(self)
-            evaluate_for_opposing_general = True
+        # The check flags are only recalculated if the position has changed since they were last asked for.
+        return self.get_player_in_check(player)
 
-        general_position = general.get_position()
-        general_possible_moves = general.list_possible_moves(self)
+    def update_check_status(self):
+        """
+        Works out the check flags for both players and, for a player in check with no way out, sets the game state to
+        won by the other player. This runs the first time the status is asked for after the position changes, so
+        games that never ask (replays, searches) never pay for it and asking again is free.
+        """
+        self._check_status_is_current = True
+        for player, enemy in (('Red', 'Black'), ('Black', 'Red')):
 
-        # If the general is being threatened with capture, we set the appropriate check condition.
-        for piece in threat_dictionary:
-            if general_position in threat_dictionary[piece]:
+            # If the general is being threatened with capture, we set the appropriate check condition. This is a
+            # lookup in the other team's attack table.
+            general = self.get_general(player)
+            if general is not None and self.is_square_attacked_by(general.get_index(), enemy):
                 self.set_player_in_check(player)
-                break
             else:
                 self.set_player_not_in_check(player)
+                continue
+
+            # If the general is in check and nothing can get it out of check, the game is won and checkmate is set.
+            if not self.has_check_evasion(player):
+                if player == 'Red':
+                    self.set_game_state('BLACK_WON')
+                else:
+                    self.set_game_state('RED_WON')
 
-        # Eliminate possible moves that break the rules of the game or individual pieces.
-        invalid_moves = []
-        for possible_move in general_possible_moves:
-            if not general.is_valid_move(self, general_position, possible_move):
-                if possible_move not in invalid_moves:
-                    invalid_moves.append(possible_move)
-
-        # Try the remaining moves to see if they will get the general out of check.
-        for possible_move in general_possible_moves:
-            if not try_move(general_position, possible_move, self, evaluate_for_opposing_general):
-                if possible_move not in invalid_moves:
-                    invalid_moves.append(possible_move)
-
-        # Remove all the invalid moves from the general's possible moves.
-        for invalid_move in invalid_moves:
-            general_possible_moves.remove(invalid_move)
-
-        # If the general can be captured and has no available moves, the game is won and checkmate is set.
-        player_checkmate = False
-        if len(general_possible_moves) == 0:
-            if self.verify_checkmate(evaluate_for_opposing_general):
-                player_checkmate = True
-
-        # If there is checkmate, we set the appropriate gamestate.
-        if player_checkmate:
+        # A player to move who is not in check but has no legal move loses as well (stalemate). has_legal_move()
+        # stops at the first legal move it finds, which is nearly always one of the first few it looks at.
+        player = self._current_player
+        if player == 'Red':
+            in_check = self._red_is_in_check
+        else:
+            in_check = self._black_is_in_check
+        if not in_check and self._game_state == 'UNFINISHED' and self.get_general(player) is not None and \
+                not self.has_legal_move(player):
             if player == 'Red':
                 self.set_game_state('BLACK_WON')
             else:
                 self.set_game_state('RED_WON')
 
-        # Return the appropriate boolean value for the correct player depending on if they are in check.
-        return self.get_player_in_check(player)
+    def verify_checkmate(self, evaluate_for_opposing_general=False):
+        """
+        Verifies that there is no way to prevent checkmate, stopping at the first move that gets the general out of
+        check. When evaluate for opposing general is True, will evaluate checkmate for the opposing team.
+        """
+        if evaluate_for_opposing_general:
+            player = self.get_defending_player()
+        else:
+            player = self.get_current_player()
+        return not self.has_check_evasion(player)
 
-    def verify_checkmate(self,evaluate_for_opposing_general=False):
+    def has_check_evasion(self, player):
         """
-        Verifies that after trying every possible intervening move, there is no way to prevent checkmate. When
-        evaluate for opposing general is True, will evaluate checkmate for the opposing team.
+        Returns True if player has at least one legal move while in check. The candidates are tried cheapest first:
+        moves of the general, captures of a checking piece, and finally moves that block a check. A block is either
+        a move onto a square between a Chariot or Cannon and the general, onto the leg of a checking Horse, or the
+        Cannon's screen moving out of the way. No other move can get the general out of check, so none are tried. The
+        checking pieces and blocking squares come from get_check_info(). The 'bitboard' backend looks for any legal
+        move instead, which is just as quick there.
         """
+        if self._bitboard is not None:
+            return self._bitboard.has_legal_move(player)
+        general = self.get_general(player)
+        if general is None:
+            return False
+        if player == 'Red':
+            enemy = 'Black'
+        else:
+            enemy = 'Red'
+        general_index = general.get_index()
+
+        # First try moving the general itself. There are at most four of these moves.
+        for moving_to_index in general.list_pseudo_legal_moves(self):
+            if self.is_move_safe_by_index(general_index, moving_to_index, player, enemy):
+                return True
+
+        # Sort the remaining candidate moves into captures and blocks so that the captures are tried first.
+        check_info = self.get_check_info(player)
+        checker_indices = check_info.get_checker_indices()
+        blocking_indices = check_info.get_blocking_indices()
+        screen_indices = check_info.get_screen_indices()
+        captures = []
+        blocks = []
+        for piece in self.get_pieces(player):
+            moving_from_index = piece.get_index()
+            if piece is general:
+                continue
+            for moving_to_index in piece.list_pseudo_legal_moves(self):
+                if moving_to_index in checker_indices:
+                    captures.append((moving_from_index, moving_to_index))
+                elif moving_to_index in blocking_indices or moving_from_index in screen_indices:
+                    blocks.append((moving_from_index, moving_to_index))
+        for moving_from_index, moving_to_index in captures + blocks:
+            if self.is_move_safe_by_index(moving_from_index, moving_to_index, player, enemy):
+                return True
+        return False
 
-        # Gets the appropriate intervention dictionary.
-        if evaluate_for_opposing_general:
-            possible_intervention_dictionary = generate_threat_dictionary(self, self.get_current_player())
+    def get_check_info(self, player):
+        """
+        Returns the CheckInfo of player's General in the current position (see compute_check_info()). It is worked
+        out the first time it is asked for in a position and kept until the position changes.
+        """
+        check_info = self._check_info.get(player)
+        if check_info is None or check_info.get_zobrist_key() != self._zobrist_key:
+            check_info = compute_check_info(self, player)
+            self._check_info[player] = check_info
+        return check_info
+
+    def is_move_safe(self, moving_from_index, moving_to_index):
+        """
+        Returns True if the current player's move leaves their General safe. The CheckInfo of the position answers
+        for most moves, and only the rest are made on the board and tested.
+        """
+        player = self._current_player
+        is_safe = self.get_check_info(player).classify_move(moving_from_index, moving_to_index)
+        if is_safe is None:
+            return self.is_move_safe_by_index(moving_from_index, moving_to_index, player, self.get_defending_player())
+        return is_safe
+
+    def legal_moves(self):
+        """
+        Returns a list of every legal move for the current player as (moving_from_square, moving_to_square) tuples in
+        algebraic notation. Any of them can be passed to make_move() or push_move(). Returns an empty list once the
+        game is over.
+        """
+        return [(SQUARES[moving_from_index], SQUARES[moving_to_index])
+                for moving_from_index, moving_to_index in self.legal_moves_by_index()]
+
+    def legal_moves_by_index(self):
+        """
+        Index version of legal_moves(). Every piece's pseudo-legal moves are read from the attack tables in one pass
+        and then go through a single check filter, see iterate_legal_moves_by_index(). The filter works out once which
+        pieces are pinned and which squares would give a Cannon its screen (see compute_check_info()), so unless the
+        player is in check only the General's own moves are made on the board and looked up in the attack table.
+        """
+        player = self._current_player
+        if self._game_state != 'UNFINISHED' or self.get_general(player) is None:
+            return []
+        if self._bitboard is not None:
+            return self._bitboard.legal_moves(player)
+        return list(self.iterate_legal_moves_by_index(player))
+
+    def iterate_legal_moves_by_index(self, player):
+        """
+        Generator that yields player's legal moves as (moving_from_index, moving_to_index) tuples one at a time. The
+        CheckInfo of the position (see get_check_info()) decides most moves: a piece that is not pinned may make any of
+        its moves unless that would make it the screen of a Cannon aimed at the General, and a pinned piece may only
+        move along its line. Only moves of the General, and any move while in check, are made on the board and
+        tested. A caller that only needs to know whether there is a legal move stops after the first one. The board
+        must not be changed while the generator is running.
+        """
+        if self._bitboard is not None:
+            yield from self._bitboard.legal_moves(player)
+            return
+        general = self.get_general(player)
+        if general is None:
+            return
+        if player == 'Red':
+            enemy = 'Black'
         else:
-            possible_intervention_dictionary = generate_threat_dictionary(self, self.get_defending_player())
+            enemy = 'Red'
+        check_info = self.get_check_info(player)
+
+        # In check (or in a position where the Generals already face each other) every move is sorted out one by one.
+        if check_info.is_in_check() or check_info.must_test_every_move():
+            for piece in self.get_pieces(player):
+                moving_from_index = piece.get_index()
+                for moving_to_index in piece.list_pseudo_legal_moves(self):
+                    is_safe = check_info.classify_move(moving_from_index, moving_to_index)
+                    if is_safe is None:
+                        is_safe = self.is_move_safe_by_index(moving_from_index, moving_to_index, player, enemy)
+                    if is_safe:
+                        yield moving_from_index, moving_to_index
+            return
+
+        pins = check_info.get_pins()
+        screen_squares = check_info.get_screen_squares()
+        for piece in self.get_pieces(player):
+            moving_from_index = piece.get_index()
+            if piece is general:
+                for moving_to_index in piece.list_pseudo_legal_moves(self):
+                    if self.is_move_safe_by_index(moving_from_index, moving_to_index, player, enemy):
+                        yield moving_from_index, moving_to_index
+                continue
+            allowed_indices = pins.get(moving_from_index)
+            for moving_to_index in piece.list_pseudo_legal_moves(self):
+                if allowed_indices is not None and moving_to_index not in allowed_indices:
+                    continue
+                if moving_to_index in screen_squares:
+                    continue
+                yield moving_from_index, moving_to_index
+
+    def has_legal_move(self, player):
+        """Returns True if player has at least one legal move, stopping at the first one found."""
+        if self._bitboard is not None:
+            return self._bitboard.has_legal_move(player)
+        for move in self.iterate_legal_moves_by_index(player):
+            return True
+        return False
+
+    def perft(self, depth):
+        """
+        Counts the positions (leaf nodes) reachable from the current position in exactly depth moves by walking
+        the tree of legal moves with push_move()/pop_move(). The counts are well known for standard positions, so
+        this is used to verify the move generator. The position is unchanged when it returns.
+        """
+        if depth <= 0:
+            return 1
+
+        # The 'bitboard' backend walks the tree on its bitboards alone, without touching the piece objects.
+        if self._bitboard is not None:
+            if self._game_state != 'UNFINISHED':
+                return 0
+            return self._bitboard.perft(depth, self._current_player)
+        moves = self.legal_moves_by_index()
+
+        # There is no need to make the last move of each line, counting the moves is enough.
+        if depth == 1:
+            return len(moves)
+        nodes = 0
+        for moving_from_index, moving_to_index in moves:
+            self.push_move_by_index(moving_from_index, moving_to_index)
+            nodes += self.perft(depth - 1)
+            self.pop_move()
+        return nodes
+
+    def is_move_safe_by_index(self, moving_from_index, moving_to_index, player, enemy):
+        """
+        Makes the move on the board, checks that player's General is not attacked by enemy and can not see the other
+        General, then takes the move back. Returns True if the move is safe.
+        """
+        captured_piece = self.move_piece(moving_from_index, moving_to_index)
+        safe = self.is_general_safe(player, enemy)
+        self.unmove_piece(moving_from_index, moving_to_index, captured_piece)
+        return safe
 
-        # Evaluates all possible moves to see if a move exists that does not result in check.
-        checkmate = True
-        for piece in possible_intervention_dictionary:
-            for move in possible_intervention_dictionary[piece]:
-                if try_move(piece.get_position(), move, self, evaluate_for_opposing_general):
-                    checkmate = False
+    def is_general_safe(self, player, enemy):
+        """
+        Returns True if player's General is on the board, is not attacked by enemy and can not see the other General.
+        After a move this tells whether the move was legal.
+        """
+        if self._bitboard is not None:
+            return self._bitboard.is_general_safe(player)
+        general = self.get_general(player)
+        return general is not None and not self.is_square_attacked_by(general.get_index(), enemy) and \
+            can_generals_not_see_each_other(self)
 
-        return checkmate
+    def pseudo_legal_moves_by_index(self):
+        """
+        Returns every move for the current player as (moving_from_index, moving_to_index) tuples without checking
+        whether the move leaves the player's own General in check. A search can make these moves and throw away the
+        ones after which is_general_safe() is False, instead of testing every move up front like legal_moves() does.
+        """
+        if self._game_state != 'UNFINISHED':
+            return []
+        if self._bitboard is not None:
+            return self._bitboard.pseudo_legal_moves(self._current_player)
+        moves = []
+        for piece in self.get_pieces(self._current_player):
+            moving_from_index = piece.get_index()
+            for moving_to_index in piece.list_pseudo_legal_moves(self):
+                moves.append((moving_from_index, moving_to_index))
+        return moves
 
     def make_move(self, moving_from_square, moving_to_square):
         """Moves piece from one square to another square if doing so adheres to all the rules defined for the game."""
 
-        # Verify the user didn't enter bad squares.
-        if not algebraic_notation_to_indices(moving_from_square) or not algebraic_notation_to_indices(moving_to_square):
+        # Verify the user didn't enter bad squares. This is the only place the squares are translated to indices.
+        moving_from_index = square_to_index(moving_from_square)
+        moving_to_index = square_to_index(moving_to_square)
+        if moving_from_index is None or moving_to_index is None:
             return False
 
-        # Verify the game state is unfinished.
-        if self.get_game_state() != 'UNFINISHED':
+        # Verify the game state is unfinished. The stored state is enough here, a checkmate or stalemate that has not
+        # been asked for yet is still caught below since the player has no move that gets past is_move_safe().
+        if self._game_state != 'UNFINISHED':
             return False
 
         # Verify the correct player is taking a turn.
-        if self.get_game_piece_at_position(moving_from_square).get_team() != self.get_current_player():
+        piece = self.get_game_piece_at_index(moving_from_index)
+        if piece.get_team() != self.get_current_player():
             return False
 
+        # The 'bitboard' backend answers whether the move is legal in one go.
+        if self._bitboard is not None:
+            if not self._bitboard.is_legal_move(self._current_player, moving_from_index, moving_to_index):
+                return False
+
         # Check to see if it is a valid move for the piece.
-        if not self.get_game_piece_at_position(moving_from_square).is_valid_move(self, moving_from_square,
-                                                                                 moving_to_square):
+        elif not piece.is_valid_move(self, moving_from_index, moving_to_index):
             return False
 
-        # Try the move and see if it causes check.. TRY MOVE THING
-        if not try_move(moving_from_square, moving_to_square, self):
+        # See if the move leaves the general in check. Most moves are answered by the position's CheckInfo.
+        elif not self.is_move_safe(moving_from_index, moving_to_index):
+            return False
+
+        # If all conditions to make the move in a valid manner are satisfied, then make the move. push_move_by_index()
+        # also advances to the next players turn. The check status for both sides is worked out the next time it is
+        # asked for, but a draw by repetition or by the move limit is found straight away.
+        self.push_move_by_index(moving_from_index, moving_to_index)
+        self.update_draw_status()
+        return True
+
+    def make_move_trusted(self, moving_from_square, moving_to_square):
+        """
+        Makes a move that is already known to be legal, such as one read from a game log the server wrote or one
+        returned by legal_moves(), WITHOUT checking it against the rules. The game is updated exactly as make_move()
+        would update it, including ending it on a repeated position or the move limit, so a trusted log can be replayed
+        at full speed. Checkmate and stalemate are found the next time the game state is asked for, as usual. A square
+        that is not on the board raises KeyError; anything else about the move is not looked at. Use make_move() for
+        any move that has not been validated.
+        """
+        self.make_move_trusted_by_index(SQUARE_INDICES[moving_from_square], SQUARE_INDICES[moving_to_square])
+
+    def make_move_trusted_by_index(self, moving_from_index, moving_to_index):
+        """Index version of make_move_trusted(), for moves returned by legal_moves_by_index()."""
+        self.push_move_by_index(moving_from_index, moving_to_index)
+        self.update_draw_status()
+
+    def push_move(self, moving_from_square, moving_to_square):
+        """
+        Makes a move WITHOUT checking it against the rules of the game and remembers how to take it back with
+        pop_move(). This is meant for walking a game tree with moves that are already known to be legal. Returns False
+        if either square is invalid or moving_from_square does not hold a piece belonging to the current player.
+        """
+        moving_from_index = square_to_index(moving_from_square)
+        moving_to_index = square_to_index(moving_to_square)
+        if moving_from_index is None or moving_to_index is None:
+            return False
+        if self.get_game_piece_at_index(moving_from_index).get_team() != self.get_current_player():
             return False
+        self.push_move_by_index(moving_from_index, moving_to_index)
+        return True
 
-        # If all conditions to make the move in a valid manner are satisfied, then make the move.
-        self.get_game_piece_at_position(moving_from_square).move_piece(self, moving_from_square, moving_to_square)
+    def push_move_by_index(self, moving_from_index, moving_to_index):
+        """
+        Index version of push_move() without any checks. The undo record is a tuple holding the move, the captured
+        piece, the moving piece's river flag, both check flags, the game state, whether those were up to date, the
+        player to move and, for a capture, the position history it replaced.
 
-        # Update the check status for both sides.
-        self.is_in_check(self.get_current_player())
-        self.is_in_check(self.get_defending_player())
+        The position before the move is added to the position history. A capture starts a new history instead.
+        """
+        piece = self._game_board[moving_from_index]
+        captured_piece = self._game_board[moving_to_index]
+        if captured_piece is EMPTY_SQUARE:
+            replaced_position_history = None
+            self._position_occurrences.setdefault(self._zobrist_key, []).append(len(self._position_history))
+            self._position_history.append(self._zobrist_key)
+        else:
+            replaced_position_history = (self._position_history, self._position_occurrences, self._check_streaks,
+                                         self._moves_before_position_history)
+            self._position_history = []
+            self._position_occurrences = {}
+            self._check_streaks = []
+            self._moves_before_position_history = 0
+        self._move_stack.append((moving_from_index, moving_to_index, captured_piece,
+                                 piece.has_crossed_river(), self._red_is_in_check, self._black_is_in_check,
+                                 self._game_state, self._check_status_is_current, self._current_player,
+                                 replaced_position_history))
+        self.move_piece(moving_from_index, moving_to_index)
+        self._check_status_is_current = False
+
+        # Count the checks the player gives in a row, for finding perpetual check (see update_draw_status()).
+        if replaced_position_history is None:
+            self.update_check_streaks(piece.get_team())
+
+        # A Soldier that lands on the far side of the river may now move sideways.
+        if piece.get_type() == 'Soldier' and is_across_river(moving_to_index, piece.get_team()):
+            piece.set_crossed_river()
 
-        # Advance to the next players turn
         self.next_player_turn()
+
+    def update_check_streaks(self, player):
+        """
+        Adds the check streak of the move player just made to _check_streaks: one more than the streak of player's
+        previous move if the move gives check, otherwise 0.
+        """
+        if player == 'Red':
+            enemy = 'Black'
+        else:
+            enemy = 'Red'
+        general = self.get_general(enemy)
+        if general is not None and self.is_square_attacked_by(general.get_index(), player):
+            check_streaks = self._check_streaks
+            check_streaks.append(check_streaks[-2] + 1 if len(check_streaks) > 1 else 1)
+        else:
+            self._check_streaks.append(0)
+
+    def pop_move(self):
+        """
+        Takes back the last move made with push_move() or make_move(), restoring the board, the check flags, the game
+        state and the player to move. Returns False if there is no move to take back.
+        """
+        if not self._move_stack:
+            return False
+        (moving_from_index, moving_to_index, captured_piece, has_crossed_river, red_is_in_check, black_is_in_check,
+         game_state, check_status_is_current, current_player, replaced_position_history) = self._move_stack.pop()
+        piece = self._game_board[moving_to_index]
+        self.unmove_piece(moving_from_index, moving_to_index, captured_piece)
+        if replaced_position_history is None:
+            self._check_streaks.pop()
+            position_key = self._position_history.pop()
+            position_occurrences = self._position_occurrences[position_key]
+            position_occurrences.pop()
+            if not position_occurrences:
+                del self._position_occurrences[position_key]
+        else:
+            (self._position_history, self._position_occurrences, self._check_streaks,
+             self._moves_before_position_history) = replaced_position_history
+        piece.set_crossed_river(has_crossed_river)
+        self._red_is_in_check = red_is_in_check
+        self._black_is_in_check = black_is_in_check
+        self._game_state = game_state
+        self._check_status_is_current = check_status_is_current
+        if current_player != self._current_player:
+            self.next_player_turn()
         return True
+
+    def get_move_stack_size(self):
+        """Returns the number of moves that can currently be taken back with pop_move()."""
+        return len(self._move_stack)
+
+    def get_move_history(self):
+        """
+        Returns the moves played since the position was set up, oldest first, as (moving_from_square,
+        moving_to_square) tuples. These are the moves a game record is written from (see XiangqiRecord.py).
+        """
+        return [(SQUARES[move_record[0]], SQUARES[move_record[1]]) for move_record in self._move_stack]
+
+    def get_starting_fen(self):
+        """
+        Returns the FEN of the position the moves in get_move_history() were played from. The moves are taken back to
+        find it and then made again, so the game is unchanged afterwards.
+        """
+        move_stack = list(self._move_stack)
+        check_status = (self._red_is_in_check, self._black_is_in_check, self._game_state,
+                        self._check_status_is_current)
+        while self._move_stack:
+            self.pop_move()
+        starting_fen = board_cells_to_fen(self._game_board, self._current_player, self._first_ply // 2 + 1,
+                                          self._moves_before_position_history)
+        for move_record in move_stack:
+            self.push_move_by_index(move_record[0], move_record[1])
+
+        # The undo records made by the moves above would hold the check status of the moment, so the original records
+        # and status are put back.
+        self._move_stack = move_stack
+        self._red_is_in_check, self._black_is_in_check, self._game_state, self._check_status_is_current = check_status
+        return starting_fen
@@ -4,7 +4,7 @@
 
 # All debugging related functions and classes written to aid in debugging XiangqiGame.
 
-from XiangqiGame import XiangqiGame, indices_to_algebraic_notation, generate_threat_dictionary, find_current_general, try_move
+from XiangqiGame import XiangqiGame, index_to_square, generate_threat_dictionary, find_current_general, try_move
 
 
 class XiangqiGameDebug(XiangqiGame):
@@ -18,17 +18,10 @@ class XiangqiGameDebug(XiangqiGame):
 
     def debug_display_all_pieces(self):
         print('--- DISPLAY PIECE STATISTICS ROUTINE ---')
-        board = self.get_game_board()
-        row_index = 0
-        for row in board:
-            column_index = 0
-            for column in row:
-                if column.get_type() is not None:
-                    self.debug_display_piece(indices_to_algebraic_notation(column_index, row_index))
-                    print(' - Position according to Game: {}'.format(
-                        indices_to_algebraic_notation(column_index, row_index)), end='')
-                column_index += 1
-            row_index += 1
+        for index, space in enumerate(self.get_board_cells()):
+            if space.get_type() is not None:
+                self.debug_display_piece(index_to_square(index))
+                print(' - Position according to Game: {}'.format(index_to_square(index)), end='')
         print('\n\n--- END DISPLAY PIECE STATISTICS ROUTINE ---')
 
     def debug_print_board(self):
@@ -67,7 +60,7 @@ class XiangqiGameDebug(XiangqiGame):
         current_player = self.get_current_player()
         threat_dictionary = generate_threat_dictionary(self, current_player)
         current_general = find_current_general(self)
-        general_position = current_general.get_position()
+        general_position = current_general.get_index()
         general_possible_moves = current_general.list_possible_moves(self)
 
         invalid_moves = []
@@ -85,7 +78,8 @@ class XiangqiGameDebug(XiangqiGame):
             general_possible_moves.remove(invalid_move)
 
         for threat in threat_dictionary:
-            print(threat, 'at', threat.get_position(), '--->', threat_dictionary[threat])
-        print("Defending general current position: {} | Valid moves: {}".format(general_position,
-                                                                                general_possible_moves))
+            print(threat, 'at', threat.get_position(), '--->', [index_to_square(move) for move in
+                                                               threat_dictionary[threat]])
+        print("Defending general current position: {} | Valid moves: {}".format(
+            index_to_square(general_position), [index_to_square(move) for move in general_possible_moves]))
 
@@ -5,9 +5,26 @@
 # Unittests written to verify that functionality of the game continues to work as development progress was made.
 # There are a total of 34 tests that I created to test a variety of mechanics for the game as well as individual pieces.
 
+import contextlib
+import io
+import random
 import unittest
 from XiangqiGame import XiangqiGame, GamePiece, General, Advisor, Elephant, Horse
-from XiangqiGame import Cannon, Chariot, Soldier
+from XiangqiGame import Cannon, Chariot, Soldier, square_to_index, compute_zobrist_key, OPENING_FEN
+from XiangqiGame import GENERAL_MOVES, ADVISOR_MOVES, ELEPHANT_MOVES, HORSE_MOVES, SOLDIER_MOVES, EMPTY_BOARD_FEN
+from XiangqiGame import EMPTY_SQUARE, PACKED_POSITION_BYTES, get_packed_piece, get_packed_player
+from XiangqiGame import iterate_packed_positions, get_line_slides, SLIDES, QUIET_MOVES, BACKENDS
+from XiangqiGameDebug import XiangqiGameDebug
+from XiangqiPerft import PERFT_POSITIONS, build_position
+from XiangqiSearch import XiangqiSearch, find_best_move
+from XiangqiEvaluation import PIECE_VALUES, evaluate_position, evaluate_for_player, get_piece_square_value
+from XiangqiRecord import GameRecord, record_game, read_game_records, replay_game_records, move_to_wxf
+from XiangqiRecord import wxf_to_move
+from XiangqiBatch import validate_games, encode_moves, replay_encoded_moves
+from XiangqiTranspositionTable import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+from XiangqiArrayEvaluation import numpy, games_to_array, packed_positions_to_array, evaluate_boards
+from XiangqiArrayEvaluation import extract_features, mobility_scores, MATERIAL_FEATURE, MOBILITY_FEATURE
+from XiangqiBenchmark import build_corpus, run_benchmarks, find_regressions
 
 
 class GeneralTest(unittest.TestCase):
@@ -304,6 +321,1124 @@ class GameMechanicsTest(unittest.TestCase):
         self.assertEqual(self.game.get_game_state(), 'BLACK_WON')
 
 
+class AttackTableTest(unittest.TestCase):
+    """Test routines for the incrementally updated attack tables."""
+
+    def setUp(self) -> None:
+        self.game = XiangqiGame()
+        self.game.new_game()
+
+    def test_attack_tables_match_full_rebuild_after_moves(self):
+        for moving_from_square, moving_to_square in (('h1', 'g3'), ('h10', 'g8'), ('b3', 'e3'), ('b8', 'e8'),
+                                                     ('a1', 'a2'), ('c7', 'c6')):
+            self.assertTrue(self.game.make_move(moving_from_square, moving_to_square))
+        incremental_tables = [list(self.game.get_attack_table(player)) for player in ('Red', 'Black')]
+        self.game.rebuild_attacks()
+        rebuilt_tables = [list(self.game.get_attack_table(player)) for player in ('Red', 'Black')]
+        self.assertEqual(incremental_tables, rebuilt_tables)
+
+    def test_hobbled_horse_does_not_attack(self):
+        self.assertTrue(self.game.is_square_attacked_by(square_to_index('c3'), 'Red'))
+        self.assertFalse(self.game.is_square_attacked_by(square_to_index('d2'), 'Black'))
+        self.game.clear_game_board()
+        self.game.add_piece(General('Red', 'e1'))
+        self.game.add_piece(General('Black', 'e10'))
+        self.game.add_piece(Horse('Red', 'b1'))
+        self.assertTrue(self.game.is_square_attacked_by(square_to_index('c3'), 'Red'))
+        self.game.add_piece(Soldier('Black', 'b2'))
+        self.assertFalse(self.game.is_square_attacked_by(square_to_index('c3'), 'Red'))
+
+    def test_red_general_can_step_sideways_out_of_check(self):
+        self.game.clear_game_board()
+        self.game.add_piece(General('Red', 'e1'))
+        self.game.add_piece(General('Black', 'e10'))
+        self.game.add_piece(Chariot('Black', 'e8'))
+        self.assertTrue(self.game.is_in_check('Red'))
+        self.assertTrue(self.game.make_move('e1', 'd1'))
+        self.assertFalse(self.game.is_in_check('Red'))
+
+
+class MoveStackTest(unittest.TestCase):
+    """Test routines for push_move() and pop_move()."""
+
+    def setUp(self) -> None:
+        self.game = XiangqiGame()
+        self.game.new_game()
+
+    def snapshot(self):
+        return ([(piece.get_type(), piece.get_team()) for piece in self.game.get_board_cells()],
+                [list(self.game.get_attack_table(player)) for player in ('Red', 'Black')],
+                self.game.get_current_player(), self.game.get_game_state(),
+                self.game.get_player_in_check('Red'), self.game.get_player_in_check('Black'))
+
+    def test_pop_move_with_nothing_to_undo(self):
+        self.assertFalse(self.game.pop_move())
+
+    def test_push_and_pop_restore_captured_piece(self):
+        self.assertTrue(self.game.make_move('b3', 'e3'))
+        before = self.snapshot()
+        self.assertTrue(self.game.push_move('h8', 'h1'))
+        self.assertEqual(self.game.get_game_piece_at_position('h1').get_team(), 'Black')
+        self.assertEqual(self.game.get_current_player(), 'Red')
+        self.assertTrue(self.game.pop_move())
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(self.game.get_game_piece_at_position('h1').get_type(), 'Horse')
+
+    def test_push_move_rejects_wrong_player(self):
+        self.assertFalse(self.game.push_move('h8', 'h1'))
+        self.assertEqual(self.game.get_move_stack_size(), 0)
+
+    def test_pop_move_takes_back_checkmate(self):
+        self.game.clear_game_board()
+        self.game.add_piece(General('Red', 'e1'))
+        self.game.add_piece(General('Black', 'e10'))
+        self.game.add_piece(Chariot('Red', 'a1'))
+        self.game.add_piece(Chariot('Red', 'i1'))
+        self.game.add_piece(Horse('Red', 'h1'))
+        self.game.add_piece(Soldier('Black', 'e7'))
+        self.game.make_move('a1', 'a9')
+        self.game.make_move('e7', 'e6')
+        before = self.snapshot()
+        self.game.make_move('i1', 'i10')
+        self.assertEqual(self.game.get_game_state(), 'RED_WON')
+        self.assertTrue(self.game.pop_move())
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(self.game.get_game_state(), 'UNFINISHED')
+
+    def test_soldier_river_flag_is_restored(self):
+        self.assertTrue(self.game.make_move('e4', 'e5'))
+        self.assertTrue(self.game.make_move('a7', 'a6'))
+        self.assertTrue(self.game.make_move('e5', 'e6'))
+        self.assertTrue(self.game.get_game_piece_at_position('e6').has_crossed_river())
+        self.assertTrue(self.game.pop_move())
+        self.assertFalse(self.game.get_game_piece_at_position('e5').has_crossed_river())
+
+
+class ZobristTest(unittest.TestCase):
+    """Test routines for the incrementally maintained Zobrist key."""
+
+    def setUp(self) -> None:
+        self.game = XiangqiGame()
+        self.game.new_game()
+
+    def test_incremental_key_matches_full_computation(self):
+        for moving_from_square, moving_to_square in (('b3', 'e3'), ('h8', 'h1'), ('i1', 'i2'), ('b8', 'e8')):
+            self.assertTrue(self.game.make_move(moving_from_square, moving_to_square))
+            self.assertEqual(self.game.get_zobrist_key(), compute_zobrist_key(self.game))
+        self.game.remove_piece('a1')
+        self.game.add_piece(Horse('Red', 'e5'))
+        self.assertEqual(self.game.get_zobrist_key(), compute_zobrist_key(self.game))
+
+    def test_transposed_move_orders_share_a_key(self):
+        other_game = XiangqiGame()
+        for moving_from_square, moving_to_square in (('h1', 'g3'), ('h10', 'g8'), ('b1', 'c3'), ('b10', 'c8')):
+            self.assertTrue(self.game.make_move(moving_from_square, moving_to_square))
+        for moving_from_square, moving_to_square in (('b1', 'c3'), ('b10', 'c8'), ('h1', 'g3'), ('h10', 'g8')):
+            self.assertTrue(other_game.make_move(moving_from_square, moving_to_square))
+        self.assertEqual(self.game.get_zobrist_key(), other_game.get_zobrist_key())
+
+    def test_pop_move_restores_key_and_side_to_move_changes_key(self):
+        start_key = self.game.get_zobrist_key()
+        self.assertTrue(self.game.push_move('h1', 'g3'))
+        self.assertNotEqual(self.game.get_zobrist_key(), start_key)
+        self.assertTrue(self.game.pop_move())
+        self.assertEqual(self.game.get_zobrist_key(), start_key)
+        self.game.next_player_turn()
+        self.assertNotEqual(self.game.get_zobrist_key(), start_key)
+
+
+class LegalMovesTest(unittest.TestCase):
+    """Test routines for legal_moves()."""
+
+    def setUp(self) -> None:
+        self.game = XiangqiGame()
+        self.game.new_game()
+
+    def test_opening_position_has_44_legal_moves(self):
+        self.assertEqual(len(self.game.legal_moves()), 44)
+
+    def test_legal_moves_agree_with_make_move(self):
+        self.assertTrue(self.game.make_move('h3', 'e3'))
+        self.assertTrue(self.game.make_move('h10', 'g8'))
+        legal_moves = set(self.game.legal_moves())
+        for piece in self.game.get_pieces('Red'):
+            moving_from_square = piece.get_position()
+            for column in 'abcdefghi':
+                for row in range(1, 11):
+                    moving_to_square = column + str(row)
+                    move_result = self.game.make_move(moving_from_square, moving_to_square)
+                    if move_result:
+                        self.game.pop_move()
+                    self.assertEqual(move_result, (moving_from_square, moving_to_square) in legal_moves)
+
+    def test_pinned_chariot_can_only_move_along_the_pin(self):
+        self.game.clear_game_board()
+        self.game.add_piece(General('Red', 'e1'))
+        self.game.add_piece(General('Black', 'd10'))
+        self.game.add_piece(Chariot('Red', 'e3'))
+        self.game.add_piece(Chariot('Black', 'e8'))
+        chariot_moves = [move for move in self.game.legal_moves() if move[0] == 'e3']
+        self.assertEqual(sorted(chariot_moves), [('e3', 'e2'), ('e3', 'e4'), ('e3', 'e5'), ('e3', 'e6'),
+                                                 ('e3', 'e7'), ('e3', 'e8')])
+
+    def test_chariot_cannot_capture_own_piece(self):
+        self.assertFalse(self.game.make_move('a1', 'a4'))
+
+    def test_no_legal_moves_after_checkmate(self):
+        self.game.clear_game_board()
+        self.game.add_piece(General('Red', 'e1'))
+        self.game.add_piece(General('Black', 'e10'))
+        self.game.add_piece(Chariot('Red', 'a1'))
+        self.game.add_piece(Chariot('Red', 'i1'))
+        self.game.add_piece(Horse('Red', 'h1'))
+        self.game.add_piece(Soldier('Black', 'e7'))
+        self.game.make_move('a1', 'a9')
+        self.game.make_move('e7', 'e6')
+        self.game.make_move('i1', 'i10')
+        self.assertEqual(self.game.legal_moves(), [])
+
+
+class PerftTest(unittest.TestCase):
+    """Test routines that compare perft node counts against the reference counts in XiangqiPerft."""
+
+    def test_perft_counts_match_reference_counts(self):
+        for name, player, pieces, reference_counts in PERFT_POSITIONS:
+            game = build_position(player, pieces)
+            for depth in (1, 2):
+                self.assertEqual(game.perft(depth), reference_counts[depth - 1], name)
+
+    def test_perft_leaves_position_unchanged(self):
+        game = XiangqiGame()
+        key = game.get_zobrist_key()
+        game.perft(2)
+        self.assertEqual(game.get_zobrist_key(), key)
+        self.assertEqual(game.get_move_stack_size(), 0)
+        self.assertEqual(game.get_current_player(), 'Red')
+
+
+class CheckmateTest(unittest.TestCase):
+    """Test routines for verify_checkmate() finding the different ways out of check."""
+
+    def setUp(self) -> None:
+        self.game = XiangqiGame()
+        self.game.clear_game_board()
+        self.game.add_piece(General('Red', 'e1'))
+        self.game.add_piece(Advisor('Red', 'd1'))
+        self.game.add_piece(Advisor('Red', 'f1'))
+        self.game.add_piece(General('Black', 'd10'))
+
+    def test_chariot_check_with_no_reply_is_checkmate(self):
+        self.game.remove_piece('d1')
+        self.game.remove_piece('f1')
+        self.game.add_piece(Chariot('Black', 'e8'))
+        self.game.add_piece(Chariot('Black', 'f8'))
+        self.assertTrue(self.game.is_in_check('Red'))
+        self.assertTrue(self.game.verify_checkmate())
+
+    def test_check_can_be_blocked(self):
+        self.game.add_piece(Chariot('Black', 'e8'))
+        self.game.add_piece(Horse('Red', 'g3'))
+        self.assertFalse(self.game.verify_checkmate())
+
+    def test_checking_piece_can_be_captured(self):
+        self.game.add_piece(Chariot('Black', 'e8'))
+        self.game.add_piece(Chariot('Red', 'a8'))
+        self.assertFalse(self.game.verify_checkmate())
+
+    def test_cannon_screen_can_step_aside(self):
+        self.game.add_piece(Cannon('Black', 'e8'))
+        self.game.add_piece(Soldier('Red', 'e5'))
+        self.game.add_piece(Chariot('Black', 'i2'))
+        self.assertTrue(self.game.is_in_check('Red'))
+        self.assertFalse(self.game.verify_checkmate())
+
+    def test_horse_check_can_be_blocked_on_its_leg(self):
+        self.game.add_piece(Horse('Black', 'f3'))
+        self.game.add_piece(Chariot('Black', 'i2'))
+        self.game.add_piece(Chariot('Red', 'a2'))
+        self.assertTrue(self.game.is_in_check('Red'))
+        self.assertFalse(self.game.verify_checkmate())
+        self.assertEqual([move for move in self.game.legal_moves()], [('a2', 'f2')])
+
+
+class CheckStatusTest(unittest.TestCase):
+    """Test routines for the check flags and game state only being worked out when asked for."""
+
+    def setUp(self) -> None:
+        self.game = XiangqiGame()
+        self.calls = 0
+        update_check_status = self.game.update_check_status
+
+        def counting_update_check_status():
+            self.calls += 1
+            update_check_status()
+        self.game.update_check_status = counting_update_check_status
+
+    def test_moves_do_not_work_out_check_status(self):
+        self.assertTrue(self.game.make_move('h3', 'e3'))
+        self.assertTrue(self.game.push_move('h10', 'g8'))
+        self.assertTrue(self.game.push_move('e3', 'e7'))
+        self.game.pop_move()
+        self.assertEqual(self.calls, 0)
+
+    def test_check_status_is_worked_out_once_per_position(self):
+        self.game.clear_game_board()
+        self.game.add_piece(General('Red', 'd1'))
+        self.game.add_piece(Chariot('Red', 'a2'))
+        self.game.add_piece(General('Black', 'e10'))
+        self.assertTrue(self.game.make_move('a2', 'e2'))
+        self.assertTrue(self.game.is_in_check('Black'))
+        self.assertTrue(self.game.is_in_check('black'))
+        self.assertFalse(self.game.is_in_check('Red'))
+        self.assertEqual(self.game.get_game_state(), 'UNFINISHED')
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(self.game.make_move('e10', 'f10'))
+        self.assertFalse(self.game.is_in_check('Black'))
+        self.assertEqual(self.calls, 2)
+
+    def test_checkmate_is_found_when_game_state_is_asked_for(self):
+        self.game.clear_game_board()
+        self.game.add_piece(General('Red', 'd1'))
+        self.game.add_piece(Chariot('Red', 'd3'))
+        self.game.add_piece(Chariot('Red', 'f3'))
+        self.game.add_piece(Chariot('Red', 'a2'))
+        self.game.add_piece(Chariot('Red', 'a9'))
+        self.game.add_piece(General('Black', 'e10'))
+        self.assertTrue(self.game.make_move('a2', 'e2'))
+        self.assertEqual(self.calls, 0)
+        self.assertEqual(self.game.get_game_state(), 'RED_WON')
+        self.assertTrue(self.game.is_in_check('Black'))
+        self.assertEqual(self.calls, 1)
+        self.game.pop_move()
+        self.assertEqual(self.game.get_game_state(), 'UNFINISHED')
+
+
+class SearchTest(unittest.TestCase):
+    """Test routines for the alpha-beta search."""
+
+    def setUp(self) -> None:
+        self.game = XiangqiGame()
+
+    def test_best_move_is_legal_and_game_is_unchanged(self):
+        zobrist_key = self.game.get_zobrist_key()
+        result = XiangqiSearch(self.game).search(max_depth=2, time_limit=None)
+        self.assertEqual(result.get_depth(), 2)
+        self.assertEqual(self.game.get_zobrist_key(), zobrist_key)
+        self.assertEqual(self.game.get_move_stack_size(), 0)
+        self.assertIn(result.get_best_move(), self.game.legal_moves())
+        self.assertEqual(result.get_principal_variation()[0], result.get_best_move())
+        self.assertTrue(self.game.make_move(*result.get_best_move()))
+
+    def test_finds_checkmate_in_one(self):
+        self.game.clear_game_board()
+        self.game.add_piece(General('Red', 'd1'))
+        self.game.add_piece(Chariot('Red', 'f3'))
+        self.game.add_piece(Chariot('Red', 'a2'))
+        self.game.add_piece(Chariot('Red', 'a9'))
+        self.game.add_piece(General('Black', 'e10'))
+        result = XiangqiSearch(self.game).search(time_limit=None, max_depth=3)
+        self.assertEqual(result.get_best_move(), ('a2', 'e2'))
+        self.assertTrue(result.is_mate_score())
+        self.assertTrue(self.game.make_move('a2', 'e2'))
+        self.assertEqual(self.game.get_game_state(), 'RED_WON')
+
+    def test_captures_hanging_chariot(self):
+        self.game.clear_game_board()
+        self.game.add_piece(General('Red', 'e1'))
+        self.game.add_piece(Horse('Red', 'c3'))
+        self.game.add_piece(General('Black', 'f10'))
+        self.game.add_piece(Chariot('Black', 'd5'))
+        self.assertEqual(find_best_move(self.game, time_limit=None, max_depth=2), ('c3', 'd5'))
+
+    def test_no_move_when_checkmated(self):
+        self.game.clear_game_board()
+        self.game.add_piece(General('Red', 'e1'))
+        self.game.add_piece(Chariot('Black', 'e8'))
+        self.game.add_piece(Chariot('Black', 'f8'))
+        self.game.add_piece(General('Black', 'd10'))
+        self.assertIsNone(find_best_move(self.game, time_limit=None, max_depth=2))
+
+    def test_node_limit_stops_iterative_deepening(self):
+        result = XiangqiSearch(self.game).search(time_limit=None, node_limit=200)
+        self.assertGreaterEqual(result.get_depth(), 1)
+        self.assertLess(result.get_depth(), 4)
+        self.assertIsNotNone(result.get_best_move())
+        self.assertEqual(self.game.get_move_stack_size(), 0)
+
+
+class TranspositionTableTest(unittest.TestCase):
+    """Test routines for the transposition table used by the search."""
+
+    def setUp(self) -> None:
+        self.table = TranspositionTable(megabytes=1)
+        self.bucket_count = self.table.get_size() // 2
+
+    def test_size_fits_in_memory_provided(self):
+        self.assertLessEqual(self.table.get_size() * 17, 1024 * 1024)
+        self.assertGreater(self.table.get_size() * 17 * 2, 1024 * 1024)
+
+    def test_store_and_probe(self):
+        key = 0x123456789ABCDEF0
+        self.assertIsNone(self.table.probe(key))
+        self.table.store(key, 5, EXACT, -250, (85, 76))
+        self.assertEqual(self.table.probe(key), (5, EXACT, -250, (85, 76)))
+        self.table.store(key, 6, UPPER_BOUND, -300, None)
+        self.assertEqual(self.table.probe(key), (6, UPPER_BOUND, -300, (85, 76)))
+        self.assertEqual(self.table.get_hits(), 2)
+        self.assertEqual(self.table.get_probes(), 3)
+        self.assertAlmostEqual(self.table.get_fill(), 1 / self.table.get_size())
+
+    def test_depth_preferred_and_always_replace_slots(self):
+        deep_key = 7
+        shallow_key = 7 + self.bucket_count
+        newer_key = 7 + 2 * self.bucket_count
+        self.table.store(deep_key, 8, LOWER_BOUND, 40, None)
+        self.table.store(shallow_key, 2, EXACT, 10, None)
+        self.table.store(newer_key, 3, EXACT, 20, None)
+        self.assertIsNotNone(self.table.probe(deep_key))
+        self.assertIsNone(self.table.probe(shallow_key))
+        self.assertEqual(self.table.probe(newer_key), (3, EXACT, 20, None))
+        self.assertEqual(self.table.get_collisions(), 1)
+
+        # Entries from an earlier search give way to any depth.
+        self.table.new_search()
+        self.table.store(shallow_key, 1, EXACT, 10, None)
+        self.assertIsNone(self.table.probe(deep_key))
+        self.assertIsNotNone(self.table.probe(shallow_key))
+
+    def test_clear(self):
+        self.table.store(99, 1, EXACT, 0, None)
+        self.table.clear()
+        self.assertIsNone(self.table.probe(99))
+        self.assertEqual(self.table.get_fill(), 0)
+
+    def test_search_fills_and_reuses_table(self):
+        game = XiangqiGame()
+        search = XiangqiSearch(game, self.table)
+        result = search.search(max_depth=3, time_limit=None)
+        self.assertIs(search.get_transposition_table(), self.table)
+        self.assertGreater(self.table.get_fill(), 0)
+        self.assertGreater(self.table.get_hits(), 0)
+        self.assertIn(result.get_best_move(), game.legal_moves())
+
+
+class EvaluationTest(unittest.TestCase):
+    """Test routines for the piece-square evaluation and keeping it up to date."""
+
+    def setUp(self) -> None:
+        self.game = XiangqiGame()
+
+    def test_opening_position_is_even(self):
+        self.assertEqual(self.game.get_evaluation(), 0)
+        self.assertEqual(evaluate_position(self.game), 0)
+
+    def test_capture_changes_score_by_captured_piece(self):
+        before = self.game.get_evaluation()
+        self.assertTrue(self.game.make_move('b3', 'b10'))
+        black_horse = get_piece_square_value('Black', 'Horse', square_to_index('b10'))
+        cannon_move = get_piece_square_value('Red', 'Cannon', square_to_index('b10')) - \
+            get_piece_square_value('Red', 'Cannon', square_to_index('b3'))
+        self.assertEqual(self.game.get_evaluation(), before - black_horse + cannon_move)
+        self.assertGreater(self.game.get_evaluation(), PIECE_VALUES['Horse'] - 50)
+        self.assertEqual(self.game.get_evaluation(), evaluate_position(self.game))
+        self.assertEqual(evaluate_for_player(self.game, 'Black'), -self.game.get_evaluation())
+        self.game.pop_move()
+        self.assertEqual(self.game.get_evaluation(), before)
+
+    def test_soldier_scores_higher_after_crossing_river(self):
+        self.assertTrue(self.game.make_move('e4', 'e5'))
+        self.assertTrue(self.game.make_move('a7', 'a6'))
+        before_crossing = self.game.get_evaluation()
+        self.assertTrue(self.game.make_move('e5', 'e6'))
+        self.assertTrue(self.game.get_game_piece_at_position('e6').has_crossed_river())
+        self.assertGreaterEqual(self.game.get_evaluation() - before_crossing, PIECE_VALUES['Soldier'])
+
+    def test_score_follows_board_edits(self):
+        self.game.remove_piece('a1')
+        self.game.add_piece(Chariot('Black', 'e5'))
+        self.assertEqual(self.game.get_evaluation(), evaluate_position(self.game))
+        self.game.set_game_board(self.game.get_game_board())
+        self.assertEqual(self.game.get_evaluation(), evaluate_position(self.game))
+
+
+class FenTest(unittest.TestCase):
+    """Test routines for loading and saving positions as FEN strings."""
+
+    def test_opening_position_round_trip(self):
+        game = XiangqiGame()
+        self.assertEqual(game.to_fen(), OPENING_FEN)
+        loaded_game = XiangqiGame.from_fen(OPENING_FEN)
+        self.assertEqual(loaded_game.get_zobrist_key(), game.get_zobrist_key())
+        self.assertEqual(sorted(loaded_game.legal_moves()), sorted(game.legal_moves()))
+
+    def test_side_to_move_and_move_number(self):
+        game = XiangqiGame()
+        self.assertTrue(game.make_move('h3', 'e3'))
+        self.assertEqual(game.to_fen().split()[1:], ['b', '-', '-', '1', '1'])
+        self.assertTrue(game.make_move('h10', 'g8'))
+        fen = game.to_fen()
+        self.assertEqual(fen, 'rnbakab1r/9/1c4nc1/p1p1p1p1p/9/9/P1P1P1P1P/1C2C4/9/RNBAKABNR w - - 2 2')
+        loaded_game = XiangqiGame(fen)
+        self.assertEqual(loaded_game.get_zobrist_key(), game.get_zobrist_key())
+        self.assertEqual(loaded_game.to_fen(), fen)
+
+    def test_black_to_move_position(self):
+        game = XiangqiGame('3k5/9/4P4/9/9/9/9/9/9/4K4 b - - 0 30')
+        self.assertEqual(game.get_current_player(), 'Black')
+        self.assertEqual(game.get_move_number(), 30)
+        self.assertTrue(game.get_game_piece_at_position('e8').has_crossed_river())
+        self.assertTrue(game.make_move('d10', 'd9'))
+        self.assertEqual(game.to_fen(), '9/3k5/4P4/9/9/9/9/9/9/4K4 w - - 1 31')
+
+    def test_alternate_letters_and_short_fen(self):
+        game = XiangqiGame('rheakaehr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RHEAKAEHR')
+        self.assertEqual(game.to_fen(), OPENING_FEN)
+
+    def test_invalid_fen_is_rejected(self):
+        game = XiangqiGame()
+        for fen in ('', 'rnbakabnr/9/1c5c1', 'rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNX w',
+                    'rnbakabnr/10/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w',
+                    'rnbakabnr/8/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w',
+                    'rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR x',
+                    'rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w - - x 1'):
+            self.assertFalse(game.set_fen(fen))
+        self.assertEqual(game.to_fen(), OPENING_FEN)
+        with self.assertRaises(ValueError):
+            XiangqiGame.from_fen('not a fen')
+
+
+class PackedPositionTest(unittest.TestCase):
+    """Test routines for the packed binary form of a position."""
+
+    def setUp(self) -> None:
+        self.game = XiangqiGame()
+
+    def test_opening_position_round_trip(self):
+        packed = self.game.to_bytes()
+        self.assertEqual(len(packed), PACKED_POSITION_BYTES)
+        self.assertEqual(packed[:5].hex(), 'dcba9abcd0')
+        loaded_game = XiangqiGame.from_bytes(packed)
+        self.assertEqual(loaded_game.to_fen(), OPENING_FEN)
+        self.assertEqual(loaded_game.get_zobrist_key(), self.game.get_zobrist_key())
+
+    def test_side_to_move_and_crossed_soldiers(self):
+        self.game.set_fen('3k5/9/4P4/9/9/9/9/9/9/4K4 b')
+        loaded_game = XiangqiGame.from_bytes(self.game.to_bytes())
+        self.assertEqual(loaded_game.get_current_player(), 'Black')
+        self.assertTrue(loaded_game.get_game_piece_at_position('e8').has_crossed_river())
+        self.assertEqual(loaded_game.get_zobrist_key(), self.game.get_zobrist_key())
+
+    def test_reading_positions_from_memoryview(self):
+        buffer = bytearray()
+        fens = []
+        for moving_from_square, moving_to_square in (('h3', 'e3'), ('h10', 'g8'), ('e3', 'e7')):
+            self.assertTrue(self.game.make_move(moving_from_square, moving_to_square))
+            buffer += self.game.to_bytes()
+            fens.append(self.game.to_fen().split(' - ')[0])
+        view = memoryview(buffer)
+        records = list(iterate_packed_positions(buffer))
+        self.assertEqual(len(records), 3)
+        for record_number, record in enumerate(records):
+            offset = record_number * PACKED_POSITION_BYTES
+            self.assertEqual(bytes(record), bytes(view[offset:offset + PACKED_POSITION_BYTES]))
+            self.assertEqual(XiangqiGame.from_bytes(view, offset).to_fen().split(' - ')[0], fens[record_number])
+        self.assertEqual(get_packed_piece(records[2], square_to_index('e7')), (Cannon, 'Red'))
+        self.assertIsNone(get_packed_piece(view, square_to_index('h3'), PACKED_POSITION_BYTES))
+        self.assertEqual(get_packed_player(view, PACKED_POSITION_BYTES), 'Red')
+
+    def test_invalid_data_is_rejected(self):
+        self.assertFalse(self.game.set_bytes(bytes(PACKED_POSITION_BYTES - 1)))
+        self.assertFalse(self.game.set_bytes(b'\x80' + bytes(PACKED_POSITION_BYTES - 1)))
+        self.assertFalse(self.game.set_bytes(bytes(PACKED_POSITION_BYTES - 1) + b'\x02'))
+        self.assertFalse(self.game.set_bytes(bytes(PACKED_POSITION_BYTES), 1))
+        self.assertEqual(self.game.to_fen(), OPENING_FEN)
+        with self.assertRaises(ValueError):
+            XiangqiGame.from_bytes(b'')
+
+
+class GameRecordTest(unittest.TestCase):
+    """Test routines for writing, reading and replaying game records."""
+
+    def setUp(self) -> None:
+        self.game = XiangqiGame()
+        for moving_from_square, moving_to_square in (('h3', 'e3'), ('h10', 'g8'), ('h1', 'g3'), ('i10', 'h10')):
+            self.assertTrue(self.game.make_move(moving_from_square, moving_to_square))
+
+    def test_move_history(self):
+        self.assertEqual(self.game.get_move_history(), [('h3', 'e3'), ('h10', 'g8'), ('h1', 'g3'), ('i10', 'h10')])
+        self.assertEqual(self.game.get_starting_fen(), OPENING_FEN)
+        self.assertEqual(self.game.get_move_stack_size(), 4)
+
+    def test_record_in_iccs_and_wxf(self):
+        record = record_game(self.game, {'Red': 'George', 'Black': 'Computer'})
+        self.assertEqual(record.to_text(), '[Red "George"]\n[Black "Computer"]\n[Result "*"]\n[Format "ICCS"]\n\n'
+                                           '1. H2-E2 H9-G7 2. H0-G2 I9-H9\n*\n')
+        record = record_game(self.game, notation='WXF')
+        self.assertEqual(record.get_moves(), ['C2.5', 'H8+7', 'H2+3', 'R9.8'])
+
+    def test_wxf_front_and_rear_pieces(self):
+        game = XiangqiGame('4k4/9/9/9/9/4R4/9/4R4/9/3K5 w')
+        self.assertEqual(move_to_wxf(game, 'e5', 'a5'), 'R+.9')
+        self.assertEqual(move_to_wxf(game, 'e3', 'e4'), 'R-+1')
+        record = GameRecord({'FEN': game.to_fen()}, ['+R.9'])
+        self.assertEqual(record.replay().get_game_piece_at_position('a5').get_type(), 'Chariot')
+
+    def test_wxf_three_soldiers_on_one_file(self):
+        # + and - only name one of two Soldiers on a file, so a move by one of three raises instead of guessing.
+        game = XiangqiGame('3k5/9/4P4/4P4/4P4/9/9/9/9/5K3 w')
+        with self.assertRaises(ValueError):
+            move_to_wxf(game, 'e8', 'e9')
+        with self.assertRaises(ValueError):
+            wxf_to_move(game, 'P-.6')
+        self.assertEqual(wxf_to_move(game, 'K4+1'), ('f1', 'f2'))
+        with self.assertRaises(ValueError):
+            GameRecord({'FEN': game.to_fen()}, ['P5+1']).replay()
+
+        # The same goes for two pairs of Soldiers, where + would name a piece on either file.
+        game = XiangqiGame('3k5/9/2P1P4/2P1P4/9/9/9/9/9/5K3 w')
+        with self.assertRaises(ValueError):
+            move_to_wxf(game, 'c8', 'c9')
+        with self.assertRaises(ValueError):
+            wxf_to_move(game, 'P+.6')
+
+    def test_read_and_replay_several_games(self):
+        text = record_game(self.game).to_text() + '\n' + \
+            '[Event "Second"]\n\n1. h2e2 {central cannon} h9g7\n2. H2-E2 1-0\n' + \
+            '[Event "Third"]\n[FEN "3k5/9/9/9/9/9/9/9/9/5K3 b - - 0 10"]\n\n10. ... K4.5\n'
+        games = list(replay_game_records(iter(text.splitlines(True))))
+        self.assertEqual(len(games), 3)
+        record, game = games[0]
+        self.assertEqual(game.to_fen(), self.game.to_fen())
+        record, game = games[1]
+        self.assertEqual(record.get_headers(), {'Event': 'Second'})
+        self.assertEqual(record.get_result(), '1-0')
+        self.assertIsNone(game)
+        self.assertEqual(record.get_invalid_move_number(), 3)
+        record, game = games[2]
+        self.assertEqual(record.get_moves(), ['K4.5'])
+        self.assertEqual(game.get_game_piece_at_position('e10').get_type(), 'General')
+
+    def test_checkmate_result_and_fen_header(self):
+        game = XiangqiGame('4k4/R8/9/9/9/9/9/9/1R7/3K5 w')
+        self.assertTrue(game.make_move('b2', 'b10'))
+        record = record_game(game)
+        self.assertEqual(record.get_result(), '1-0')
+        self.assertEqual(record.get_headers()['FEN'], '4k4/R8/9/9/9/9/9/9/1R7/3K5 w - - 0 1')
+        record = next(read_game_records(record.to_text().splitlines()))
+        self.assertEqual(record.replay().get_game_state(), 'RED_WON')
+
+    def test_result_header_without_result_token(self):
+        text = '[Result "1-0"]\n\n1. H2-E2 H9-G7\n[Result "0-1"]\n\n1. H0-G2\n'
+        records = list(read_game_records(text.splitlines()))
+        self.assertEqual([record.get_result() for record in records], ['1-0', '0-1'])
+        self.assertEqual([record.get_moves() for record in records], [['H2-E2', 'H9-G7'], ['H0-G2']])
+
+
+class BatchValidationTest(unittest.TestCase):
+    """Test routines for validating many games at once."""
+
+    def setUp(self) -> None:
+        self.games = [
+            [('h3', 'e3'), ('h10', 'g8'), ('e3', 'e7')],
+            [('a1', 'a5')],
+            [('h3', 'e3'), ('h10', 'g8'), ('h1', 'g3'), ('g8', 'g7')],
+            [],
+            [('e4', 'e5'), ('z1', 'e6')],
+            [('h3', 'e3'), ('f10', 'e9'), ('e3', 'e7')],
+        ]
+
+    def check_results(self, results):
+        self.assertEqual(len(results), len(self.games))
+        self.assertEqual([result.get_first_illegal_ply() for result in results], [None, 0, 3, None, 1, None])
+        self.assertEqual([result.get_moves_played() for result in results], [3, 0, 3, 0, 1, 3])
+        self.assertTrue(results[0].is_valid())
+        self.assertFalse(results[1].is_valid())
+        self.assertEqual(results[0].get_game_state(), 'UNFINISHED')
+        self.assertTrue(results[5].get_player_in_check('Black'))
+        self.assertFalse(results[5].get_player_in_check('Red'))
+
+    def test_encode_moves(self):
+        self.assertEqual(encode_moves([('a10', 'i1'), ('e1', 'j5')]), bytes([0, 89, 85, 255]))
+
+    def test_validate_in_this_process(self):
+        self.check_results(validate_games(self.games, workers=1, chunk_size=4))
+
+    def test_validate_with_worker_processes(self):
+        self.check_results(validate_games(iter(self.games), workers=2, chunk_size=2))
+
+    def test_invalid_starting_fen(self):
+        with self.assertRaises(ValueError):
+            validate_games(self.games, workers=1, starting_fen='rnbakabnr/9/9 w - - 0 1')
+        with self.assertRaises(ValueError):
+            replay_encoded_moves(XiangqiGame(), encode_moves(self.games[0]), 'not a fen')
+
+
+class PieceMemoryTest(unittest.TestCase):
+    """Test routines for the slotted pieces and the shared empty square."""
+
+    def setUp(self) -> None:
+        self.game = XiangqiGame()
+
+    def test_pieces_have_no_instance_dictionary(self):
+        for piece in self.game.get_board_cells():
+            self.assertFalse(hasattr(piece, '__dict__'))
+        with self.assertRaises(AttributeError):
+            self.game.get_game_piece_at_position('a1').extra_attribute = True
+
+    def test_rules_are_shared_by_every_piece_of_a_type(self):
+        self.assertIs(self.game.get_game_piece_at_position('b1').get_rules(),
+                      self.game.get_game_piece_at_position('h10').get_rules())
+        self.assertEqual(Soldier('Red', 'a4').get_rules(), ((1, 0), (-1, 0), (0, 1), (0, -1)))
+        self.assertFalse(Elephant('Red', 'c1').is_allowed_to_cross_river())
+        self.assertFalse(Advisor('Black', 'd10').is_allowed_to_leave_palace())
+
+    def test_every_empty_space_is_the_empty_square(self):
+        self.assertTrue(self.game.make_move('h3', 'e3'))
+        self.game.remove_piece('a1')
+        self.game.set_fen(self.game.to_fen())
+        empty_spaces = [piece for piece in self.game.get_board_cells() if piece.get_type() is None]
+        self.assertEqual(len(empty_spaces), 59)
+        for piece in empty_spaces:
+            self.assertIs(piece, EMPTY_SQUARE)
+        self.assertIsNone(EMPTY_SQUARE.get_team())
+        self.assertIsNone(EMPTY_SQUARE.get_position())
+
+    def test_typeless_piece_is_stored_as_the_empty_square(self):
+        game = XiangqiGame()
+        game.add_piece(GamePiece(None, None, 'a1'))
+        self.assertIs(game.get_game_piece_at_position('a1'), EMPTY_SQUARE)
+        self.assertEqual(game.to_fen(), 'rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/1NBAKABNR w - - 0 1')
+        self.assertTrue(game.make_move('b1', 'a3'))
+
+    def test_empty_square_can_not_be_changed(self):
+        with self.assertRaises(AttributeError):
+            EMPTY_SQUARE.set_index(4)
+        with self.assertRaises(AttributeError):
+            EMPTY_SQUARE.set_crossed_river()
+        self.assertIsNone(EMPTY_SQUARE.get_index())
+
+
+class MoveTableTest(unittest.TestCase):
+    """Test routines for the precomputed move tables of the fixed step pieces."""
+
+    def test_general_and_advisor_tables_stay_in_the_palace(self):
+        self.assertEqual(sorted(GENERAL_MOVES['Red'][square_to_index('e2')]),
+                         sorted(square_to_index(square) for square in ('e1', 'e3', 'd2', 'f2')))
+        self.assertEqual(sorted(GENERAL_MOVES['Black'][square_to_index('d10')]),
+                         sorted(square_to_index(square) for square in ('e10', 'd9')))
+        self.assertEqual(ADVISOR_MOVES['Red'][square_to_index('d1')], (square_to_index('e2'),))
+        self.assertEqual(len(ADVISOR_MOVES['Black'][square_to_index('e9')]), 4)
+
+    def test_elephant_table_holds_eyes_and_stays_on_its_side(self):
+        moves = dict(ELEPHANT_MOVES['Red'][square_to_index('e3')])
+        self.assertEqual(moves, {square_to_index('c1'): square_to_index('d2'),
+                                 square_to_index('g5'): square_to_index('f4'),
+                                 square_to_index('g1'): square_to_index('f2'),
+                                 square_to_index('c5'): square_to_index('d4')})
+        self.assertEqual(len(ELEPHANT_MOVES['Red'][square_to_index('c5')]), 2)
+        self.assertEqual(len(ELEPHANT_MOVES['Black'][square_to_index('c6')]), 2)
+
+    def test_horse_table_holds_legs(self):
+        moves = dict(HORSE_MOVES[square_to_index('b1')])
+        self.assertEqual(moves, {square_to_index('a3'): square_to_index('b2'),
+                                 square_to_index('c3'): square_to_index('b2'),
+                                 square_to_index('d2'): square_to_index('c1')})
+        self.assertEqual(len(HORSE_MOVES[square_to_index('e5')]), 8)
+
+    def test_soldier_table_adds_sideways_moves_across_the_river(self):
+        self.assertEqual(SOLDIER_MOVES['Red'][square_to_index('c4')], (square_to_index('c5'),))
+        self.assertEqual(sorted(SOLDIER_MOVES['Red'][square_to_index('c6')]),
+                         sorted(square_to_index(square) for square in ('c7', 'b6', 'd6')))
+        self.assertEqual(SOLDIER_MOVES['Black'][square_to_index('c7')], (square_to_index('c6'),))
+        self.assertEqual(sorted(SOLDIER_MOVES['Black'][square_to_index('a1')]), [square_to_index('b1')])
+
+    def test_hobbled_horse_and_blocked_eye_are_not_attacked_or_valid(self):
+        game = XiangqiGame(EMPTY_BOARD_FEN)
+        game.add_piece(Horse('Red', 'e5'))
+        game.add_piece(Soldier('Red', 'e6'))
+        game.add_piece(Elephant('Red', 'e3'))
+        game.add_piece(Advisor('Red', 'f4'))
+        horse = game.get_game_piece_at_position('e5')
+        elephant = game.get_game_piece_at_position('e3')
+        horse_attacks = horse.list_attacked_squares(game)
+        self.assertNotIn(square_to_index('d7'), horse_attacks)
+        self.assertNotIn(square_to_index('f7'), horse_attacks)
+        self.assertEqual(len(horse_attacks), 6)
+        self.assertFalse(horse.is_valid_move(game, square_to_index('e5'), square_to_index('d7')))
+        self.assertTrue(horse.is_valid_move(game, square_to_index('e5'), square_to_index('c4')))
+        self.assertNotIn(square_to_index('g5'), elephant.list_attacked_squares(game))
+        self.assertFalse(elephant.is_valid_move(game, square_to_index('e3'), square_to_index('g5')))
+        self.assertTrue(elephant.is_valid_move(game, square_to_index('e3'), square_to_index('c5')))
+
+    def test_possible_moves_are_a_copy_of_the_table(self):
+        game = XiangqiGame()
+        general = game.get_game_piece_at_position('e1')
+        possible_moves = general.list_possible_moves(game)
+        possible_moves.remove(square_to_index('e2'))
+        self.assertIn(square_to_index('e2'), GENERAL_MOVES['Red'][square_to_index('e1')])
+        self.assertIn(square_to_index('e2'), general.list_possible_moves(game))
+
+    def test_debug_helper_lists_the_general_moves(self):
+        game = XiangqiGameDebug()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            game.debug_show_all_available_moves()
+        self.assertIn("Defending general current position: e1 | Valid moves: ['e2']", output.getvalue())
+
+
+class SlideTableTest(unittest.TestCase):
+    """Test routines for the Chariot and Cannon slide tables and the occupancy masks they are read with."""
+
+    def setUp(self) -> None:
+        self.game = XiangqiGame()
+
+    def assert_occupancy_matches_board(self):
+        board = self.game.get_board_cells()
+        for row in range(10):
+            for column in range(9):
+                occupied = board[row * 9 + column].get_type() is not None
+                self.assertEqual(bool(self.game.get_rank_occupancy()[row] >> column & 1), occupied)
+                self.assertEqual(bool(self.game.get_file_occupancy()[column] >> row & 1), occupied)
+
+    def test_occupancy_follows_moves_captures_and_pops(self):
+        self.assert_occupancy_matches_board()
+        for moving_from_square, moving_to_square in (('h3', 'e3'), ('h8', 'e8'), ('e3', 'e7'), ('e8', 'e4')):
+            self.assertTrue(self.game.make_move(moving_from_square, moving_to_square))
+            self.assert_occupancy_matches_board()
+        self.game.pop_move()
+        self.game.pop_move()
+        self.assert_occupancy_matches_board()
+        self.game.remove_piece('a1')
+        self.game.add_piece(Chariot('Red', 'a2'))
+        self.assert_occupancy_matches_board()
+
+    def test_slides_stop_at_the_first_piece_and_cannons_attack_past_it(self):
+        # The Red Chariot on a1 sees a2, a3 and the Soldier on a4 up its file, and b1 (the Horse) along its rank.
+        rank_slides, file_slides = get_line_slides(self.game, square_to_index('a1'))
+        self.assertEqual(sorted(rank_slides[SLIDES] + file_slides[SLIDES]),
+                         sorted(square_to_index(square) for square in ('b1', 'a2', 'a3', 'a4')))
+        self.assertEqual(sorted(file_slides[QUIET_MOVES]), sorted(square_to_index(square) for square in ('a2', 'a3')))
+
+        # The Red Cannon on h3 can capture the Black Horse on h10 over the Cannon on h8.
+        cannon = self.game.get_game_piece_at_position('h3')
+        self.assertIn(square_to_index('h10'), cannon.list_attacked_squares(self.game))
+        self.assertIn(square_to_index('h10'), cannon.list_pseudo_legal_moves(self.game))
+        self.assertNotIn(square_to_index('h8'), cannon.list_pseudo_legal_moves(self.game))
+        self.assertIn(square_to_index('e3'), cannon.list_pseudo_legal_moves(self.game))
+
+    def test_generals_see_each_other_through_an_empty_file(self):
+        self.game.set_fen('4k4/9/9/9/9/9/9/9/9/3K5 w')
+        self.assertFalse(self.game.make_move('d1', 'e1'))
+        self.game.set_fen('4k4/9/9/9/4P4/9/9/9/9/4K4 w')
+        self.assertFalse(self.game.make_move('e6', 'd6'))
+        self.assertTrue(self.game.make_move('e6', 'e7'))
+
+
+class BitboardBackendTest(unittest.TestCase):
+    """Test routines that check the bitboard backend against the reference counts and the pieces backend."""
+
+    def test_backend_is_picked_at_construction(self):
+        self.assertEqual(XiangqiGame().get_backend(), 'pieces')
+        self.assertEqual(XiangqiGame(backend='bitboard').get_backend(), 'bitboard')
+        self.assertEqual(XiangqiGame.from_fen(OPENING_FEN, 'bitboard').get_backend(), 'bitboard')
+        with self.assertRaises(ValueError):
+            XiangqiGame(backend='abacus')
+
+    def test_bitboard_perft_counts_match_reference_counts(self):
+        for name, player, pieces, reference_counts in PERFT_POSITIONS:
+            game = build_position(player, pieces, 'bitboard')
+            for depth in (1, 2, 3):
+                self.assertEqual(game.perft(depth), reference_counts[depth - 1], name)
+
+    def test_backends_agree_through_a_game(self):
+        pieces_game = XiangqiGame()
+        bitboard_game = XiangqiGame(backend='bitboard')
+        rng = random.Random(19)
+        for ply in range(80):
+            legal_moves = sorted(pieces_game.legal_moves())
+            self.assertEqual(sorted(bitboard_game.legal_moves()), legal_moves)
+            for player in ('Red', 'Black'):
+                self.assertEqual(bitboard_game.is_in_check(player), pieces_game.is_in_check(player))
+                self.assertEqual(bitboard_game.get_attack_table(player), pieces_game.get_attack_table(player))
+            self.assertEqual(bitboard_game.get_game_state(), pieces_game.get_game_state())
+            if not legal_moves:
+                break
+            moving_from_square, moving_to_square = rng.choice(legal_moves)
+            self.assertTrue(pieces_game.make_move(moving_from_square, moving_to_square))
+            self.assertTrue(bitboard_game.make_move(moving_from_square, moving_to_square))
+            self.assertEqual(bitboard_game.get_zobrist_key(), pieces_game.get_zobrist_key())
+
+    def test_bitboard_checkmate_and_flying_general(self):
+        game = XiangqiGame('3k5/4R4/3R5/9/9/9/9/9/9/4K4 b', 'bitboard')
+        self.assertTrue(game.is_in_check('Black'))
+        self.assertEqual(game.get_game_state(), 'RED_WON')
+        game = XiangqiGame('4k4/9/9/9/4P4/9/9/9/9/4K4 w', 'bitboard')
+        self.assertFalse(game.make_move('e6', 'd6'))
+        self.assertTrue(game.make_move('e6', 'e7'))
+        self.assertTrue(game.pop_move())
+        self.assertEqual(game.perft(2), XiangqiGame(game.to_fen()).perft(2))
+
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class ArrayEvaluationTest(unittest.TestCase):
+    """Test routines that check the NumPy batch evaluation against the evaluation of single games."""
+
+    def test_batch_scores_match_single_game_scores(self):
+        game = XiangqiGame()
+        games = []
+        rng = random.Random(20)
+        for ply in range(60):
+            legal_moves = sorted(game.legal_moves())
+            if not legal_moves:
+                break
+            game.make_move(*rng.choice(legal_moves))
+            games.append(XiangqiGame(game.to_fen()))
+        boards = games_to_array(games)
+        self.assertEqual(boards.shape, (len(games), 10, 9))
+        self.assertEqual(boards.dtype, numpy.int8)
+        self.assertEqual(list(evaluate_boards(boards)), [evaluate_position(game) for game in games])
+
+        # Packed positions turn into the same arrays without making any games.
+        packed_boards, black_to_move = packed_positions_to_array(b''.join(game.to_bytes() for game in games))
+        self.assertTrue((packed_boards == boards).all())
+        self.assertEqual(list(black_to_move), [game.get_current_player() == 'Black' for game in games])
+
+    def test_features(self):
+        # The opening position is even, and a lone Chariot in the corner of an empty board has 17 moves.
+        features = extract_features(games_to_array([XiangqiGame(), XiangqiGame('9/9/9/9/9/9/9/9/9/R8 w')]))
+        self.assertEqual(list(features[0]), [0, 0, 0])
+        self.assertEqual(features[1, MATERIAL_FEATURE], PIECE_VALUES['Chariot'])
+        self.assertEqual(features[1, MOBILITY_FEATURE], 17)
+
+        # A Black Horse in the middle has 8 moves, 6 with one leg blocked. On the last board the Cannon has 10 moves,
+        # not counting its capture, and the Chariot 15.
+        boards = games_to_array([XiangqiGame('9/9/9/9/4n4/9/9/9/9/9 w'), XiangqiGame('9/9/9/9/4n4/4p4/9/9/9/9 w'),
+                                 XiangqiGame('9/9/9/9/9/9/9/9/9/C1P5r w')])
+        self.assertEqual(list(mobility_scores(boards)), [-8, -6, 10 - 15])
+
+    def test_boards_must_be_a_batch(self):
+        with self.assertRaises(ValueError):
+            evaluate_boards(numpy.zeros((10, 9), dtype=numpy.int8))
+        with self.assertRaises(ValueError):
+            packed_positions_to_array(b'\x00' * 45)
+
+
+class DrawTest(unittest.TestCase):
+    """Test routines for draws by repetition and by the move limit, and for perpetual check."""
+
+    def test_third_repetition_is_a_draw(self):
+        game = XiangqiGame()
+        horse_moves = [('h1', 'g3'), ('h10', 'g8'), ('g3', 'h1'), ('g8', 'h10')]
+        for moving_from_square, moving_to_square in horse_moves * 2:
+            self.assertEqual(game.get_game_state(), 'UNFINISHED')
+            self.assertTrue(game.make_move(moving_from_square, moving_to_square))
+        self.assertEqual(game.get_repetition_count(), 3)
+        self.assertEqual(game.get_game_state(), 'DRAW')
+        self.assertFalse(game.make_move('h1', 'g3'))
+        self.assertEqual(record_game(game).get_result(), '1/2-1/2')
+
+        # Taking the last move back takes the draw back with it.
+        self.assertTrue(game.pop_move())
+        self.assertEqual(game.get_game_state(), 'UNFINISHED')
+        self.assertEqual(game.get_repetition_count(), 2)
+
+    def test_perpetual_check_loses(self):
+        # Red's Chariot checks the Black General on every move while it steps back and forth.
+        game = XiangqiGame('4k4/R8/9/9/9/9/9/9/9/3K5 w')
+        checking_moves = [('a9', 'a10'), ('e10', 'e9'), ('a10', 'a9'), ('e9', 'e10')]
+        for moving_from_square, moving_to_square in checking_moves * 2:
+            self.assertEqual(game.get_game_state(), 'UNFINISHED')
+            self.assertTrue(game.make_move(moving_from_square, moving_to_square))
+        self.assertEqual(game.get_game_state(), 'BLACK_WON')
+
+    def test_capture_starts_the_history_again(self):
+        game = XiangqiGame()
+        for moving_from_square, moving_to_square in (('h3', 'e3'), ('h10', 'g8'), ('e3', 'e7')):
+            self.assertTrue(game.make_move(moving_from_square, moving_to_square))
+        self.assertEqual(game.get_moves_without_capture(), 0)
+        self.assertTrue(game.pop_move())
+        self.assertEqual(game.get_moves_without_capture(), 2)
+
+    def test_checkmate_on_the_move_limit_wins(self):
+        # The 120th move without a capture is also checkmate. The checkmate decides the game.
+        game = XiangqiGame('4k4/R8/9/9/9/9/9/9/1R7/3K5 w - - 119 60')
+        self.assertTrue(game.make_move('b2', 'b10'))
+        self.assertEqual(game.get_game_state(), 'RED_WON')
+        self.assertEqual(game.get_game_state(), 'RED_WON')
+        self.assertTrue(game.pop_move())
+        self.assertEqual(game.get_game_state(), 'UNFINISHED')
+
+        # One move short of checkmate, the move limit still draws the game.
+        game = XiangqiGame('4k4/R8/9/9/9/9/9/9/1R7/3K5 w - - 119 60')
+        self.assertTrue(game.make_move('b2', 'b9'))
+        self.assertEqual(game.get_game_state(), 'DRAW')
+
+    def test_move_limit_count_survives_fen(self):
+        # Saved one move short of the limit, the game is drawn by the next move after it is loaded again.
+        game = XiangqiGame('3k5/9/9/r7r/9/9/R7R/9/9/5K3 w - - 118 60')
+        self.assertTrue(game.make_move('a4', 'b4'))
+        fen = game.to_fen()
+        self.assertEqual(fen, '3k5/9/9/r7r/9/9/1R6R/9/9/5K3 b - - 119 60')
+        loaded_game = XiangqiGame(fen)
+        self.assertEqual(loaded_game.get_moves_without_capture(), 119)
+        self.assertEqual(loaded_game.to_fen(), fen)
+        self.assertTrue(loaded_game.make_move('a7', 'b7'))
+        self.assertEqual(loaded_game.get_game_state(), 'DRAW')
+
+        # The count is part of the starting FEN of a game record, and a capture still starts it again.
+        record = record_game(loaded_game)
+        self.assertEqual(record.get_headers()['FEN'], fen)
+        self.assertEqual(record.replay().get_game_state(), 'DRAW')
+        game = XiangqiGame('3k5/9/9/r7r/9/9/R7R/9/9/5K3 w - - 118 60')
+        self.assertTrue(game.make_move('a4', 'a7'))
+        self.assertEqual(game.get_moves_without_capture(), 0)
+        self.assertTrue(game.pop_move())
+        self.assertEqual(game.get_moves_without_capture(), 118)
+
+    def test_move_limit_is_a_draw(self):
+        # The Chariots wander round the board without capturing, giving check or repeating a position three times.
+        game = XiangqiGame('3k5/9/9/r7r/9/9/R7R/9/9/5K3 w')
+        rng = random.Random(21)
+        for ply in range(120):
+            self.assertEqual(game.get_game_state(), 'UNFINISHED')
+            candidates = []
+            for moving_from_square, moving_to_square in sorted(game.legal_moves()):
+                if game.get_game_piece_at_position(moving_to_square).get_type() is not None:
+                    continue
+                game.push_move(moving_from_square, moving_to_square)
+                if game.get_repetition_count() < 3 and not game.is_in_check(game.get_current_player()):
+                    candidates.append((moving_from_square, moving_to_square))
+                game.pop_move()
+            self.assertTrue(game.make_move(*rng.choice(candidates)))
+        self.assertEqual(game.get_moves_without_capture(), 120)
+        self.assertEqual(game.get_game_state(), 'DRAW')
+
+
+class StalemateTest(unittest.TestCase):
+    """Test routines for a player who is not in check but has no legal move, which loses the game."""
+
+    def test_stalemated_player_loses(self):
+        # The Black General can not step onto d9 (the Chariot's rank) or e10 (facing the Red General).
+        for backend in BACKENDS:
+            game = XiangqiGame('3k5/8R/9/9/9/9/9/9/9/4K4 b', backend)
+            self.assertFalse(game.is_in_check('Black'))
+            self.assertFalse(game.has_legal_move('Black'))
+            self.assertEqual(game.get_game_state(), 'RED_WON', backend)
+
+    def test_move_that_stalemates_ends_the_game(self):
+        game = XiangqiGame('3k5/9/8R/9/9/9/9/9/9/4K4 w')
+        self.assertEqual(game.get_game_state(), 'UNFINISHED')
+        self.assertTrue(game.make_move('i8', 'i9'))
+        self.assertEqual(game.get_game_state(), 'RED_WON')
+        self.assertFalse(game.make_move('d10', 'd9'))
+
+    def test_legal_moves_are_found_one_at_a_time(self):
+        game = XiangqiGame()
+        self.assertTrue(game.has_legal_move('Red'))
+        self.assertIn(next(game.iterate_legal_moves_by_index('Red')), game.legal_moves_by_index())
+
+
+class CheckInfoTest(unittest.TestCase):
+    """Test routines for the pins, checks and Cannon screens worked out once per position."""
+
+    def get_moves_from(self, game, square):
+        """Returns the set of squares the piece on square can legally move to."""
+        return {moving_to_square for moving_from_square, moving_to_square in game.legal_moves()
+                if moving_from_square == square}
+
+    def test_piece_pinned_by_chariot_stays_on_the_line(self):
+        game = XiangqiGame('4k4/9/4r4/9/9/9/4R4/9/9/3K5 b')
+        self.assertEqual(self.get_moves_from(game, 'e8'), {'e9', 'e7', 'e6', 'e5', 'e4'})
+
+    def test_both_screens_of_a_cannon_are_pinned(self):
+        # Either piece leaving would leave the Cannon on e4 one screen short of the General.
+        game = XiangqiGame('4k4/4a4/4n4/9/9/9/4C4/9/9/3K5 b')
+        self.assertEqual(self.get_moves_from(game, 'e9'), set())
+        self.assertEqual(self.get_moves_from(game, 'e8'), set())
+
+    def test_piece_can_not_become_a_cannon_screen(self):
+        game = XiangqiGame('4k4/9/r8/9/9/9/4C4/9/9/3K5 b')
+        moves = self.get_moves_from(game, 'a8')
+        self.assertNotIn('e8', moves)
+        self.assertIn('d8', moves)
+
+    def test_horse_leg_may_only_take_the_horse(self):
+        game = XiangqiGame('4k4/3r5/3N5/9/9/9/9/9/9/3K5 b')
+        self.assertEqual(self.get_moves_from(game, 'd9'), {'d8'})
+        self.assertEqual(game.get_check_info('Black').get_pins(), {square_to_index('d9'): {square_to_index('d8')}})
+
+    def test_checkers_and_blocking_squares(self):
+        game = XiangqiGame('4k4/9/9/4p4/9/9/4C4/9/9/3K5 b')
+        check_info = game.get_check_info('Black')
+        self.assertEqual(check_info.get_checker_indices(), {square_to_index('e4')})
+        self.assertEqual(check_info.get_screen_indices(), {square_to_index('e7')})
+        self.assertIn(square_to_index('e5'), check_info.get_blocking_indices())
+
+    def test_moves_match_the_bitboard_backend(self):
+        for fen in ('4k4/9/4r4/9/9/9/4R4/9/9/3K5 b', '4k4/4a4/4n4/9/9/9/4C4/9/9/3K5 b',
+                    '4k4/9/r8/9/9/9/4C4/9/9/3K5 b', '4k4/3r5/3N5/9/9/9/9/9/9/3K5 b',
+                    '4k4/9/9/4p4/9/9/4C4/9/9/3K5 b',
+                    '2cak1bn1/3ra1r2/b1cN1n3/2p5P/p5p2/2P1P1P2/P2C5/B2A5/2R2CR1N/3AK1B2 b'):
+            self.assertEqual(sorted(XiangqiGame(fen).legal_moves()),
+                             sorted(XiangqiGame(fen, 'bitboard').legal_moves()), fen)
+
+
+class TrustedMoveTest(unittest.TestCase):
+    """Test routines for making moves that are already known to be legal."""
+
+    def test_trusted_moves_update_the_game_like_make_move(self):
+        game = XiangqiGame()
+        trusted_game = XiangqiGame()
+        rng = random.Random(24)
+        for ply in range(60):
+            legal_moves = sorted(game.legal_moves())
+            moving_from_square, moving_to_square = rng.choice(legal_moves)
+            self.assertTrue(game.make_move(moving_from_square, moving_to_square))
+            trusted_game.make_move_trusted(moving_from_square, moving_to_square)
+            self.assertEqual(trusted_game.to_fen(), game.to_fen())
+            self.assertEqual(trusted_game.get_zobrist_key(), game.get_zobrist_key())
+            self.assertEqual(trusted_game.get_evaluation(), game.get_evaluation())
+            self.assertEqual(trusted_game.get_game_state(), game.get_game_state())
+            self.assertEqual(trusted_game.is_in_check('Red'), game.is_in_check('Red'))
+            self.assertEqual(trusted_game.is_in_check('Black'), game.is_in_check('Black'))
+        self.assertEqual(trusted_game.get_move_history(), game.get_move_history())
+
+    def test_trusted_moves_still_end_the_game(self):
+        game = XiangqiGame()
+        for moving_from_square, moving_to_square in [('h1', 'g3'), ('h10', 'g8'), ('g3', 'h1'), ('g8', 'h10')] * 2:
+            game.make_move_trusted(moving_from_square, moving_to_square)
+        self.assertEqual(game.get_game_state(), 'DRAW')
+        with self.assertRaises(KeyError):
+            game.make_move_trusted('a0', 'a1')
+
+    def test_trusted_replay_of_a_record(self):
+        record = GameRecord({'Format': 'ICCS'}, ['H2-E2', 'H9-G7', 'H0-G2', 'I9-H9'], '*')
+        self.assertEqual(record.replay(trusted=True).to_fen(), record.replay().to_fen())
+
+
+class BenchmarkTest(unittest.TestCase):
+    """Test routines for the micro-benchmarks and their baseline comparison."""
+
+    def test_corpus_is_the_same_every_time(self):
+        move_lists, fens = build_corpus(2, 10)
+        self.assertEqual(build_corpus(2, 10), (move_lists, fens))
+        self.assertEqual(len(fens), 1 + sum(len(moves) for moves in move_lists))
+        self.assertEqual(fens[0], OPENING_FEN)
+
+    def test_every_benchmark_is_timed(self):
+        for backend in BACKENDS:
+            results = run_benchmarks(backend, 1, build_corpus(1, 4))
+            for name in ('make_move', 'is_in_check', 'verify_checkmate', 'generate_threat_dictionary', 'try_move',
+                         'new_game', 'set_fen', 'to_fen', 'replay_record', 'list_possible_moves.Horse'):
+                self.assertGreater(results[name], 0)
+
+    def test_regressions_past_the_tolerance(self):
+        baseline = {'make_move': 1.0, 'try_move': 1.0, 'new_game': 1.0}
+        results = {'make_move': 1.2, 'try_move': 1.3, 'to_fen': 5.0}
+        self.assertEqual(find_regressions(results, baseline, 0.25), [('try_move', 1.0, 1.3)])
+        self.assertEqual(find_regressions(results, baseline, 0.5), [])
+
+
 class InstructorTest(unittest.TestCase):
     def test_readme_code(self):
         game = XiangqiGame()
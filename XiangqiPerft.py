@@ -0,0 +1,122 @@
+# Author: George Kochera
+# Date: 3/12/2020
+# Description: Portfolio Project - XiangqiPerft.py
+
+# Perft ('performance test') harness for the XiangqiGame move generator. Perft counts every position reachable in
+# exactly N moves. Because those counts are fixed for a given position, comparing them against reference values
+# catches move generation bugs, and timing them gives a nodes per second figure for the generator.
+#
+# The opening position counts are the published values. The other positions were picked to exercise the rules that
+# are easiest to get wrong: cannon screens, hobbled horses, blocked elephant eyes, the flying general rule and
+# generals on the edge of the palace. Their reference counts were cross-checked against an independent brute force
+# move generator.
+#
+# Usage: python XiangqiPerft.py [--depth N] [--position NAME] [--backend pieces|bitboard|both]
+# The script prints one line per position and depth and exits with a non-zero status if any count is wrong. With
+# --backend both, every position is run on both XiangqiGame backends, so they are checked against each other as well
+# as against the reference counts (and against each other alone past the deepest reference count).
+
+import argparse
+import time
+from XiangqiGame import XiangqiGame, General, Advisor, Elephant, Horse, Chariot, Cannon, Soldier, BACKENDS
+
+# Each entry is (name, player to move, pieces, reference counts). A pieces value of None means the standard opening
+# position. The reference counts start at depth 1.
+PERFT_POSITIONS = (
+    ('opening', 'Red', None, (44, 1920, 79666, 3290240, 133312995)),
+    ('cannon_screens', 'Red',
+     ((General, 'Red', 'd1'), (Cannon, 'Red', 'b5'), (Cannon, 'Red', 'h6'), (Chariot, 'Red', 'a2'),
+      (Soldier, 'Red', 'e6'), (Soldier, 'Red', 'c7'), (Horse, 'Red', 'g4'),
+      (General, 'Black', 'e10'), (Advisor, 'Black', 'e9'), (Cannon, 'Black', 'e7'), (Cannon, 'Black', 'd8'),
+      (Chariot, 'Black', 'i8'), (Horse, 'Black', 'c9'), (Soldier, 'Black', 'd4')),
+     (4, 175, 8584, 356540)),
+    ('hobbled_horses', 'Red',
+     ((General, 'Red', 'f1'), (Advisor, 'Red', 'e2'), (Horse, 'Red', 'c3'), (Horse, 'Red', 'e5'),
+      (Horse, 'Red', 'g6'), (Soldier, 'Red', 'c4'), (Soldier, 'Red', 'd5'), (Soldier, 'Red', 'e6'),
+      (General, 'Black', 'd10'), (Advisor, 'Black', 'e9'), (Elephant, 'Black', 'c8'), (Elephant, 'Black', 'g10'),
+      (Horse, 'Black', 'e7'), (Horse, 'Black', 'b8'), (Chariot, 'Black', 'a6'), (Soldier, 'Black', 'g7')),
+     (23, 726, 16234, 491831)),
+    ('elephant_eyes', 'Red',
+     ((General, 'Red', 'e1'), (Elephant, 'Red', 'c1'), (Elephant, 'Red', 'g1'), (Elephant, 'Red', 'c5'),
+      (Horse, 'Red', 'd2'),
+      (General, 'Black', 'f10'), (Elephant, 'Black', 'c10'), (Elephant, 'Black', 'e8'), (Elephant, 'Black', 'g6'),
+      (Cannon, 'Black', 'd9'), (Soldier, 'Black', 'd4'), (Soldier, 'Black', 'f7'), (Chariot, 'Black', 'h2')),
+     (11, 430, 3937, 146051)),
+    ('flying_generals', 'Red',
+     ((General, 'Red', 'e1'), (Horse, 'Red', 'e5'), (Chariot, 'Red', 'a2'), (Cannon, 'Red', 'h3'),
+      (Soldier, 'Red', 'c4'),
+      (General, 'Black', 'e10'), (Advisor, 'Black', 'f10'), (Horse, 'Black', 'b10'), (Chariot, 'Black', 'i9'),
+      (Cannon, 'Black', 'b8'), (Soldier, 'Black', 'g7')),
+     (38, 1422, 47626, 1612425)),
+    ('palace_edges', 'Red',
+     ((General, 'Red', 'd3'), (Advisor, 'Red', 'e2'), (Advisor, 'Red', 'f1'), (Chariot, 'Red', 'h4'),
+      (Horse, 'Red', 'b5'), (Cannon, 'Red', 'e5'),
+      (General, 'Black', 'f8'), (Advisor, 'Black', 'e9'), (Advisor, 'Black', 'f10'), (Chariot, 'Black', 'd7'),
+      (Horse, 'Black', 'g6'), (Soldier, 'Black', 'e7')),
+     (5, 96, 2518, 47627)),
+)
+
+
+def build_position(player, pieces, backend='pieces'):
+    """
+    Returns a XiangqiGame using the backend provided, set up with the pieces provided (or the opening position) and
+    player to move.
+    """
+    game = XiangqiGame(backend=backend)
+    if pieces is not None:
+        game.clear_game_board()
+        for piece_class, team, square in pieces:
+            game.add_piece(piece_class(team, square))
+    if game.get_current_player() != player:
+        game.next_player_turn()
+    return game
+
+
+def run_perft(game, depth):
+    """Runs perft on the game to the depth provided and returns the node count and the time it took in seconds."""
+    start_time = time.perf_counter()
+    nodes = game.perft(depth)
+    return nodes, time.perf_counter() - start_time
+
+
+def main(arguments=None):
+    """Runs perft for the selected positions and depths, prints the results and returns the exit status."""
+    parser = argparse.ArgumentParser(description='Perft correctness check and benchmark for XiangqiGame.')
+    parser.add_argument('--depth', type=int, default=3, help='deepest depth to run (default 3)')
+    parser.add_argument('--position', choices=[position[0] for position in PERFT_POSITIONS],
+                        help='only run the named position')
+    parser.add_argument('--backend', choices=BACKENDS + ('both',), default='pieces',
+                        help='XiangqiGame backend to run, or both to compare them (default pieces)')
+    options = parser.parse_args(arguments)
+    backends = BACKENDS if options.backend == 'both' else (options.backend,)
+
+    failures = 0
+    for name, player, pieces, reference_counts in PERFT_POSITIONS:
+        if options.position is not None and options.position != name:
+            continue
+        games = [build_position(player, pieces, backend) for backend in backends]
+        for depth in range(1, options.depth + 1):
+            first_backend_nodes = None
+            for game in games:
+                nodes, seconds = run_perft(game, depth)
+                if depth <= len(reference_counts):
+                    expected = reference_counts[depth - 1]
+                    status = 'ok' if nodes == expected else 'FAILED (expected {})'.format(expected)
+                elif first_backend_nodes is not None:
+                    expected = first_backend_nodes
+                    status = 'ok' if nodes == expected else 'FAILED (backends disagree)'
+                else:
+                    expected = nodes
+                    status = 'no reference'
+                if nodes != expected:
+                    failures += 1
+                if first_backend_nodes is None:
+                    first_backend_nodes = nodes
+                nodes_per_second = nodes / seconds if seconds > 0 else 0
+                print('{:16} {:8} depth {} {:>12} nodes {:8.2f}s {:>10.0f} nodes/s  {}'.format(
+                    name, game.get_backend(), depth, nodes, seconds, nodes_per_second, status))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,338 @@
+# Author: George Kochera
+# Date: 3/12/2020
+# Description: Portfolio Project - XiangqiRecord.py
+
+# Game records for XiangqiGame. A game record is a short text file in the same layout as a chess PGN file: a block of
+# headers such as [Red "Name"] and [Result "1-0"], then the moves with move numbers, then the result. For example:
+#
+#   [Event "Club match"]
+#   [Red "George"]
+#   [Black "Computer"]
+#   [Result "1-0"]
+#   [Format "ICCS"]
+#
+#   1. H2-E2 H9-G7 2. H0-G2 I9-H9
+#   1-0
+#
+# Two move notations are supported. ICCS notation gives the file (a to i) and rank (0 to 9, counted from Red's side)
+# of the starting and ending squares, e.g. H2-E2. Note the ranks are one less than the squares XiangqiGame uses, so
+# H2-E2 is make_move('h3', 'e3'). WXF notation is the one Xiangqi players write by hand: the piece letter (K, A, E, H,
+# R, C, P), the file it stands on counted from the player's right (or + / - for the front or rear of two such pieces
+# on one file), a direction (+ forward, - backward, . sideways) and the file it moves to or the number of ranks it
+# moves, e.g. C2.5 for the same move. Both are read, whatever the [Format] header says. WXF notation as written here
+# can not tell apart three Soldiers on one file, or two pairs of Soldiers on two files, so a move by one of them
+# raises ValueError rather than naming what may be the wrong piece.
+#
+# A record that does not start from the opening position has a [FEN "..."] header with the starting position.
+#
+# read_game_records() reads one game at a time from any iterable of lines (such as an open file), so archives of any
+# size can be read with constant memory, and replay_game_records() plays every move of each game through make_move()
+# to check it is legal.
+
+import re
+from XiangqiGame import XiangqiGame, OPENING_FEN, SQUARE_INDICES, BOARD_COLUMNS
+
+RESULTS = {'RED_WON': '1-0', 'BLACK_WON': '0-1', 'DRAW': '1/2-1/2', 'UNFINISHED': '*'}
+RESULT_TOKENS = ('1-0', '0-1', '1/2-1/2', '*')
+WXF_PIECE_LETTERS = {'General': 'K', 'Advisor': 'A', 'Elephant': 'E', 'Horse': 'H', 'Chariot': 'R', 'Cannon': 'C',
+                     'Soldier': 'P'}
+
+# Pieces that move diagonally give the file they move to in WXF notation, even when moving forward or backward.
+DIAGONAL_PIECE_TYPES = ('Advisor', 'Elephant', 'Horse')
+
+HEADER_REGEX = re.compile(r'^\[(\w+)\s+"(.*)"\]$')
+ICCS_MOVE_REGEX = re.compile(r'^([a-i])([0-9])-?([a-i])([0-9])$', re.IGNORECASE)
+MOVE_NUMBER_REGEX = re.compile(r'^\d+\.+')
+
+
+def square_to_iccs(square):
+    """Returns the ICCS name of a square, e.g. 'h2' for the square 'h3'."""
+    return square[0] + str(int(square[1:]) - 1)
+
+
+def iccs_to_square(iccs_square):
+    """Returns the square for an ICCS square name, e.g. 'h3' for 'h2'."""
+    return iccs_square[0].lower() + str(int(iccs_square[1]) + 1)
+
+
+def move_to_iccs(moving_from_square, moving_to_square):
+    """Returns a move in ICCS notation, e.g. 'H2-E2' for the move from 'h3' to 'e3'."""
+    return '{}-{}'.format(square_to_iccs(moving_from_square), square_to_iccs(moving_to_square)).upper()
+
+
+def iccs_to_move(text):
+    """
+    Returns the (moving_from_square, moving_to_square) tuple for a move in ICCS notation ('H2-E2' or 'h2e2'), or None
+    if the text is not an ICCS move.
+    """
+    match = ICCS_MOVE_REGEX.match(text)
+    if match is None:
+        return None
+    return iccs_to_square(match.group(1) + match.group(2)), iccs_to_square(match.group(3) + match.group(4))
+
+
+def get_wxf_file(column, team):
+    """Returns the WXF file number (1 to 9, counted from the player's right) of a board column for the team."""
+    if team == 'Red':
+        return BOARD_COLUMNS - column
+    return column + 1
+
+
+def get_tandem_rows(game, piece_type, team):
+    """
+    Returns a dictionary of board columns to the rows of the team's pieces of piece_type standing on them, for every
+    column with more than one such piece (pieces in tandem).
+    """
+    rows_by_column = {}
+    for index, piece in enumerate(game.get_board_cells()):
+        if piece.get_type() == piece_type and piece.get_team() == team:
+            rows_by_column.setdefault(index % BOARD_COLUMNS, []).append(index // BOARD_COLUMNS)
+    return {column: rows for column, rows in rows_by_column.items() if len(rows) > 1}
+
+
+def move_to_wxf(game, moving_from_square, moving_to_square):
+    """
+    Returns a move in WXF notation, e.g. 'C2.5' for Red's Cannon from 'h3' to 'e3'. The move must be one the player to
+    move can make in the game's current position, since the notation depends on where the other pieces stand. Raises
+    ValueError for a piece in tandem that + and - can not name, one of three Soldiers on a file or of two pairs.
+    """
+    piece = game.get_game_piece_at_position(moving_from_square)
+    team = piece.get_team()
+    moving_from_row, moving_from_column = divmod(SQUARE_INDICES[moving_from_square], BOARD_COLUMNS)
+    moving_to_row, moving_to_column = divmod(SQUARE_INDICES[moving_to_square], BOARD_COLUMNS)
+
+    # Red moves forward towards row 0, Black towards row 9.
+    forward_rows = moving_from_row - moving_to_row if team == 'Red' else moving_to_row - moving_from_row
+    if forward_rows == 0:
+        direction = '.'
+        distance = get_wxf_file(moving_to_column, team)
+    else:
+        direction = '+' if forward_rows > 0 else '-'
+        if piece.get_type() in DIAGONAL_PIECE_TYPES:
+            distance = get_wxf_file(moving_to_column, team)
+        else:
+            distance = abs(forward_rows)
+
+    # When two pieces of the same type stand on the same file, + marks the front one and - the rear one instead of
+    # the file number. That only names the piece when it is the one pair on the board.
+    tandem_rows = get_tandem_rows(game, piece.get_type(), team)
+    rows_on_file = tandem_rows.get(moving_from_column)
+    if rows_on_file is not None:
+        if len(rows_on_file) > 2 or len(tandem_rows) > 1:
+            raise ValueError('WXF notation can not name the {} on {}: too many in tandem'.format(
+                piece.get_type(), moving_from_square))
+        front_row = min(rows_on_file) if team == 'Red' else max(rows_on_file)
+        moving_from_file = '+' if moving_from_row == front_row else '-'
+    else:
+        moving_from_file = str(get_wxf_file(moving_from_column, team))
+    return '{}{}{}{}'.format(WXF_PIECE_LETTERS[piece.get_type()], moving_from_file, direction, distance)
+
+
+def normalize_wxf(text):
+    """Writes a WXF move the way move_to_wxf() does: upper case, '.' for sideways and the +/- after the letter."""
+    text = text.upper().replace('=', '.')
+    if len(text) == 4 and text[0] in '+-' and text[1].isalpha():
+        text = text[1] + text[0] + text[2:]
+    return text.replace('B', 'E').replace('N', 'H')
+
+
+def wxf_to_move(game, text):
+    """
+    Returns the (moving_from_square, moving_to_square) tuple for a move in WXF notation in the game's current
+    position, or None if no legal move matches it. Raises ValueError if the move may be one of a piece that WXF
+    notation can not name (see move_to_wxf()).
+    """
+    text = normalize_wxf(text)
+    unnamed_piece_moved = False
+    for move in game.legal_moves():
+        piece = game.get_game_piece_at_position(move[0])
+        if WXF_PIECE_LETTERS[piece.get_type()] != text[:1]:
+            continue
+        try:
+            if move_to_wxf(game, move[0], move[1]) == text:
+                return move
+        except ValueError:
+            unnamed_piece_moved = True
+
+    # The move did not match any piece that can be named, but it may have been meant for one that can not.
+    if unnamed_piece_moved:
+        raise ValueError('WXF move {} may be for a piece in tandem that WXF notation can not name'.format(text))
+    return None
+
+
+def text_to_move(game, text):
+    """Returns the move for text in either ICCS or WXF notation in the game's current position, or None."""
+    move = iccs_to_move(text)
+    if move is None:
+        move = wxf_to_move(game, text)
+    return move
+
+
+class GameRecord:
+    """The headers, moves (as written) and result of one game."""
+
+    def __init__(self, headers=None, moves=None, result='*'):
+        """GameRecord constructor. headers is a dictionary of header names to values, moves a list of move texts."""
+        self._headers = dict(headers) if headers is not None else {}
+        self._moves = list(moves) if moves is not None else []
+        self._result = result
+        self._invalid_move_number = None
+
+    def get_headers(self):
+        """Returns the dictionary of headers."""
+        return self._headers
+
+    def get_moves(self):
+        """Returns the list of moves as they are written in the record."""
+        return self._moves
+
+    def get_result(self):
+        """Returns the result: '1-0' (Red won), '0-1' (Black won), '1/2-1/2' (draw) or '*' (unfinished)."""
+        return self._result
+
+    def get_starting_fen(self):
+        """Returns the FEN of the starting position, the opening position unless there is a FEN header."""
+        return self._headers.get('FEN', OPENING_FEN)
+
+    def get_invalid_move_number(self):
+        """Returns the number (counting from 1) of the move that failed the last replay(), or None."""
+        return self._invalid_move_number
+
+    def replay(self, trusted=False):
+        """
+        Plays every move of the record through make_move() from the starting position and returns the game. Returns
+        None if the starting position or any move is not valid; get_invalid_move_number() then tells which move (0
+        for the starting position). With trusted, the moves are known to be legal (the record was written by the
+        server itself) and are played with make_move_trusted(), which skips the rule checks. Raises ValueError for a
+        WXF move that may be for a piece WXF notation can not name (see wxf_to_move()).
+        """
+        self._invalid_move_number = None
+        game = XiangqiGame()
+        if not game.set_fen(self.get_starting_fen()):
+            self._invalid_move_number = 0
+            return None
+        for move_number, text in enumerate(self._moves, 1):
+            move = text_to_move(game, text)
+            if move is None:
+                self._invalid_move_number = move_number
+                return None
+            if trusted:
+                game.make_move_trusted(move[0], move[1])
+            elif not game.make_move(move[0], move[1]):
+                self._invalid_move_number = move_number
+                return None
+        return game
+
+    def to_text(self):
+        """Returns the record as text: the headers, a blank line, the numbered moves and the result."""
+        lines = ['[{} "{}"]'.format(name, value) for name, value in self._headers.items()]
+        lines.append('')
+
+        # Black may be the first to move in a record starting from a FEN, in which case the first move is '1. ...'.
+        tokens = []
+        black_moves_first = self.get_starting_fen().split()[1:2] == ['b']
+        ply = 1 if black_moves_first else 0
+        if black_moves_first and self._moves:
+            tokens.append('1. ...')
+        for text in self._moves:
+            if ply % 2 == 0:
+                tokens.append('{}.'.format(ply // 2 + 1))
+            tokens.append(text)
+            ply += 1
+
+        # Keep the lines of moves to a readable length, breaking only in front of a move number.
+        line = ''
+        for token in tokens:
+            if token[0].isdigit() and len(line) > 70:
+                lines.append(line)
+                line = ''
+            line = token if not line else line + ' ' + token
+        if line:
+            lines.append(line)
+        lines.append(self._result)
+        return '\n'.join(lines) + '\n'
+
+
+def record_game(game, headers=None, notation='ICCS'):
+    """
+    Returns a GameRecord of the moves played in the game (see XiangqiGame.get_move_history()) in ICCS or WXF notation.
+    The Result, Format and (unless the game started from the opening position) FEN headers are filled in. Raises
+    ValueError if a move in WXF notation is by a piece WXF notation can not name (see move_to_wxf()).
+    """
+    starting_fen = game.get_starting_fen()
+    moves = game.get_move_history()
+    if notation == 'WXF':
+        replay_game = XiangqiGame(starting_fen)
+        move_texts = []
+        for moving_from_square, moving_to_square in moves:
+            move_texts.append(move_to_wxf(replay_game, moving_from_square, moving_to_square))
+            replay_game.push_move(moving_from_square, moving_to_square)
+    else:
+        notation = 'ICCS'
+        move_texts = [move_to_iccs(moving_from_square, moving_to_square)
+                      for moving_from_square, moving_to_square in moves]
+
+    result = RESULTS[game.get_game_state()]
+    record_headers = dict(headers) if headers is not None else {}
+    record_headers['Result'] = result
+    if starting_fen != OPENING_FEN:
+        record_headers['FEN'] = starting_fen
+    record_headers['Format'] = notation
+    return GameRecord(record_headers, move_texts, result)
+
+
+def read_game_records(lines):
+    """
+    Generator that reads game records from any iterable of lines, such as an open file, and yields one GameRecord at
+    a time. Only the game being read is held in memory. Move numbers and {comments} are skipped.
+    """
+    headers = {}
+    moves = []
+    result = '*'
+    in_moves = False
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        # A header after the moves of a game starts the next game.
+        header_match = HEADER_REGEX.match(line)
+        if header_match is not None:
+            if in_moves:
+                yield GameRecord(headers, moves, headers.get('Result', result))
+                headers, moves, result, in_moves = {}, [], '*', False
+            headers[header_match.group(1)] = header_match.group(2)
+            continue
+
+        in_moves = True
+        line = re.sub(r'\{[^}]*\}', ' ', line)
+        for token in line.split():
+            token = MOVE_NUMBER_REGEX.sub('', token)
+            if not token or token == '...':
+                continue
+            if token in RESULT_TOKENS:
+                result = token
+                yield GameRecord(headers, moves, result)
+                headers, moves, result, in_moves = {}, [], '*', False
+                continue
+            moves.append(token)
+            in_moves = True
+    if in_moves or headers:
+        yield GameRecord(headers, moves, headers.get('Result', result))
+
+
+def replay_game_records(lines, trusted=False):
+    """
+    Generator that reads game records from lines (see read_game_records()) and replays each one. Yields a
+    (record, game) tuple per game, where game is None if the record has an illegal move. With trusted, the moves are
+    not checked against the rules (see GameRecord.replay()).
+    """
+    for record in read_game_records(lines):
+        yield record, record.replay(trusted)
+
+
+def write_game_records(file, records):
+    """Writes the game records provided to an open text file, separated by blank lines."""
+    for record in records:
+        file.write(record.to_text())
+        file.write('\n')
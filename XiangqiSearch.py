@@ -0,0 +1,351 @@
+# Author: George Kochera
+# Date: 3/12/2020
+# Description: Portfolio Project - XiangqiSearch.py
+
+# A computer opponent for XiangqiGame. The search is a negamax alpha-beta search with iterative deepening: it searches
+# to depth 1, then depth 2 and so on until the time or node budget runs out, and always answers with the best move of
+# the deepest search that finished. Each search starts with the principal variation (the line the engine expects to
+# be played) of the search before it, which is what makes the repeated searches cheap.
+#
+# Moves are made and taken back on the game object itself with push_move_by_index() and pop_move(), so a search leaves
+# the game exactly as it found it. Below the root the search works from the pseudo-legal moves and throws away a move
+# after making it if it left the General in check, so the moves after a cutoff are never tested at all. Captures are
+# searched first (most valuable victim, least valuable attacker) and at the end of the main search a capture only
+# search (quiescence) plays out the exchanges so pieces left hanging are counted properly.
+#
+# Every position searched is stored in a TranspositionTable (see XiangqiTranspositionTable.py) under its Zobrist key.
+# A position reached again through a different move order reuses the stored score when it was searched deep enough,
+# and otherwise its stored best move is searched first. Pass the same table to every search of a game to keep what
+# was learned from one move to the next.
+#
+# Usage:
+#   game = XiangqiGame()
+#   moving_from_square, moving_to_square = find_best_move(game, time_limit=2.0)
+#   game.make_move(moving_from_square, moving_to_square)
+
+import time
+from XiangqiGame import SQUARES
+from XiangqiEvaluation import PIECE_VALUES, evaluate_for_player
+from XiangqiTranspositionTable import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+# Scores at or above MATE_THRESHOLD mean a forced checkmate was found. The mate score is reduced by the number of moves
+# it takes so the search prefers the fastest checkmate (and the slowest loss).
+MATE_SCORE = 100000
+MATE_THRESHOLD = MATE_SCORE - 1000
+INFINITE_SCORE = MATE_SCORE + 1
+
+DEFAULT_TIME_LIMIT = 1.0  # Seconds per move when no budget is given.
+MAX_SEARCH_DEPTH = 64  # Iterative deepening stops here even if there is time left.
+NODES_BETWEEN_CLOCK_CHECKS = 1024  # Reading the clock is not free, so it is only read this often.
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time or node budget has run out."""
+    pass
+
+
+class SearchResult:
+    """The result of a search: the best move, its score and the line the engine expects to be played."""
+
+    def __init__(self, best_move, score, depth, nodes, seconds, principal_variation):
+        """SearchResult constructor. Moves are (moving_from_square, moving_to_square) tuples."""
+        self._best_move = best_move
+        self._score = score
+        self._depth = depth
+        self._nodes = nodes
+        self._seconds = seconds
+        self._principal_variation = principal_variation
+
+    def get_best_move(self):
+        """Returns the best move as a (moving_from_square, moving_to_square) tuple, or None if there is no move."""
+        return self._best_move
+
+    def get_score(self):
+        """Returns the score of the best move for the player to move, in evaluation units (a Soldier is 100)."""
+        return self._score
+
+    def get_depth(self):
+        """Returns the depth of the deepest search that finished."""
+        return self._depth
+
+    def get_nodes(self):
+        """Returns the number of positions visited by the search."""
+        return self._nodes
+
+    def get_seconds(self):
+        """Returns the time the search took in seconds."""
+        return self._seconds
+
+    def get_principal_variation(self):
+        """Returns the list of moves the engine expects to be played, starting with the best move."""
+        return self._principal_variation
+
+    def is_mate_score(self):
+        """Returns True if the score means a forced checkmate was found (for either player)."""
+        return abs(self._score) >= MATE_THRESHOLD
+
+
+class XiangqiSearch:
+    """Negamax alpha-beta searcher with iterative deepening for a XiangqiGame position."""
+
+    def __init__(self, game, transposition_table=None):
+        """
+        XiangqiSearch constructor. The game is searched in place and is unchanged when a search returns. A new
+        transposition table of the default size is made if none is provided.
+        """
+        self._game = game
+        if transposition_table is None:
+            transposition_table = TranspositionTable()
+        self._transposition_table = transposition_table
+        self._nodes = 0
+        self._node_limit = None
+        self._deadline = None
+        self._next_clock_check = NODES_BETWEEN_CLOCK_CHECKS
+
+        # Two killer moves per ply: quiet moves that caused a cutoff in a sibling position and are likely to again.
+        self._killer_moves = [[None, None] for ply in range(MAX_SEARCH_DEPTH + 1)]
+
+        # The principal variation of the last finished iteration, searched first by the next one.
+        self._principal_variation = []
+
+    def search(self, max_depth=MAX_SEARCH_DEPTH, time_limit=DEFAULT_TIME_LIMIT, node_limit=None):
+        """
+        Searches the position with iterative deepening until max_depth is reached or the time limit (in seconds) or
+        node limit runs out, whichever comes first. None means no limit. Returns a SearchResult for the deepest search
+        that finished. Depth 1 is always finished so there is a move to play whenever one exists.
+        """
+        game = self._game
+        start_time = time.perf_counter()
+        self._nodes = 0
+        self._node_limit = node_limit
+        self._deadline = None if time_limit is None else start_time + time_limit
+        self._next_clock_check = NODES_BETWEEN_CLOCK_CHECKS
+        self._principal_variation = []
+        self._transposition_table.new_search()
+        stack_size = game.get_move_stack_size()
+
+        best_score = 0
+        completed_depth = 0
+        for depth in range(1, min(max_depth, MAX_SEARCH_DEPTH) + 1):
+            try:
+                score, principal_variation = self.search_root(depth, depth > 1)
+            except SearchTimeout:
+
+                # Take back the moves of the search that was cut short.
+                while game.get_move_stack_size() > stack_size:
+                    game.pop_move()
+                break
+            best_score = score
+            completed_depth = depth
+            self._principal_variation = principal_variation
+
+            # There is nothing more to find once there is no move or a forced checkmate has been found.
+            if not principal_variation or abs(score) >= MATE_THRESHOLD:
+                break
+
+        principal_variation = [(SQUARES[moving_from_index], SQUARES[moving_to_index])
+                               for moving_from_index, moving_to_index in self._principal_variation]
+        best_move = principal_variation[0] if principal_variation else None
+        return SearchResult(best_move, best_score, completed_depth, self._nodes, time.perf_counter() - start_time,
+                            principal_variation)
+
+    def search_root(self, depth, can_time_out):
+        """
+        Searches every legal move of the root position to the depth provided. Returns the best score and the principal
+        variation (as index tuples). The first iteration is not allowed to time out.
+        """
+        game = self._game
+        moves = self.order_moves(game.legal_moves_by_index(), 0)
+        if not moves:
+            return -MATE_SCORE, []
+        alpha = -INFINITE_SCORE
+        principal_variation = [moves[0]]
+        for move in moves:
+            game.push_move_by_index(move[0], move[1])
+            if can_time_out:
+                score, child_variation = self.negamax(depth - 1, 1, -INFINITE_SCORE, -alpha)
+            else:
+                self._deadline, deadline = None, self._deadline
+                self._node_limit, node_limit = None, self._node_limit
+                score, child_variation = self.negamax(depth - 1, 1, -INFINITE_SCORE, -alpha)
+                self._deadline, self._node_limit = deadline, node_limit
+            score = -score
+            game.pop_move()
+            if score > alpha:
+                alpha = score
+                principal_variation = [move] + child_variation
+        return alpha, principal_variation
+
+    def negamax(self, depth, ply, alpha, beta):
+        """
+        Alpha-beta search of the current position. Returns the score for the player to move and the principal
+        variation from this position (as index tuples).
+        """
+        self.count_node()
+        game = self._game
+        player = game.get_current_player()
+        enemy = 'Black' if player == 'Red' else 'Red'
+        general = game.get_general(player)
+        in_check = general is not None and game.is_square_attacked_by(general.get_index(), enemy)
+
+        # Checks are searched one move deeper so the search does not stop in the middle of a mating attack.
+        if in_check and ply < MAX_SEARCH_DEPTH:
+            depth += 1
+        if depth <= 0 or ply >= MAX_SEARCH_DEPTH:
+            return self.quiescence(ply, alpha, beta), []
+
+        # A position that was already searched at least this deep can often be answered from the table. Otherwise its
+        # stored best move is searched first.
+        key = game.get_zobrist_key()
+        entry = self._transposition_table.probe(key)
+        hash_move = None
+        if entry is not None:
+            entry_depth, bound, score, hash_move = entry
+            if entry_depth >= depth:
+                score = score_from_table(score, ply)
+                if bound == EXACT or (bound == LOWER_BOUND and score >= beta) or \
+                        (bound == UPPER_BOUND and score <= alpha):
+                    return score, [hash_move] if bound == EXACT and hash_move is not None else []
+
+        original_alpha = alpha
+        best_move = None
+        principal_variation = []
+        has_legal_move = False
+        board = game.get_board_cells()
+        for move in self.order_moves(game.pseudo_legal_moves_by_index(), ply, hash_move):
+            is_capture = board[move[1]].get_type() is not None
+            game.push_move_by_index(move[0], move[1])
+            if not game.is_general_safe(player, enemy):
+                game.pop_move()
+                continue
+            has_legal_move = True
+            score, child_variation = self.negamax(depth - 1, ply + 1, -beta, -alpha)
+            score = -score
+            game.pop_move()
+            if score >= beta:
+                if not is_capture:
+                    self.store_killer_move(move, ply)
+                self._transposition_table.store(key, depth, LOWER_BOUND, score_to_table(score, ply), move)
+                return score, []
+            if score > alpha:
+                alpha = score
+                best_move = move
+                principal_variation = [move] + child_variation
+
+        # A player with no legal move has lost, whether in check or not.
+        if not has_legal_move:
+            return -MATE_SCORE + ply, []
+        if alpha > original_alpha:
+            self._transposition_table.store(key, depth, EXACT, score_to_table(alpha, ply), best_move)
+        else:
+            self._transposition_table.store(key, depth, UPPER_BOUND, score_to_table(alpha, ply), None)
+        return alpha, principal_variation
+
+    def quiescence(self, ply, alpha, beta):
+        """
+        Capture only search at the end of the main search. The player to move may stand pat (take the evaluation as is)
+        or try a capture, so only exchanges are played out.
+        """
+        self.count_node()
+        game = self._game
+        stand_pat = evaluate_for_player(game, game.get_current_player())
+        if stand_pat >= beta or ply >= MAX_SEARCH_DEPTH:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        player = game.get_current_player()
+        enemy = 'Black' if player == 'Red' else 'Red'
+        board = game.get_board_cells()
+        captures = [move for move in game.pseudo_legal_moves_by_index() if board[move[1]].get_type() is not None]
+        for move in self.order_moves(captures, ply):
+            game.push_move_by_index(move[0], move[1])
+            if not game.is_general_safe(player, enemy):
+                game.pop_move()
+                continue
+            score = -self.quiescence(ply + 1, -beta, -alpha)
+            game.pop_move()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def order_moves(self, moves, ply, hash_move=None):
+        """
+        Sorts moves so the ones most likely to be best come first: the principal variation move of the last iteration,
+        then the best move stored in the transposition table, then captures (most valuable victim, least valuable
+        attacker), then the killer moves, then the rest.
+        """
+        board = self._game.get_board_cells()
+        principal_variation = self._principal_variation
+        principal_move = principal_variation[ply] if ply < len(principal_variation) else None
+        killer_moves = self._killer_moves[ply]
+
+        def move_order_key(move):
+            if move == principal_move:
+                return -INFINITE_SCORE
+            if move == hash_move:
+                return -MATE_SCORE
+            victim = board[move[1]].get_type()
+            if victim is not None:
+                return -10 * PIECE_VALUES[victim] + PIECE_VALUES[board[move[0]].get_type()] // 100 - 1000
+            if move == killer_moves[0] or move == killer_moves[1]:
+                return -1
+            return 0
+        return sorted(moves, key=move_order_key)
+
+    def store_killer_move(self, move, ply):
+        """Remembers a quiet move that caused a cutoff at this ply."""
+        killer_moves = self._killer_moves[ply]
+        if killer_moves[0] != move:
+            killer_moves[1] = killer_moves[0]
+            killer_moves[0] = move
+
+    def count_node(self):
+        """Counts a visited position and raises SearchTimeout once the node or time budget has run out."""
+        self._nodes += 1
+        if self._node_limit is not None and self._nodes > self._node_limit:
+            raise SearchTimeout()
+        if self._nodes >= self._next_clock_check:
+            self._next_clock_check = self._nodes + NODES_BETWEEN_CLOCK_CHECKS
+            if self._deadline is not None and time.perf_counter() > self._deadline:
+                raise SearchTimeout()
+
+    def get_nodes(self):
+        """Returns the number of positions visited by the last search."""
+        return self._nodes
+
+    def get_transposition_table(self):
+        """Returns the transposition table used by the search, e.g. to read its statistics."""
+        return self._transposition_table
+
+
+def score_to_table(score, ply):
+    """
+    Mate scores count the moves from the root of the search, but the table must hold them counted from the position
+    they are stored for (it can be reached at a different ply later). Returns the score to store.
+    """
+    if score >= MATE_THRESHOLD:
+        return score + ply
+    if score <= -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    """Turns a score stored with score_to_table() back into a score counted from the root of the search."""
+    if score >= MATE_THRESHOLD:
+        return score - ply
+    if score <= -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+
+def find_best_move(game, time_limit=DEFAULT_TIME_LIMIT, max_depth=MAX_SEARCH_DEPTH, node_limit=None,
+                   transposition_table=None):
+    """
+    Searches the game's current position and returns the best move for the player to move as a (moving_from_square,
+    moving_to_square) tuple that can be passed to make_move(), or None if the player has no legal move.
+    """
+    return XiangqiSearch(game, transposition_table).search(max_depth, time_limit, node_limit).get_best_move()
@@ -0,0 +1,155 @@
+# Author: George Kochera
+# Date: 3/12/2020
+# Description: Portfolio Project - XiangqiTranspositionTable.py
+
+# A fixed size transposition table for XiangqiSearch. The same position is often reached through different move orders
+# (a Horse move then a Cannon move, or the Cannon move first). The table remembers what the search found out about each
+# position, keyed by its Zobrist key, so a position reached again can reuse that result instead of being searched from
+# scratch.
+#
+# The table does not hold Python objects. Every field lives in its own array from the array module, so its memory use
+# is fixed when it is created (about 17 bytes per entry) and does not grow while searching. Entries come in buckets of
+# two. The first slot of a bucket is depth-preferred: it is only replaced by a search at least as deep, or by any search
+# once it is left over from an earlier move. The second slot is always-replace and takes everything else, so recent
+# positions are always kept somewhere.
+
+from array import array
+from XiangqiGame import BOARD_SIZE
+
+# The kind of score stored in an entry. An EXACT score is the true score of the position. A LOWER_BOUND comes from a
+# cutoff (the position is at least that good) and an UPPER_BOUND from a search where no move beat alpha (the position
+# is at most that good).
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+DEFAULT_TABLE_MEGABYTES = 8
+SLOTS_PER_BUCKET = 2
+
+# Bytes used by each entry: key (8), score (4), best move (2), depth (1), bound (1) and search generation (1).
+ENTRY_BYTES = 17
+
+
+def encode_move(move):
+    """Packs a (moving_from_index, moving_to_index) tuple into one small integer. 0 means no move."""
+    if move is None:
+        return 0
+    return move[0] * BOARD_SIZE + move[1] + 1
+
+
+def decode_move(encoded_move):
+    """Unpacks an integer made by encode_move() back into a (moving_from_index, moving_to_index) tuple or None."""
+    if encoded_move == 0:
+        return None
+    return divmod(encoded_move - 1, BOARD_SIZE)
+
+
+class TranspositionTable:
+    """Fixed size hash table of search results keyed by Zobrist key."""
+
+    def __init__(self, megabytes=DEFAULT_TABLE_MEGABYTES):
+        """
+        TranspositionTable constructor. The number of buckets is the largest power of two that fits in the memory
+        provided, so a bucket can be picked from a key with a bit mask.
+        """
+        bucket_count = 1
+        while bucket_count * 2 * SLOTS_PER_BUCKET * ENTRY_BYTES <= megabytes * 1024 * 1024:
+            bucket_count *= 2
+        self._bucket_mask = bucket_count - 1
+        self._size = bucket_count * SLOTS_PER_BUCKET
+        self.clear()
+
+    def clear(self):
+        """Empties the table and resets the statistics."""
+        self._generation = 0
+
+        # One array per field. A key of 0 marks an empty slot (a real Zobrist key of 0 is not worth worrying about).
+        self._keys = array('Q', bytes(8 * self._size))
+        self._scores = array('i', bytes(4 * self._size))
+        self._moves = array('H', bytes(2 * self._size))
+        self._depths = array('b', bytes(self._size))
+        self._bounds = array('B', bytes(self._size))
+        self._generations = array('B', bytes(self._size))
+
+        self._probes = 0
+        self._hits = 0
+        self._collisions = 0
+        self._used_slots = 0
+
+    def probe(self, key):
+        """
+        Looks up the position with the Zobrist key provided. Returns a (depth, bound, score, best_move) tuple, where
+        best_move is a (moving_from_index, moving_to_index) tuple or None, or returns None if the position is not
+        stored.
+        """
+        self._probes += 1
+        slot = (key & self._bucket_mask) * SLOTS_PER_BUCKET
+        keys = self._keys
+        if keys[slot] != key:
+            slot += 1
+            if keys[slot] != key:
+                return None
+        self._hits += 1
+        return self._depths[slot], self._bounds[slot], self._scores[slot], decode_move(self._moves[slot])
+
+    def store(self, key, depth, bound, score, best_move):
+        """
+        Stores what the search found out about a position. The depth-preferred slot is used if it already holds this
+        position, is empty, is from an earlier search or the new depth is at least as deep. Otherwise the
+        always-replace slot is used. A stored best move is kept if the new result has none.
+        """
+        slot = (key & self._bucket_mask) * SLOTS_PER_BUCKET
+        keys = self._keys
+        if keys[slot] != key and keys[slot] != 0 and self._generations[slot] == self._generation and \
+                depth < self._depths[slot]:
+            slot += 1
+
+        # Count the slot being filled or a different position being pushed out of it.
+        if keys[slot] == 0:
+            self._used_slots += 1
+        elif keys[slot] != key:
+            self._collisions += 1
+        elif best_move is None:
+            best_move = decode_move(self._moves[slot])
+
+        keys[slot] = key
+        self._depths[slot] = depth
+        self._bounds[slot] = bound
+        self._scores[slot] = score
+        self._moves[slot] = encode_move(best_move)
+        self._generations[slot] = self._generation
+
+    def new_search(self):
+        """Marks the entries stored so far as coming from an earlier search, so deep but old entries can be replaced."""
+        self._generation = (self._generation + 1) & 0xFF
+
+    def get_size(self):
+        """Returns the number of entries the table can hold."""
+        return self._size
+
+    def get_probes(self):
+        """Returns the number of lookups made with probe()."""
+        return self._probes
+
+    def get_hits(self):
+        """Returns the number of lookups that found their position."""
+        return self._hits
+
+    def get_hit_rate(self):
+        """Returns the fraction of lookups that found their position."""
+        if self._probes == 0:
+            return 0.0
+        return self._hits / self._probes
+
+    def get_collisions(self):
+        """Returns the number of times a stored position was replaced by a different position."""
+        return self._collisions
+
+    def get_fill(self):
+        """Returns the fraction of entries in use."""
+        return self._used_slots / self._size
+
+    def get_statistics(self):
+        """Returns the table statistics in one dictionary."""
+        return {'size': self._size, 'probes': self._probes, 'hits': self._hits, 'hit_rate': self.get_hit_rate(),
+                'collisions': self._collisions, 'fill': self.get_fill()}